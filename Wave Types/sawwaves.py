@@ -65,16 +65,29 @@ KEY_FREQUENCIES.update(black_keys)
 # ----------------------------
 # Waveform Generation
 # ----------------------------
+def poly_blep(t, dt):
+    """
+    PolyBLEP residual of a unit downward step at phase 0, for phases `t` in
+    cycles [0, 1) and a phase increment `dt` in cycles per sample. Adding it
+    to a naive waveform at each jump removes the aliasing of the jump.
+    """
+    after = np.maximum(1 - t / dt, 0)
+    before = np.maximum(1 + (t - 1) / dt, 0)
+    return before ** 2 - after ** 2
+
 def generate_saw_wave(freq, sample_rate, duration, fade_in_duration, fade_out_duration):
     """
     Generate a saw wave with a given frequency and duration.
-    The wave ramps up from -0.5 to 0.5.
+    The wave ramps up from -0.5 to 0.5 and is band-limited with PolyBLEP.
     Fade-in and fade-out envelopes are applied to smooth the transitions.
     Returns a float32 NumPy array.
     """
     t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
     # Create a saw wave: ramps from -0.5 to 0.5.
     wave = 0.5 * (2 * (t * freq - np.floor(t * freq + 0.5)))
+    # Round off the jump at phase 0.5 so it does not alias
+    phase = (t * freq + 0.5) % 1.0
+    wave -= 0.5 * poly_blep(phase, freq / sample_rate)
     
     # Apply fade-in
     fade_in_samples = int(fade_in_duration * sample_rate)
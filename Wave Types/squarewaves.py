@@ -65,16 +65,32 @@ KEY_FREQUENCIES.update(black_keys)
 # ----------------------------
 # Waveform Generation
 # ----------------------------
+def poly_blep(t, dt):
+    """
+    PolyBLEP residual of a unit downward step at phase 0, for phases `t` in
+    cycles [0, 1) and a phase increment `dt` in cycles per sample. Adding it
+    to a naive waveform at each jump removes the aliasing of the jump.
+    """
+    after = np.maximum(1 - t / dt, 0)
+    before = np.maximum(1 + (t - 1) / dt, 0)
+    return before ** 2 - after ** 2
+
 def generate_square_wave(freq, sample_rate, duration, fade_in_duration, fade_out_duration):
     """
     Generate a square wave with a given frequency and duration.
-    The wave toggles between 0.5 and -0.5.
+    The wave toggles between 0.5 and -0.5 and is band-limited with PolyBLEP.
     Fade-in and fade-out envelopes are applied to smooth the transitions.
     Returns a float32 NumPy array.
     """
     t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-    # Create a square wave: 0.5 when cos >= 0, -0.5 when cos < 0.
-    wave = np.where(np.cos(2 * np.pi * freq * t) >= 0, 0.5, -0.5)
+    # Create a square wave: 0.5 when cos >= 0, -0.5 when cos < 0. The edges
+    # come from the same phase as the corrections below so they line up.
+    phase = (t * freq + 0.25) % 1.0
+    wave = np.where(phase < 0.5, 0.5, -0.5)
+    # Round off the rising edge (phase 0.75) and the falling edge (phase 0.25)
+    dt = freq / sample_rate
+    wave += 0.5 * poly_blep(phase, dt)
+    wave -= 0.5 * poly_blep((phase + 0.5) % 1.0, dt)
     
     # Apply fade-in
     fade_in_samples = int(fade_in_duration * sample_rate)
@@ -0,0 +1,345 @@
+import argparse
+import sys
+import threading
+import time
+import wave
+
+import numpy as np
+
+# ----------------------------
+# Backend Configuration
+# ----------------------------
+SAMPLE_RATE = 44100
+NULL_BLOCKSIZE = 512          # Frames per callback for the null and file sinks
+SPIN_THRESHOLD = 0.0005       # Seconds before a deadline to stop sleeping and spin
+
+class TimeInfo:
+    """
+    Stand-in for PortAudio's time_info, using the backend's own clock.
+    """
+    __slots__ = ("currentTime", "outputBufferDacTime", "inputBufferAdcTime")
+
+    def __init__(self):
+        self.currentTime = 0.0
+        self.outputBufferDacTime = 0.0
+        self.inputBufferAdcTime = 0.0
+
+class CallbackStatus:
+    """
+    Stand-in for sounddevice.CallbackFlags: false unless a flag is set.
+    """
+    __slots__ = ("output_underflow",)
+
+    def __init__(self):
+        self.output_underflow = False
+
+    def __bool__(self):
+        return self.output_underflow
+
+    def __str__(self):
+        return "output underflow" if self.output_underflow else ""
+
+class AudioBackend:
+    """
+    Calls an audio callback with the sounddevice signature
+    callback(outdata, frames, time_info, status) and sends the blocks
+    somewhere. Subclasses implement start() and stop().
+    """
+    def __init__(self, callback, sample_rate=SAMPLE_RATE, channels=1):
+        self.callback = callback
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    @classmethod
+    def native_sample_rate(cls, **options):
+        """
+        The rate this backend runs at without converting. Sinks have no
+        preference and report SAMPLE_RATE.
+        """
+        return SAMPLE_RATE
+
+    def start(self):
+        raise NotImplementedError
+
+    def stop(self):
+        raise NotImplementedError
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# ----------------------------
+# Sound Card
+# ----------------------------
+class SoundDeviceBackend(AudioBackend):
+    """
+    Play through an output device (the default one unless `device` is
+    given) with sounddevice. The package is imported on start(), so the
+    other backends work without it.
+    """
+    def __init__(self, callback, sample_rate=SAMPLE_RATE, channels=1, blocksize=0, latency="low",
+                 device=None):
+        super().__init__(callback, sample_rate, channels)
+        self.blocksize = blocksize
+        self.latency = latency
+        self.device = device
+        self.stream = None
+
+    @classmethod
+    def native_sample_rate(cls, device=None, **options):
+        """
+        The device's default rate. Opening the stream at this rate keeps
+        PortAudio and the OS mixer from resampling.
+        """
+        import sounddevice as sd
+        return int(sd.query_devices(device, "output")["default_samplerate"])
+
+    def start(self):
+        import sounddevice as sd
+        self.stream = sd.OutputStream(
+            samplerate=self.sample_rate,
+            device=self.device,
+            channels=self.channels,
+            dtype='float32',
+            latency=self.latency,
+            blocksize=self.blocksize,
+            callback=self.callback
+        )
+        self.stream.start()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+# ----------------------------
+# Null and File Sinks
+# ----------------------------
+class NullBackend(AudioBackend):
+    """
+    Drive the callback on a background thread and throw the audio away.
+    With realtime=True blocks are clocked by time.perf_counter() like a
+    sound card would request them (sleeping, then spinning for the last
+    fraction of a millisecond); a block that starts a whole period late is
+    flagged as an output underflow. With realtime=False blocks are rendered
+    back to back as fast as the machine allows.
+    run() drives the callback on the calling thread instead.
+    """
+    def __init__(self, callback, sample_rate=SAMPLE_RATE, channels=1, blocksize=NULL_BLOCKSIZE,
+                 realtime=True):
+        super().__init__(callback, sample_rate, channels)
+        self.blocksize = blocksize
+        self.realtime = realtime
+        self.frames_processed = 0
+        self.outdata = np.zeros((blocksize, channels), dtype=np.float32)
+        self.time_info = TimeInfo()
+        self.status = CallbackStatus()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="null-audio", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        self.run()
+
+    def run(self, duration=None):
+        """
+        Call the callback block by block until stop() is called or
+        `duration` seconds of audio have been produced. Returns the number
+        of frames produced.
+        """
+        period = self.blocksize / self.sample_rate
+        blocks = None if duration is None else int(np.ceil(duration * self.sample_rate / self.blocksize))
+        clock_start = time.perf_counter()
+        deadline = clock_start
+        produced = 0
+        while not self._stop.is_set() and (blocks is None or produced < blocks):
+            now = time.perf_counter()
+            if self.realtime:
+                if now - deadline >= period:
+                    # Missed a whole block: report it and resynchronise
+                    self.status.output_underflow = True
+                    deadline = now
+                else:
+                    self.status.output_underflow = False
+                    self._wait_until(deadline)
+                    now = time.perf_counter()
+            self.time_info.currentTime = now - clock_start
+            self.time_info.outputBufferDacTime = deadline + period - clock_start
+            self.callback(self.outdata, self.blocksize, self.time_info, self.status)
+            self.write(self.outdata)
+            self.frames_processed += self.blocksize
+            produced += 1
+            deadline += period
+        return produced * self.blocksize
+
+    def _wait_until(self, deadline):
+        remaining = deadline - time.perf_counter()
+        if remaining > SPIN_THRESHOLD:
+            time.sleep(remaining - SPIN_THRESHOLD)
+        while time.perf_counter() < deadline:
+            pass
+
+    def write(self, block):
+        """
+        Consume one rendered block. The null sink discards it.
+        """
+
+class FileBackend(NullBackend):
+    """
+    Drive the callback like NullBackend and stream every block into a
+    16-bit WAV file. Runs at full speed unless realtime=True.
+    """
+    def __init__(self, callback, path, sample_rate=SAMPLE_RATE, channels=1,
+                 blocksize=NULL_BLOCKSIZE, realtime=False):
+        super().__init__(callback, sample_rate, channels, blocksize, realtime)
+        self.path = path
+        self.file = None
+
+    def _open(self):
+        if self.file is None:
+            self.file = wave.open(self.path, "wb")
+            self.file.setnchannels(self.channels)
+            self.file.setsampwidth(2)
+            self.file.setframerate(self.sample_rate)
+
+    def start(self):
+        self._open()
+        super().start()
+
+    def run(self, duration=None):
+        self._open()
+        return super().run(duration)
+
+    def write(self, block):
+        self.file.writeframes((np.clip(block, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+
+    def close(self):
+        self.stop()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+BACKENDS = {"sounddevice": SoundDeviceBackend, "null": NullBackend, "file": FileBackend}
+
+def open_backend(name, callback, sample_rate=SAMPLE_RATE, **options):
+    """
+    Create a backend by name ("sounddevice", "null" or "file"); `options`
+    go to the backend's constructor (the file backend needs path=...).
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown audio backend: {name}")
+    if name == "file":
+        return FileBackend(callback, options.pop("path"), sample_rate, **options)
+    return BACKENDS[name](callback, sample_rate, **options)
+
+def native_sample_rate(name, **options):
+    """
+    Native rate of backend `name` with constructor `options`.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown audio backend: {name}")
+    return BACKENDS[name].native_sample_rate(**options)
+
+# ----------------------------
+# Headless Runner
+# ----------------------------
+def main(argv=None):
+    from wavetable import build_wavetables
+    from voice_pool import VoicePool
+    from sequencer import Sequencer, load_events_file
+    from offline_render import equal_temperament_increments
+    from telemetry import CallbackTelemetry, TelemetryReader
+
+    parser = argparse.ArgumentParser(description="Run the synth core without an audio device or display.")
+    parser.add_argument("--backend", default="null", choices=sorted(BACKENDS))
+    parser.add_argument("--output", default="headless.wav", help="file for the file backend")
+    parser.add_argument("--full-speed", action="store_true", help="do not clock the null sink in real time")
+    parser.add_argument("--seconds", type=float, default=10.0, help="audio to produce")
+    parser.add_argument("--blocksize", type=int, default=NULL_BLOCKSIZE)
+    parser.add_argument("--voices", type=int, default=16, help="notes held when no recording is given")
+    parser.add_argument("--recording", help="recording (.json, .events or .mid) to play instead of a held chord")
+    parser.add_argument("--waveform", default="saw")
+    parser.add_argument("--workers", type=int, default=0, help="render voices on this many processes")
+    parser.add_argument("--sample-rate", type=int, default=None, help="default: the backend's native rate")
+    args = parser.parse_args(argv)
+
+    sample_rate = args.sample_rate or native_sample_rate(args.backend)
+    if args.workers:
+        from parallel_render import ParallelVoicePool
+        pool = ParallelVoicePool(sample_rate,
+                                 equal_temperament_increments(sample_rate), args.waveform,
+                                 workers=args.workers, block_size=args.blocksize)
+    else:
+        pool = VoicePool(build_wavetables(), sample_rate, equal_temperament_increments(sample_rate),
+                         args.waveform, max_frames=max(args.blocksize, 64))
+    sequencer = Sequencer(sample_rate)
+    if args.recording:
+        events, recorded_rate = load_events_file(args.recording, sample_rate)
+        if recorded_rate != sample_rate:
+            sample_time = np.round(events[0] * (sample_rate / recorded_rate)).astype(np.int64)
+            events = (sample_time,) + tuple(events[1:])
+        sequencer.load_events(events)
+        sequencer.start()
+    else:
+        for i in range(args.voices):
+            pool.note_on(36 + i % 72)
+
+    def audio_callback(outdata, frames, time_info, status):
+        sequencer.dispatch(pool, frames)
+        pool.render(outdata[:, 0])
+
+    telemetry = CallbackTelemetry(sample_rate)
+    callback = telemetry.instrument(audio_callback, pool)
+    options = {}
+    if args.backend != "sounddevice":
+        options["blocksize"] = args.blocksize
+    if args.backend == "file":
+        options["path"] = args.output
+    if args.backend == "null":
+        options["realtime"] = not args.full_speed
+    backend = open_backend(args.backend, callback, sample_rate, **options)
+
+    reader = TelemetryReader(telemetry)
+    reader.start()
+    start = time.perf_counter()
+    if isinstance(backend, NullBackend):
+        frames = backend.run(args.seconds)
+        backend.close()
+    else:
+        with backend:
+            time.sleep(args.seconds)
+        frames = int(args.seconds * sample_rate)
+    elapsed = time.perf_counter() - start
+    reader.stop()
+    if args.workers:
+        print(f"{pool.late_blocks} late worker blocks, {pool.dropped_events} dropped events")
+        pool.close()
+
+    print(f"{frames / sample_rate:.1f} s of audio in {elapsed:.2f} s "
+          f"({frames / sample_rate / elapsed:.1f}x real time)")
+    reader.report()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import numpy as np
+
+# ----------------------------
+# PolyBLEP Oscillators
+# ----------------------------
+# Naive saw and square waves jump instantly, which puts energy above Nyquist
+# that folds back as aliasing. PolyBLEP subtracts a two-sample polynomial
+# band-limited step at every jump instead, so the output is clean at 44.1 kHz
+# without oversampling and costs only a few extra array operations per block.
+BLEP_WAVEFORMS = ("saw", "square", "pulse")
+
+def poly_blep(t, inverse_increment, bias, out, scratch):
+    """
+    Write the PolyBLEP residual of a unit-height downward step at phase 0
+    into `out` for every phase `t` (cycles, wrapped to [0, 1)).
+    `inverse_increment` is 1/increment per voice and `bias` is
+    1 - 1/increment per voice, both shaped to broadcast against `t`.
+    The residual is (1 + (t-1)/dt)^2 just before the step and -(1 - t/dt)^2
+    just after it; clipping at zero keeps both polynomials inside their
+    one-sample windows without any branching.
+    """
+    np.multiply(t, inverse_increment, out=out, casting="unsafe")   # t / dt
+    np.subtract(1.0, out, out=scratch)
+    np.maximum(scratch, 0.0, out=scratch)
+    scratch *= scratch                                             # (1 - t/dt)^2
+    out += bias                                                    # 1 + (t-1)/dt
+    np.maximum(out, 0.0, out=out)
+    out *= out
+    out -= scratch
+    return out
+
+def _wrap(position, whole):
+    # position -= floor(position) without allocating; phases are never negative
+    np.copyto(whole, position, casting="unsafe")
+    position -= whole
+
+def render_blep(waveform, position, increment, out, scratch, whole, pulse_width=0.5):
+    """
+    Render band-limited saw, square or pulse waves for a whole block of
+    voices at once.
+    `position` holds the unwrapped phase of every voice at every sample
+    (cycles, shape voices x frames) and is used as scratch space. `increment`
+    is the per-voice phase increment, `out` receives the samples, `scratch`
+    is a pair of float32 work arrays and `whole` an integer array, all shaped
+    like `position`.
+    The shapes match the naive generators: saw ramps from -0.5 to 0.5 and is
+    0 at phase 0; square and pulse sit at +0.5 around phase 0 and -0.5
+    elsewhere, with the pulse DC offset removed.
+    """
+    blep, temp = scratch[0], scratch[1]
+    dt = np.maximum(increment, 1e-9)[:, None]
+    inverse_increment = 1.0 / dt
+    bias = 1.0 - inverse_increment
+
+    if waveform == "saw":
+        position += 0.5
+        _wrap(position, whole)
+        np.subtract(position, 0.5, out=out, casting="unsafe")
+        poly_blep(position, inverse_increment, bias, blep, temp)
+        blep *= 0.5
+        out -= blep
+        return out
+
+    width = 0.5 if waveform == "square" else min(max(pulse_width, 0.01), 0.99)
+    # Rising edge at t = 0, falling edge at t = width
+    position += width / 2
+    _wrap(position, whole)
+    np.less(position, width, out=out, casting="unsafe")
+    out -= 0.5
+    poly_blep(position, inverse_increment, bias, blep, temp)
+    blep *= 0.5
+    out += blep
+    position += 1.0 - width
+    _wrap(position, whole)
+    poly_blep(position, inverse_increment, bias, blep, temp)
+    blep *= 0.5
+    out -= blep
+    out -= width - 0.5
+    return out
@@ -0,0 +1,196 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from wavetable import WAVE_KINDS, build_wavetables
+from wave_cache import cached_wavetables
+from table_store import shared_wavetables
+from voice_pool import VoicePool
+from offline_render import equal_temperament_increments
+from engine import SynthEngine, CHANNELS
+
+# ----------------------------
+# Benchmark Configuration
+# ----------------------------
+SAMPLE_RATE = 44100
+BLOCK_SIZES = (64, 128, 256, 512, 1024, 2048)
+POLYPHONY = (1, 8, 16, 32, 64)
+BLOCKS = 200              # Timed callbacks per configuration
+WARMUP_BLOCKS = 10        # Untimed callbacks before each measurement
+BENCHMARK_VERSION = 1     # Bump when the result format changes
+
+def percentiles(samples_ns):
+    """
+    Summarise callback times (nanoseconds) in milliseconds.
+    """
+    ms = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "mean_ms": float(ms.mean()),
+    }
+
+# ----------------------------
+# Benchmarks
+# ----------------------------
+def time_startup(sample_rate=SAMPLE_RATE):
+    """
+    Time the start-up work of the live synth: creating the (lazy) engine,
+    building every wavetable, building and then mapping the on-disk cache
+    and the shared table store, and creating the voice pool.
+    Returns {name: seconds}.
+    """
+    results = {}
+    start = time.perf_counter()
+    SynthEngine(sample_rate)
+    results["engine_create_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    build_wavetables()
+    results["build_wavetables_s"] = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        cached_wavetables(cache_dir=cache_dir)
+        results["cache_cold_s"] = time.perf_counter() - start
+        start = time.perf_counter()
+        wavetables = cached_wavetables(cache_dir=cache_dir)
+        results["cache_warm_s"] = time.perf_counter() - start
+        start = time.perf_counter()
+        shared_wavetables(store_dir=os.path.join(cache_dir, "store"))
+        results["store_cold_s"] = time.perf_counter() - start
+        start = time.perf_counter()
+        shared_wavetables(store_dir=os.path.join(cache_dir, "store"))
+        results["store_attach_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        VoicePool(wavetables, sample_rate, equal_temperament_increments(sample_rate))
+        results["voice_pool_s"] = time.perf_counter() - start
+        del wavetables
+    return results
+
+def time_callback(engine, waveform, frames, voices, blocks=BLOCKS, warmup=WARMUP_BLOCKS):
+    """
+    Drive the engine's audio callback with a fake outdata buffer while
+    `voices` notes are held, and time every block. Returns the summary for
+    one configuration.
+    """
+    engine.voice_pool.all_notes_off()
+    engine.set_waveform(waveform)
+    notes = sorted(set(engine.key_notes.values()))
+    for i in range(voices):
+        engine.voice_pool.note_on(notes[i % len(notes)])
+    callback = engine.audio_callback
+    sample_rate = engine.sample_rate
+
+    outdata = np.zeros((frames, engine.channels), dtype=np.float32)
+    times = np.zeros(blocks, dtype=np.int64)
+    for _ in range(warmup):
+        callback(outdata, frames, None, None)
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(blocks):
+            start = time.perf_counter_ns()
+            callback(outdata, frames, None, None)
+            times[i] = time.perf_counter_ns() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    deadline_ms = frames / sample_rate * 1e3
+    result = {"waveform": waveform, "frames": frames, "voices": voices,
+              "deadline_ms": deadline_ms}
+    result.update(percentiles(times))
+    result["p99_load"] = result["p99_ms"] / deadline_ms
+    return result
+
+def run(waveforms=WAVE_KINDS, block_sizes=BLOCK_SIZES, polyphony=POLYPHONY,
+        sample_rate=SAMPLE_RATE, blocks=BLOCKS, channels=CHANNELS):
+    """
+    Run the start-up and callback benchmarks and return the results as a
+    JSON-serialisable dict.
+    """
+    engine = SynthEngine(sample_rate, backend="null", channels=channels)
+    engine.initialize()
+    results = {
+        "version": BENCHMARK_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "startup": time_startup(sample_rate),
+        "callback": [],
+    }
+    for waveform in waveforms:
+        for frames in block_sizes:
+            for voices in polyphony:
+                results["callback"].append(
+                    time_callback(engine, waveform, frames, voices, blocks))
+    return results
+
+# ----------------------------
+# Reporting
+# ----------------------------
+def report(results, baseline=None, file=sys.stdout):
+    """
+    Print the results as a table. With a `baseline` (an earlier result dict)
+    the p99 column is followed by the ratio against the same configuration.
+    """
+    def key(row):
+        return (row["waveform"], row["frames"], row["voices"])
+    previous = {key(row): row for row in baseline["callback"]} if baseline else {}
+
+    print("Start-up:", file=file)
+    for name, seconds in results["startup"].items():
+        print(f"  {name:<20} {seconds * 1e3:9.2f} ms", file=file)
+    print(file=file)
+    print(f"{'waveform':<9} {'frames':>6} {'voices':>6} {'deadline':>9} "
+          f"{'p50':>8} {'p99':>8} {'max':>8} {'load':>6}", file=file)
+    for row in results["callback"]:
+        line = (f"{row['waveform']:<9} {row['frames']:>6} {row['voices']:>6} "
+                f"{row['deadline_ms']:>7.2f}ms {row['p50_ms']:>6.3f}ms {row['p99_ms']:>6.3f}ms "
+                f"{row['max_ms']:>6.3f}ms {row['p99_load']:>5.0%}")
+        if key(row) in previous:
+            line += f"  x{row['p99_ms'] / previous[key(row)]['p99_ms']:.2f} vs baseline"
+        print(line, file=file)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the synth's start-up and audio callback.")
+    parser.add_argument("--waveform", action="append", choices=WAVE_KINDS + ("pulse",),
+                        help="waveform to benchmark (repeatable, default: all)")
+    parser.add_argument("--frames", type=int, action="append", help="block size (repeatable)")
+    parser.add_argument("--voices", type=int, action="append", help="held notes (repeatable)")
+    parser.add_argument("--blocks", type=int, default=BLOCKS, help="timed callbacks per configuration")
+    parser.add_argument("--sample-rate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--channels", type=int, default=CHANNELS, help="output channels")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="earlier --json results to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(args.waveform or WAVE_KINDS, args.frames or BLOCK_SIZES,
+                  args.voices or POLYPHONY, args.sample_rate, args.blocks, args.channels)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
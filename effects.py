@@ -0,0 +1,516 @@
+import time
+
+import numpy as np
+
+# ----------------------------
+# Effects Configuration
+# ----------------------------
+MAX_FRAMES = 4096         # Largest block the scratch buffers can hold
+FILTER_CHUNK = 32         # Samples per chunk of the block-wise filter solution
+FILTER_CHUNKS = 16        # Chunks solved together (FILTER_CHUNK * FILTER_CHUNKS per pass)
+FILTER_CUTOFF = 4000.0    # Hz
+FILTER_RESONANCE = 0.707  # Q; higher values ring at the cutoff
+DELAY_TIME = 0.3          # seconds
+DELAY_FEEDBACK = 0.35     # Fraction of each echo fed back
+MAX_DELAY_TIME = 2.0      # seconds of delay line
+MIN_DELAY_TIME = 0.001    # seconds; shorter delays would need tiny segments
+REVERB_ROOM = 0.84        # Comb feedback (decay time)
+REVERB_TONE = 5000.0      # Hz, low-pass on the reverb's output
+EFFECT_MIX = 0.25         # Wet level of the delay and reverb
+
+# Freeverb tunings at 44.1 kHz, scaled to the sample rate
+COMB_DELAYS = (1116, 1188, 1277, 1356, 1422, 1491, 1557, 1617)
+ALLPASS_DELAYS = (556, 441, 341, 225)
+ALLPASS_FEEDBACK = 0.5
+STEREO_SPREAD = 23        # Extra samples of delay per channel, decorrelating them
+
+def _frames_view(block):
+    """
+    (frames, channels) view of a 1-D or interleaved block.
+    """
+    return block[:, None] if block.ndim == 1 else block
+
+# ----------------------------
+# State-Variable Filter
+# ----------------------------
+def svf_state_space(cutoff, resonance, sample_rate, mode="lowpass"):
+    """
+    Trapezoidal (zero-delay feedback) state-variable filter as a linear
+    state-space system s' = A s + B x, y = C s + D x over its two
+    integrator states. `cutoff` and `resonance` may be arrays, giving one
+    system per element. Returns (A, B, C, D) with shapes (..., 2, 2),
+    (..., 2), (..., 2) and (...).
+    """
+    cutoff = np.clip(np.asarray(cutoff, dtype=np.float64), 1.0, 0.49 * sample_rate)
+    g = np.tan(np.pi * cutoff / sample_rate)
+    k = 1.0 / np.maximum(resonance, 0.05)
+    a1 = 1.0 / (1.0 + g * (g + k))
+    a2 = g * a1
+    a3 = g * a2
+    A = np.stack([np.stack([2 * a1 - 1, -2 * a2], -1), np.stack([2 * a2, 1 - 2 * a3], -1)], -2)
+    B = np.stack([2 * a2, 2 * a3], -1)
+    # v1 (band-pass) and v2 (low-pass) in terms of the states and input
+    v1 = np.stack([a1, -a2], -1), a2
+    v2 = np.stack([a2, 1 - a3], -1), a3
+    if mode == "lowpass":
+        C, D = v2
+    elif mode == "bandpass":
+        C, D = v1
+    elif mode == "highpass":
+        C = -np.asarray(k)[..., None] * v1[0] - v2[0]
+        D = 1.0 - k * v1[1] - v2[1]
+    else:
+        raise ValueError(f"Unknown filter mode: {mode}")
+    return A, B, C, np.asarray(D, dtype=np.float64)
+
+def _chunk_indices(chunk, chunks):
+    lags = np.arange(chunk)[:, None] - np.arange(chunk)
+    toeplitz = np.where(lags >= 0, lags + 1, 0)
+    later = np.arange(chunks + 1)[:, None] - np.arange(chunks)
+    block = np.where(later > 0, later, 0)
+    # Entry (2c + i, 2j + k) is element (i, k) of step power c - 1 - j
+    chain = (block[:, None, :, None] * 4 + np.arange(2)[None, :, None, None] * 2
+             + np.arange(2)[None, None, None, :])
+    return toeplitz, chain.reshape(2 * (chunks + 1), 2 * chunks)
+
+_CHUNK_INDICES = {}
+
+def chunk_indices(chunk=FILTER_CHUNK, chunks=FILTER_CHUNKS):
+    """
+    Gather indices that lay out the Toeplitz and chain matrices from the
+    impulse and steps of chunk_parts().
+    """
+    if (chunk, chunks) not in _CHUNK_INDICES:
+        _CHUNK_INDICES[chunk, chunks] = _chunk_indices(chunk, chunks)
+    return _CHUNK_INDICES[chunk, chunks]
+
+def chunk_parts(A, B, C, D, chunk=FILTER_CHUNK, chunks=FILTER_CHUNKS):
+    """
+    The compact pieces chunk_matrices() is laid out from (batched over any
+    leading dimensions):
+
+      impulse     (chunk + 1,)          0, then the impulse response h[0 .. chunk-1]
+      from_state  (chunk, 2)            response to the state a chunk starts in
+      to_state    (2, chunk)            state a chunk's input leaves behind
+      steps       (chunks + 2, 2, 2)    0, then A^(chunk n) for n = 0 .. chunks
+      powers      (chunk + 1, 2, 2)     A^n, for a shorter last chunk
+    """
+    batch = A.shape[:-2]
+    # A^n by repeated doubling: powers k+1 .. 2k are A^k times powers 1 .. k
+    powers = np.empty(batch + (chunk + 1, 2, 2))
+    powers[..., 0, :, :] = np.eye(2)
+    powers[..., 1, :, :] = A
+    known = 1
+    while known < chunk:
+        count = min(known, chunk - known)
+        np.matmul(powers[..., known:known + 1, :, :], powers[..., 1:count + 1, :, :],
+                  out=powers[..., known + 1:known + count + 1, :, :])
+        known += count
+    # A^n B, and the impulse response h[0] = D, h[n] = C A^(n-1) B
+    driven = np.matmul(powers[..., :chunk, :, :], B[..., None, :, None])[..., 0]
+    impulse = np.zeros(batch + (chunk + 1,))
+    impulse[..., 1] = D
+    impulse[..., 2:] = np.matmul(driven[..., :chunk - 1, :], C[..., :, None])[..., 0]
+    from_state = np.matmul(C[..., None, None, :], powers[..., :chunk, :, :])[..., 0, :]
+    to_state = np.ascontiguousarray(np.swapaxes(driven[..., ::-1, :], -1, -2))
+    steps = np.zeros(batch + (chunks + 2, 2, 2))
+    steps[..., 1, :, :] = np.eye(2)
+    for n in range(2, chunks + 2):
+        np.matmul(powers[..., chunk, :, :], steps[..., n - 1, :, :], out=steps[..., n, :, :])
+    return impulse, from_state, to_state, steps, powers
+
+def chunk_matrices(A, B, C, D, chunk=FILTER_CHUNK, chunks=FILTER_CHUNKS):
+    """
+    Matrices that run the system (A, B, C, D) over `chunks` chunks of
+    `chunk` samples at once (batched over any leading dimensions):
+
+      toeplitz    (chunk, chunk)        zero-state response inside a chunk
+      from_state  (chunk, 2)            response to the state a chunk starts in
+      to_state    (2, chunk)            state a chunk's input leaves behind
+      initial     (2 (chunks + 1), 2)   start state of every chunk from the first
+      chain       (2 (chunks + 1), 2 chunks)  ... and from every earlier chunk
+      powers      (chunk + 1, 2, 2)     A^n, for a shorter last chunk
+    """
+    toeplitz_index, chain_index = chunk_indices(chunk, chunks)
+    impulse, from_state, to_state, steps, powers = chunk_parts(A, B, C, D, chunk, chunks)
+    batch = A.shape[:-2]
+    toeplitz = np.take(impulse, toeplitz_index, axis=-1)
+    # Chunk c starts in A_chunk^c s0 + sum over j < c of A_chunk^(c-1-j) z_j
+    initial = steps[..., 1:, :, :].reshape(batch + (2 * (chunks + 1), 2))
+    chain = np.take(steps.reshape(batch + (-1,)), chain_index, axis=-1)
+    return toeplitz, from_state, to_state, initial, chain, powers
+
+class StateVariableFilter:
+    """
+    Resonant state-variable filter (low-, band- or high-pass) that runs a
+    whole block with a few matrix products instead of a per-sample loop.
+
+    The filter is linear, so inside a chunk of FILTER_CHUNK samples its
+    output is the chunk convolved with the impulse response (a triangular
+    Toeplitz matrix) plus the response to the state it entered with; the
+    state at the next chunk follows the same way. Chaining the chunk states
+    is itself one matrix product, so a pass of FILTER_CHUNKS chunks costs a
+    handful of BLAS calls. The result is exact (like scipy.signal.lfilter
+    with its zi carried between calls), the two integrator states persist
+    between blocks, and nothing is allocated per block.
+
+    set() may be called from any thread: the matrices are designed there
+    and swapped in as one tuple, picked up at the next block.
+    """
+    def __init__(self, sample_rate, cutoff=FILTER_CUTOFF, resonance=FILTER_RESONANCE,
+                 mode="lowpass", channels=1, max_frames=MAX_FRAMES):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.enabled = True
+        self.reset_requests = 0   # Resets asked for by EffectsChain.enable()
+        self.resets_done = 0      # ... and carried out by the audio thread
+        chunk, chunks = FILTER_CHUNK, FILTER_CHUNKS
+        self._state = np.zeros((2, channels))
+        self._input = np.empty((chunks * chunk, channels))
+        self._output = np.empty((chunks * chunk, channels))
+        self._chunk_states = np.empty((2 * (chunks + 1), channels))
+        self._ends = np.empty((chunks, 2, channels))
+        self._carry = np.empty((chunks, chunk, channels))
+        self._chained = np.empty((2 * (chunks + 1), channels))
+        self._tail_state = np.empty((2, channels))
+        self.set(cutoff, resonance, mode)
+
+    def set(self, cutoff=None, resonance=None, mode=None):
+        """
+        Change the cutoff (Hz), resonance (Q) or mode.
+        """
+        design = getattr(self, "_design", None)
+        if design is not None:
+            cutoff = design[0] if cutoff is None else cutoff
+            resonance = design[1] if resonance is None else resonance
+            mode = design[2] if mode is None else mode
+        matrices = chunk_matrices(*svf_state_space(cutoff, resonance, self.sample_rate, mode))
+        self._design = (cutoff, resonance, mode) + matrices
+
+    @property
+    def cutoff(self):
+        return self._design[0]
+
+    @property
+    def resonance(self):
+        return self._design[1]
+
+    def settings(self):
+        """
+        Keyword arguments that build a filter with the same settings.
+        """
+        return {"cutoff": self._design[0], "resonance": self._design[1], "mode": self._design[2]}
+
+    def reset(self):
+        self._state[:] = 0.0
+
+    def process(self, block):
+        """
+        Filter `block` (float32, 1-D or frames x channels) in place.
+        """
+        frame_block = _frames_view(block)
+        frames = frame_block.shape[0]
+        span = FILTER_CHUNK * FILTER_CHUNKS
+        for start in range(0, frames, span):
+            self._process(frame_block[start:start + span])
+        return block
+
+    def _process(self, frame_block):
+        _, _, _, toeplitz, from_state, to_state, initial, chain, powers = self._design
+        chunk = FILTER_CHUNK
+        frames = frame_block.shape[0]
+        full = frames // chunk
+        tail = frames - full * chunk
+        state = self._state
+        x = self._input[:frames]
+        y = self._output[:frames]
+        x[:] = frame_block
+
+        if full:
+            chunks_in = x[:full * chunk].reshape(full, chunk, -1)
+            chunks_out = y[:full * chunk].reshape(full, chunk, -1)
+            # Zero-state response of every chunk, and the state each leaves behind
+            np.matmul(toeplitz, chunks_in, out=chunks_out)
+            ends = self._ends[:full]
+            np.matmul(to_state, chunks_in, out=ends)
+            # State at the start of every chunk (and after the last)
+            states = self._chunk_states[:2 * (full + 1)]
+            np.matmul(initial[:2 * (full + 1)], state, out=states)
+            chained = self._chained[:2 * (full + 1)]
+            np.matmul(chain[:2 * (full + 1), :2 * full], ends.reshape(2 * full, -1), out=chained)
+            states += chained
+            carry = self._carry[:full]
+            np.matmul(from_state, states[:2 * full].reshape(full, 2, -1), out=carry)
+            chunks_out += carry
+            state[:] = states[2 * full:]
+        if tail:
+            x_tail = x[full * chunk:]
+            y_tail = y[full * chunk:]
+            np.matmul(toeplitz[:tail, :tail], x_tail, out=y_tail)
+            carry = self._carry[0, :tail]
+            np.matmul(from_state[:tail], state, out=carry)
+            y_tail += carry
+            tail_state = self._tail_state
+            np.matmul(to_state[:, chunk - tail:], x_tail, out=tail_state)
+            np.matmul(powers[tail], state, out=state)
+            state += tail_state
+        np.copyto(frame_block, y, casting="unsafe")
+
+# ----------------------------
+# Delay Lines
+# ----------------------------
+class DelayLines:
+    """
+    A bank of delay lines in one ring buffer: one column per line, each
+    with its own delay in samples. read() returns, for the next n samples,
+    what was written `delay` samples earlier in every column; write() then
+    appends them. As long as n is no longer than the shortest delay, a
+    whole segment of a recursive delay network (comb, all-pass, echo) is a
+    few vectorised array operations.
+    """
+    def __init__(self, delays, max_frames=MAX_FRAMES):
+        self.delays = np.asarray(delays, dtype=np.intp)
+        self.columns = len(self.delays)
+        self.length = int(self.delays.max()) + max_frames
+        self.ring = np.zeros((self.length, self.columns), dtype=np.float32)
+        self._flat = self.ring.reshape(-1)
+        # Indices into the flattened ring; take/put wrap them around its
+        # end, which wraps every column's row index by the ring length
+        self._ramp = np.arange(max_frames, dtype=np.intp)[:, None] * self.columns
+        self._column = np.arange(self.columns, dtype=np.intp)
+        self._index = np.empty((max_frames, self.columns), dtype=np.intp)
+        self._base = np.empty(self.columns, dtype=np.intp)
+        self.position = 0
+
+    @property
+    def shortest(self):
+        return int(self.delays.min())
+
+    def reset(self):
+        self.ring[:] = 0.0
+
+    def read(self, frames, out):
+        index = self._index[:frames]
+        base = self._base
+        np.subtract(self.position, self.delays, out=base)
+        np.multiply(base, self.columns, out=base)
+        np.add(base, self._column, out=base)
+        np.add(self._ramp[:frames], base, out=index)
+        np.take(self._flat, index, out=out, mode="wrap")
+        return out
+
+    def write(self, values):
+        frames = values.shape[0]
+        index = self._index[:frames]
+        np.add(self._ramp[:frames], self.position * self.columns + self._column, out=index)
+        np.put(self._flat, index, values, mode="wrap")
+        self.position = (self.position + frames) % self.length
+
+class FeedbackDelay:
+    """
+    Echo: each repeat comes `time` seconds after the last, `feedback` times
+    as loud. Blocks longer than the delay (or than max_frames) are run in
+    segments.
+    """
+    def __init__(self, sample_rate, time=DELAY_TIME, feedback=DELAY_FEEDBACK, mix=EFFECT_MIX,
+                 channels=1, max_time=MAX_DELAY_TIME, max_frames=MAX_FRAMES):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.feedback = feedback
+        self.mix = mix
+        self.enabled = True
+        self.reset_requests = 0
+        self.resets_done = 0
+        self.max_delay = int(max_time * sample_rate)
+        self.max_frames = max_frames
+        self.lines = DelayLines([self.max_delay] * channels, max_frames)
+        self._echo = np.empty((max_frames, channels), dtype=np.float32)
+        self._feed = np.empty((max_frames, channels), dtype=np.float32)
+        self.set_time(time)
+
+    def set_time(self, seconds):
+        delay = int(min(max(seconds, MIN_DELAY_TIME), self.max_delay / self.sample_rate)
+                    * self.sample_rate)
+        self.lines.delays[:] = delay
+
+    def settings(self):
+        return {"time": self.lines.shortest / self.sample_rate, "feedback": self.feedback,
+                "mix": self.mix, "max_time": self.max_delay / self.sample_rate}
+
+    def reset(self):
+        self.lines.reset()
+
+    def process(self, block):
+        frame_block = _frames_view(block)
+        frames = frame_block.shape[0]
+        segment = min(self.lines.shortest, self.max_frames)
+        for start in range(0, frames, segment):
+            dry = frame_block[start:start + segment]
+            n = dry.shape[0]
+            echo = self.lines.read(n, self._echo[:n])
+            feed = self._feed[:n]
+            np.multiply(echo, self.feedback, out=feed)
+            feed += dry
+            self.lines.write(feed)
+            echo *= self.mix
+            dry += echo
+        return block
+
+# ----------------------------
+# Reverb
+# ----------------------------
+class Reverb:
+    """
+    Schroeder/Freeverb-style reverb: eight parallel feedback combs feed
+    four all-passes in series, followed by a low-pass that sets the tone.
+    Every channel gets its own, slightly longer, delays so stereo output
+    is decorrelated. All eight combs of every channel live in one
+    DelayLines bank and run together; the all-passes run in segments of
+    their delay.
+    """
+    def __init__(self, sample_rate, room=REVERB_ROOM, tone=REVERB_TONE, mix=EFFECT_MIX,
+                 channels=1, max_frames=MAX_FRAMES):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.room = room
+        self.mix = mix
+        self.enabled = True
+        self.reset_requests = 0
+        self.resets_done = 0
+        self.max_frames = max_frames
+        scale = sample_rate / 44100.0
+        spread = np.arange(channels) * STEREO_SPREAD
+
+        def scaled(delays):
+            return (np.round(np.add.outer(delays, spread) * scale)).astype(np.intp)
+
+        # Columns are (comb, channel) pairs
+        self.combs = DelayLines(scaled(COMB_DELAYS).reshape(-1), max_frames)
+        self.allpasses = [DelayLines(row, max_frames) for row in scaled(ALLPASS_DELAYS)]
+        self.tone = StateVariableFilter(sample_rate, tone, FILTER_RESONANCE, channels=channels,
+                                        max_frames=max_frames)
+        self._input = np.empty((max_frames, channels), dtype=np.float32)
+        self._comb_out = np.empty((max_frames, len(COMB_DELAYS) * channels), dtype=np.float32)
+        self._comb_in = np.empty((max_frames, len(COMB_DELAYS) * channels), dtype=np.float32)
+        self._wet = np.empty((max_frames, channels), dtype=np.float32)
+        self._delayed = np.empty((max_frames, channels), dtype=np.float32)
+        self._feed = np.empty((max_frames, channels), dtype=np.float32)
+
+    def settings(self):
+        return {"room": self.room, "tone": self.tone.cutoff, "mix": self.mix}
+
+    def reset(self):
+        self.combs.reset()
+        for allpass in self.allpasses:
+            allpass.reset()
+        self.tone.reset()
+
+    def process(self, block):
+        frame_block = _frames_view(block)
+        frames = frame_block.shape[0]
+        segment = min(self.combs.shortest, self.max_frames)
+        for start in range(0, frames, segment):
+            self._process(frame_block[start:start + segment])
+        return block
+
+    def _process(self, frame_block):
+        frames, channels = frame_block.shape
+        combs = len(COMB_DELAYS)
+        # Scaled input, as Freeverb does, so the combs' sum stays in range
+        source = self._input[:frames]
+        np.multiply(frame_block, 1.0 / combs, out=source)
+
+        comb_out = self.combs.read(frames, self._comb_out[:frames])
+        comb_in = self._comb_in[:frames]
+        np.multiply(comb_out, self.room, out=comb_in)
+        by_comb = comb_in.reshape(frames, combs, channels)
+        by_comb += source[:, None, :]
+        self.combs.write(comb_in)
+        wet = self._wet[:frames]
+        np.sum(comb_out.reshape(frames, combs, channels), axis=1, out=wet)
+
+        for allpass in self.allpasses:
+            segment = allpass.shortest
+            for start in range(0, frames, segment):
+                x = wet[start:start + segment]
+                n = x.shape[0]
+                delayed = allpass.read(n, self._delayed[:n])
+                feed = self._feed[:n]
+                np.multiply(delayed, ALLPASS_FEEDBACK, out=feed)
+                feed += x
+                allpass.write(feed)
+                feed *= -ALLPASS_FEEDBACK
+                np.add(delayed, feed, out=x)
+
+        self.tone.process(wet)
+        wet *= self.mix
+        frame_block += wet
+
+# ----------------------------
+# Effects Chain
+# ----------------------------
+class EffectsChain:
+    """
+    Ordered effects run in place on every block, between the voice mix and
+    the mix bus. Each effect has process(block), reset(), settings() and
+    an `enabled` flag; enable() switches one on from any thread and has the audio thread
+    clear its state before its first block. The list is swapped in as one tuple, so effects can be added or
+    removed from any thread. timings holds the nanoseconds each effect took
+    in the last block, so the cost of the chain is always measurable.
+    """
+    def __init__(self, effects=()):
+        self._slots = (tuple(effects), np.zeros(len(effects), dtype=np.int64))
+
+    @property
+    def effects(self):
+        return self._slots[0]
+
+    @property
+    def timings(self):
+        return self._slots[1]
+
+    def set_effects(self, effects):
+        self._slots = (tuple(effects), np.zeros(len(effects), dtype=np.int64))
+
+    def add(self, effect):
+        self.set_effects(self.effects + (effect,))
+        return effect
+
+    def remove(self, effect):
+        self.set_effects(tuple(e for e in self.effects if e is not effect))
+
+    def reset(self):
+        for effect in self.effects:
+            effect.reset()
+
+    def enable(self, effect, enabled=True):
+        """
+        Switch `effect` on or off. Switching it on asks the audio thread to
+        reset it before it next runs, so it does not replay the echoes it
+        held when it was switched off.
+        """
+        if enabled and not effect.enabled:
+            effect.reset_requests += 1
+        effect.enabled = enabled
+
+    def process(self, block):
+        effects, timings = self._slots
+        for i, effect in enumerate(effects):
+            if effect.enabled:
+                requested = effect.reset_requests
+                if requested != effect.resets_done:
+                    effect.reset()
+                    effect.resets_done = requested
+                start = time.perf_counter_ns()
+                effect.process(block)
+                timings[i] = time.perf_counter_ns() - start
+            else:
+                timings[i] = 0
+        return block
+
+# Effects the engine can build by name
+EFFECTS = {
+    "filter": StateVariableFilter,
+    "delay": FeedbackDelay,
+    "reverb": Reverb,
+}
@@ -0,0 +1,444 @@
+import threading
+import time
+
+from keymap import KEY_FREQUENCIES, KEY_NOTES
+from tuning import A4_FREQUENCY, TUNING_ROOT
+
+# ----------------------------
+# Engine Configuration
+# ----------------------------
+SAMPLE_RATE = None        # Hz; None renders at the audio backend's native rate
+CHANNELS = 2              # Output channels; voices are panned across them
+ATTACK_DURATION = 0.05    # seconds
+DECAY_DURATION = 0.1      # seconds
+SUSTAIN_LEVEL = 0.8       # fraction of the peak level
+RELEASE_DURATION = 0.1    # seconds
+
+class SynthEngine:
+    """
+    The synth without a front-end: oscillators, key map, voice pool mixer,
+    recorder and audio output behind explicit start() and stop().
+
+    Importing this module only loads the standard library and the key map.
+    NumPy, the wavetables and the voice pool are set up the first time they
+    are needed (start(), a note, or an explicit initialize()), and the audio
+    backend is opened by start(), so the engine can be created cheaply and
+    embedded in any process. Key and recorder methods may be called from any
+    thread; notes reach the audio thread through a lock-free event queue.
+
+    Unless a sample rate is given, initialize() asks the backend for the
+    device's native rate and builds the tables, increments and envelope for
+    it, so the host audio stack never has to resample the stream.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE, backend="sounddevice", waveform="saw",
+                 attack=ATTACK_DURATION, decay=DECAY_DURATION, sustain=SUSTAIN_LEVEL,
+                 release=RELEASE_DURATION, key_frequencies=KEY_FREQUENCIES, key_notes=KEY_NOTES,
+                 backend_options=None, render_workers=0, blocksize=512, channels=CHANNELS):
+        self.sample_rate = sample_rate
+        self.backend_name = backend
+        self.backend_options = backend_options or {}
+        self.waveform = waveform
+        self.envelope = (attack, decay, sustain, release)
+        self.key_frequencies = key_frequencies
+        self.key_notes = key_notes
+        # With render_workers > 0 voices are mixed on worker processes
+        # (parallel_render.py) and the stream runs at a fixed blocksize
+        self.render_workers = render_workers
+        self.blocksize = blocksize
+        self.channels = channels
+        self.backend_options.setdefault("channels", channels)
+
+        # Recorder: an EventLog streaming to recording_*.events, created when
+        # recording first starts (empty until then)
+        self.recording = []
+        self.is_recording = False
+        # Keys currently held down
+        self.active_keys = set()
+
+        self.voice_pool = None
+        self.mix_bus = None
+        self.effects = None
+        # Settings of the per-voice filters (set_voice_filter()), None when off
+        self.voice_filter = None
+        self.instrument = None
+        self.backend = None
+        self.midi_inputs = []
+        self.midi_output = None
+        self._init_lock = threading.Lock()
+
+    # ----------------------------
+    # Lifecycle
+    # ----------------------------
+    def initialize(self):
+        """
+        Build everything the audio callback needs. Runs once; start() and the
+        note methods call it on first use.
+        """
+        if self.voice_pool is not None:
+            return
+        with self._init_lock:
+            if self.voice_pool is not None:
+                return
+            from keymap import note_increments
+            from table_store import shared_wavetables
+            from voice_pool import VoicePool
+            from event_queue import EventQueue
+            from mix_bus import MixBus
+            from effects import EffectsChain
+            from sequencer import Sequencer
+            from telemetry import CallbackTelemetry, TelemetryReader
+
+            if self.sample_rate is None:
+                from backends import native_sample_rate
+                self.sample_rate = native_sample_rate(self.backend_name, **self.backend_options)
+            self.note_increments = note_increments(self.key_frequencies, self.key_notes,
+                                                   self.sample_rate)
+            # Band-limited tables mapped from the host-wide table store, so
+            # every synth process on the machine shares one copy
+            self.wavetables = shared_wavetables()
+            attack, decay, sustain, release = self.envelope
+            self.note_events = EventQueue()
+            # One single-producer queue per input thread (keys, each MIDI port)
+            self.event_sources = (self.note_events,)
+            self.sequencer = Sequencer(self.sample_rate)
+            self.telemetry = CallbackTelemetry(self.sample_rate)
+            # The pools sum their voices raw; the bus compensates for
+            # polyphony smoothly and limits the peaks
+            self.mix_bus = MixBus(self.sample_rate, channels=self.channels)
+            self.effects = EffectsChain()
+            if self.render_workers:
+                from parallel_render import ParallelVoicePool
+                self.backend_options.setdefault("blocksize", self.blocksize)
+                self.voice_pool = ParallelVoicePool(
+                    self.sample_rate, self.note_increments, self.waveform,
+                    workers=self.render_workers, block_size=self.backend_options["blocksize"],
+                    attack=attack, decay=decay, sustain=sustain, release=release,
+                    normalize=False, channels=self.channels)
+            else:
+                self.voice_pool = VoicePool(self.wavetables, self.sample_rate,
+                                            self.note_increments, self.waveform, attack=attack,
+                                            decay=decay, sustain=sustain, release=release,
+                                            normalize=False, channels=self.channels)
+            self.telemetry_reader = TelemetryReader(self.telemetry,
+                                                    max_voices=self.voice_pool.max_voices)
+
+    def start(self):
+        """
+        Open the audio backend and start rendering.
+        """
+        if self.backend is not None:
+            return
+        self.initialize()
+        from backends import open_backend
+        self.backend = open_backend(self.backend_name,
+                                    self.telemetry.instrument(self.audio_callback, self.voice_pool),
+                                    self.sample_rate, **self.backend_options)
+        self.backend.start()
+        self.telemetry_reader.start()
+
+    def stop(self):
+        """
+        Close the audio backend. The engine can be started again.
+        """
+        if self.backend is None:
+            return
+        self.backend.close()
+        self.backend = None
+        self.telemetry_reader.stop()
+
+    def close(self):
+        """
+        Stop the engine, close MIDI ports and shut down any render worker
+        processes.
+        """
+        self.stop()
+        # An EventLog with no events yet is falsy but still holds its file open
+        if hasattr(self.recording, "close"):
+            self.recording.close()
+        for midi_input in self.midi_inputs:
+            midi_input.close()
+        if self.midi_output is not None:
+            self.midi_output.close()
+        if self.voice_pool is not None and hasattr(self.voice_pool, "close"):
+            self.voice_pool.close()
+
+    @property
+    def running(self):
+        return self.backend is not None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def audio_callback(self, outdata, frames, time_info, status):
+        """
+        The sounddevice callback: apply queued and recorded events at their
+        sample offsets, mix every voice (panned) straight into the
+        interleaved outdata, then run the effects chain and the mix bus.
+        """
+        for events in self.event_sources:
+            events.dispatch(self.voice_pool, frames, self.sample_rate)
+        self.sequencer.dispatch(self.voice_pool, frames)
+        self.voice_pool.render(outdata)
+        self.effects.process(outdata)
+        self.mix_bus.process(outdata, self.voice_pool.energy())
+
+    # ----------------------------
+    # Playing
+    # ----------------------------
+    def note_on(self, note, velocity=1.0):
+        self.initialize()
+        if self.midi_output is not None:
+            self.midi_output.note_on(note, velocity)
+        return self.note_events.note_on(note, velocity)
+
+    def note_off(self, note):
+        self.initialize()
+        if self.midi_output is not None:
+            self.midi_output.note_off(note)
+        return self.note_events.note_off(note)
+
+    def pitch_bend(self, semitones):
+        self.initialize()
+        if self.midi_output is not None:
+            self.midi_output.pitch_bend(semitones)
+        return self.note_events.pitch_bend(semitones)
+
+    def sustain(self, down):
+        self.initialize()
+        if self.midi_output is not None:
+            self.midi_output.sustain(down)
+        return self.note_events.sustain(down)
+
+    def pressure(self, note, value):
+        """
+        Aftertouch on `note`, or on every sounding note if `note` is -1.
+        """
+        self.initialize()
+        if self.midi_output is not None:
+            self.midi_output.pressure(note, value)
+        return self.note_events.pressure(note, value)
+
+    def press_key(self, key):
+        """
+        Start the note mapped to computer key `key` (a character). Repeated
+        presses of a held key are ignored. Returns True if a note started.
+        """
+        if key not in self.key_notes or key in self.active_keys:
+            return False
+        self.active_keys.add(key)
+        self.note_on(self.key_notes[key])
+        if self.is_recording:
+            from event_queue import NOTE_ON
+            self.recording.record(NOTE_ON, self.key_notes[key])
+        return True
+
+    def release_key(self, key):
+        if key not in self.active_keys:
+            return False
+        self.active_keys.discard(key)
+        self.note_off(self.key_notes[key])
+        if self.is_recording:
+            from event_queue import NOTE_OFF
+            self.recording.record(NOTE_OFF, self.key_notes[key])
+        return True
+
+    def set_waveform(self, waveform):
+        """
+        Switch every voice to `waveform` (saw, square, pulse, triangle, cos,
+        or sample once load_instrument() has been called).
+        """
+        self.waveform = waveform
+        if self.voice_pool is not None:
+            self.voice_pool.set_waveform(waveform)
+
+    def set_tuning(self, tuning="equal", a4=A4_FREQUENCY, root=TUNING_ROOT):
+        """
+        Retune every note: "equal" (12-tone equal temperament), "just" (5-limit
+        just intonation on `root`), or the path of a Scala .scl file, with A4
+        at `a4` Hz. The whole table is computed here and handed to the voice
+        pool in one swap; no wavetables are rebuilt.
+        """
+        self.initialize()
+        from tuning import tuning_increments
+        self.note_increments = tuning_increments(tuning, self.sample_rate, a4, root)
+        self.voice_pool.set_note_increments(self.note_increments)
+
+    def add_effect(self, kind, **options):
+        """
+        Append an effect ("filter", "delay" or "reverb", see effects.py) to
+        the master chain. Returns the effect, whose settings can be changed
+        while it plays.
+        """
+        self.initialize()
+        from effects import EFFECTS
+        effect = EFFECTS[kind](self.sample_rate, channels=self.channels, **options)
+        return self.effects.add(effect)
+
+    def set_voice_filter(self, cutoff, resonance=None, key_tracking=None, envelope_amount=None):
+        """
+        Give every voice its own resonant low-pass (voice_filter.py): `cutoff`
+        in Hz at middle C, moved by key tracking and opened by the envelope.
+        A cutoff of None removes the filters.
+        """
+        self.initialize()
+        self.voice_pool.set_filter(cutoff, resonance, key_tracking, envelope_amount)
+        self.voice_filter = None if cutoff is None else (cutoff, resonance, key_tracking,
+                                                          envelope_amount)
+
+    def toggle_voice_filter(self):
+        """
+        Switch the per-voice filters on (with default settings) or off.
+        Returns True if they are now on.
+        """
+        if self.voice_filter is not None:
+            self.set_voice_filter(None)
+            return False
+        from voice_filter import VOICE_CUTOFF
+        self.set_voice_filter(VOICE_CUTOFF)
+        return True
+
+    def toggle_effect(self, kind):
+        """
+        Switch the first effect of `kind` on or off, adding it with default
+        settings if the chain has none. Returns True if it is now on.
+        """
+        self.initialize()
+        from effects import EFFECTS
+        for effect in self.effects.effects:
+            if type(effect) is EFFECTS[kind]:
+                self.effects.enable(effect, not effect.enabled)
+                return effect.enabled
+        self.add_effect(kind)
+        return True
+
+    def load_instrument(self, path, root_frequency=None):
+        """
+        Build (or map from the cache) a sample instrument from the single-note
+        recording at `path` and switch to it. The pitch of the recording is
+        detected unless `root_frequency` is given. Returns the SampleBank.
+        """
+        self.initialize()
+        if not hasattr(self.voice_pool, "set_samples"):
+            raise ValueError("Sample instruments need render_workers=0")
+        from sample_instrument import load_instrument
+        self.instrument = load_instrument(path, self.sample_rate, self.key_frequencies,
+                                          self.key_notes, root_frequency)
+        self.voice_pool.set_samples(self.instrument.samples, self.instrument.note_rows,
+                                    self.instrument.lengths)
+        self.set_waveform("sample")
+        return self.instrument
+
+    # ----------------------------
+    # MIDI
+    # ----------------------------
+    def connect_midi_input(self, port=None, virtual=False, **options):
+        """
+        Play the synth from a MIDI input port (name substring or index; the
+        first port by default) or from a new virtual port. Needs
+        python-rtmidi. Returns the MidiInput.
+        """
+        self.initialize()
+        from event_queue import EventQueue
+        from midi_io import MidiInput
+        midi_input = MidiInput(EventQueue(), port, virtual, **options).open()
+        self.midi_inputs.append(midi_input)
+        # Swapped in whole, so the audio thread never sees a half-built tuple
+        self.event_sources = self.event_sources + (midi_input.queue,)
+        return midi_input
+
+    def connect_midi_output(self, port=None, virtual=False, **options):
+        """
+        Echo every note, bend and pedal change played through the engine to
+        a MIDI output port. Returns the MidiOutput.
+        """
+        from midi_io import MidiOutput
+        self.midi_output = MidiOutput(port, virtual, **options).open()
+        return self.midi_output
+
+    # ----------------------------
+    # Recorder
+    # ----------------------------
+    def toggle_recording(self):
+        """
+        Start or stop recording key presses. Events are appended to an event
+        log on disk as they happen (see sequencer.EventLog), so a session of
+        any length uses constant memory. Returns the new state.
+        """
+        if not self.is_recording and isinstance(self.recording, list):
+            self.initialize()
+            from sequencer import EventLog
+            self.recording = EventLog(time.strftime("recording_%Y%m%d-%H%M%S.events"),
+                                      self.sample_rate)
+        self.is_recording = not self.is_recording
+        return self.is_recording
+
+    def play_back(self, start=0.0):
+        """
+        Play the recording back sample-accurately from the audio callback,
+        from `start` seconds in. Returns False if there is nothing to play.
+        """
+        if not self.recording:
+            return False
+        self.initialize()
+        self.sequencer.load_events(self.recording.events())
+        self.sequencer.start(start)
+        return True
+
+    def play_file(self, path, start=0.0):
+        """
+        Play a recording file (.json, .events or a Standard MIDI File) from
+        `start` seconds in.
+        """
+        self.initialize()
+        import numpy as np
+        from sequencer import load_events_file
+        events, sample_rate = load_events_file(path, self.sample_rate)
+        if sample_rate != self.sample_rate:
+            sample_time = np.round(events[0] * (self.sample_rate / sample_rate)).astype(np.int64)
+            events = (sample_time,) + tuple(events[1:])
+        self.sequencer.load_events(events)
+        self.sequencer.start(start)
+
+    def stop_playback(self):
+        if self.voice_pool is not None:
+            self.sequencer.stop()
+
+    def export_recording(self, name=None, on_done=None):
+        """
+        Save the recording as a Standard MIDI File `name`.mid and render it
+        to `name`.wav on a background thread, faster than real time and
+        without touching the audio stream. Both read the memory-mapped event
+        log in chunks. The render uses the voice filter and the enabled
+        effects as they are set when the export starts. `on_done(frames)` is called when the files are
+        written. Returns the thread, or None if there is nothing to export.
+        """
+        if not self.recording:
+            return None
+        self.initialize()
+        from midi_file import write_midi
+        from offline_render import render_to_file
+
+        if name is None:
+            name = time.strftime("recording_%Y%m%d-%H%M%S")
+        events = self.recording.events()
+        waveform = self.voice_pool.waveform
+        voice_filter = self.voice_filter
+        effects = [(type(effect), effect.settings()) for effect in self.effects.effects
+                   if effect.enabled]
+
+        def export_function():
+            write_midi(name + ".mid", events, self.sample_rate)
+            frames = render_to_file(events, name + ".wav", self.sample_rate, waveform,
+                                    self.note_increments, self.instrument,
+                                    channels=self.channels, voice_filter=voice_filter,
+                                    effects=effects)
+            if on_done is not None:
+                on_done(frames)
+
+        thread = threading.Thread(target=export_function, daemon=True)
+        thread.start()
+        return thread
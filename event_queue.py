@@ -0,0 +1,108 @@
+import time
+import numpy as np
+
+# ----------------------------
+# Event Queue Configuration
+# ----------------------------
+EVENT_CAPACITY = 1024     # Events the ring can hold (power of two)
+
+# Event kinds
+NOTE_ON = 1
+NOTE_OFF = 2
+PITCH_BEND = 3            # value: semitones
+SUSTAIN = 4               # value: 1.0 pedal down, 0.0 up
+PRESSURE = 5              # value: aftertouch 0..1; note -1 for channel pressure
+
+class EventQueue:
+    """
+    Single-producer / single-consumer ring buffer of timestamped note events.
+    The keyboard listener thread pushes, the audio callback drains (every
+    other producer, such as MIDI input, gets a queue of its own). Each side
+    only ever writes its own index, and the producer publishes an event by
+    bumping write_index after the payload is stored, so no lock is needed and
+    the audio thread never waits on the listener.
+    """
+    def __init__(self, capacity=EVENT_CAPACITY):
+        if capacity & (capacity - 1):
+            raise ValueError("Event queue capacity must be a power of two")
+        self.capacity = capacity
+        self._mask = capacity - 1
+        self.timestamp = np.zeros(capacity, dtype=np.float64)
+        self.kind = np.zeros(capacity, dtype=np.int8)
+        self.note = np.zeros(capacity, dtype=np.int32)
+        self.value = np.zeros(capacity, dtype=np.float32)
+        self.write_index = 0
+        self.read_index = 0
+
+    def __len__(self):
+        return self.write_index - self.read_index
+
+    # ----------------------------
+    # Producer Side
+    # ----------------------------
+    def push(self, kind, note, value=1.0, timestamp=None):
+        """
+        Queue an event stamped with time.perf_counter() (or `timestamp`).
+        Returns False if the ring is full and the event was dropped.
+        """
+        write = self.write_index
+        if write - self.read_index >= self.capacity:
+            return False
+        slot = write & self._mask
+        self.timestamp[slot] = time.perf_counter() if timestamp is None else timestamp
+        self.kind[slot] = kind
+        self.note[slot] = note
+        self.value[slot] = value
+        self.write_index = write + 1
+        return True
+
+    def note_on(self, note, velocity=1.0):
+        return self.push(NOTE_ON, note, velocity)
+
+    def note_off(self, note):
+        return self.push(NOTE_OFF, note, 0.0)
+
+    def pitch_bend(self, semitones):
+        return self.push(PITCH_BEND, 0, semitones)
+
+    def sustain(self, down):
+        return self.push(SUSTAIN, 0, 1.0 if down else 0.0)
+
+    def pressure(self, note, value):
+        return self.push(PRESSURE, note, value)
+
+    # ----------------------------
+    # Consumer Side
+    # ----------------------------
+    def dispatch(self, pool, frames, sample_rate, now=None):
+        """
+        Apply every queued event to `pool` at a sample offset inside the block
+        about to be rendered. The block is treated as covering the last
+        `frames` samples before `now`, so an event that arrived d seconds ago
+        starts d seconds before the end of the block. Latency is therefore a
+        constant one block and timing jitter does not depend on when the
+        callback happened to run. Returns the number of events applied.
+        """
+        if now is None:
+            now = time.perf_counter()
+        read = self.read_index
+        write = self.write_index
+        count = write - read
+        while read < write:
+            slot = read & self._mask
+            offset = frames - int(round((now - self.timestamp[slot]) * sample_rate))
+            offset = min(max(offset, 0), frames - 1)
+            kind = self.kind[slot]
+            if kind == NOTE_ON:
+                pool.note_on(self.note[slot], self.value[slot], offset)
+            elif kind == NOTE_OFF:
+                pool.note_off(self.note[slot], offset)
+            elif kind == PITCH_BEND:
+                pool.pitch_bend(self.value[slot])
+            elif kind == SUSTAIN:
+                pool.sustain_pedal(self.value[slot] > 0.5, offset)
+            elif kind == PRESSURE:
+                pool.set_pressure(self.note[slot], self.value[slot])
+            read += 1
+        self.read_index = read
+        return count
@@ -0,0 +1,66 @@
+from tuning import equal_temperament, note_frequency
+
+# ----------------------------
+# Key Mapping (Keyboard Layout)
+# ----------------------------
+# White keys: lower row from "z" to "/" and upper row from "q" to "["
+white_lower_keys = list("zxcvbnm,./")  # 10 keys
+white_upper_keys = list("qwertyuiop[]")   # 11 keys
+
+# Notes of the 22 white keys, spanning three octaves (C3 to C6)
+white_notes = [
+    # Octave 1: C3 - B3
+    48, 50, 52, 53, 55, 57, 59,
+    # Octave 2: C4 - B4
+    60, 62, 64, 65, 67, 69, 71,
+    # Octave 3: C5 - C6
+    72, 74, 76, 77, 79, 81, 83, 84
+]
+# Exact equal-tempered frequencies (A4 = 440 Hz)
+white_frequencies = [note_frequency(note) for note in white_notes]
+
+white_keys = {}
+white_keys.update(dict(zip(white_lower_keys, white_frequencies[:10])))
+white_keys.update(dict(zip(white_upper_keys, white_frequencies[10:])))
+
+# Black keys: groups as specified
+black_lower_keys = list("sdghjl;") # 7 keys
+black_upper_keys = list("2346790-") # 8 keys
+
+# Notes of the 15 black keys, spanning three octaves
+black_notes = [
+    # Octave 1: C#3, D#3, F#3, G#3, A#3
+    49, 51, 54, 56, 58,
+    # Octave 2: C#4, D#4, F#4, G#4, A#4
+    61, 63, 66, 68, 70,
+    # Octave 3: C#5, D#5, F#5, G#5, A#5
+    73, 75, 78, 80, 82
+]
+black_frequencies = [note_frequency(note) for note in black_notes]
+
+black_keys = {}
+black_keys.update(dict(zip(black_lower_keys, black_frequencies[:10])))
+black_keys.update(dict(zip(black_upper_keys, black_frequencies[7:])))
+
+# Combine white and black keys
+KEY_FREQUENCIES = {}
+KEY_FREQUENCIES.update(white_keys)
+KEY_FREQUENCIES.update(black_keys)
+
+# MIDI note number of every key (C4 = 60), used to identify voices
+KEY_NOTES = {}
+KEY_NOTES.update(zip(white_lower_keys, white_notes[:10]))
+KEY_NOTES.update(zip(white_upper_keys, white_notes[10:]))
+KEY_NOTES.update(zip(black_lower_keys, black_notes[:10]))
+KEY_NOTES.update(zip(black_upper_keys, black_notes[7:]))
+
+def note_increments(key_frequencies, key_notes, sample_rate):
+    """
+    Phase increment (cycles per sample) of every note, indexed by note
+    number: the keys' frequencies, and equal temperament for every note
+    without a key (MIDI input and playback reach the whole range).
+    """
+    increments = equal_temperament() / sample_rate
+    for key, note in key_notes.items():
+        increments[note] = key_frequencies[key] / sample_rate
+    return increments
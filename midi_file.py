@@ -0,0 +1,219 @@
+import argparse
+import os
+import struct
+import sys
+
+import numpy as np
+
+from event_queue import NOTE_ON, NOTE_OFF, PITCH_BEND, SUSTAIN, PRESSURE
+from midi_io import (PITCH_BEND_RANGE, SUSTAIN_CONTROLLER, STATUS_NOTE_OFF, STATUS_NOTE_ON,
+                     STATUS_CONTROL_CHANGE, STATUS_PITCH_BEND, STATUS_POLY_PRESSURE,
+                     STATUS_CHANNEL_PRESSURE, parse_message)
+
+# ----------------------------
+# MIDI File Configuration
+# ----------------------------
+TICKS_PER_QUARTER = 480   # Resolution of exported files
+TEMPO = 500000            # Microseconds per quarter note (120 bpm) in exported files
+WRITE_CHUNK = 4096        # Events encoded per pass when exporting
+
+def _variable_length(value):
+    """
+    Encode a delta time as a MIDI variable-length quantity.
+    """
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(reversed(out))
+
+# ----------------------------
+# Export
+# ----------------------------
+def write_midi(path, events, sample_rate, channel=0, bend_range=PITCH_BEND_RANGE):
+    """
+    Write sample-indexed events (sample_time, kind, note[, value]) as a
+    format 0 Standard MIDI File at 120 bpm. The events are encoded in chunks
+    and the track length is patched in at the end, so a memory-mapped event
+    log of any length is exported in constant memory.
+    Returns the number of events written.
+    """
+    sample_time, kinds, notes = events[:3]
+    values = events[3] if len(events) > 3 else None
+    ticks_per_second = TICKS_PER_QUARTER * 1e6 / TEMPO
+    with open(path, "wb") as f:
+        f.write(b"MThd" + struct.pack(">IHHH", 6, 0, 1, TICKS_PER_QUARTER))
+        f.write(b"MTrk\0\0\0\0")
+        start = f.tell()
+        f.write(b"\0\xff\x51\x03" + TEMPO.to_bytes(3, "big"))
+        previous = 0
+        written = 0
+        for first in range(0, len(sample_time), WRITE_CHUNK):
+            chunk = slice(first, first + WRITE_CHUNK)
+            ticks = np.round(np.asarray(sample_time[chunk]) * (ticks_per_second / sample_rate))
+            ticks = ticks.astype(np.int64)
+            data = bytearray()
+            for tick, kind, note, value in zip(ticks, kinds[chunk], notes[chunk],
+                                               values[chunk] if values is not None
+                                               else np.ones(len(ticks))):
+                if kind == NOTE_ON:
+                    message = (STATUS_NOTE_ON | channel, int(note),
+                               max(1, min(127, int(round(value * 127)))))
+                elif kind == NOTE_OFF:
+                    message = (STATUS_NOTE_OFF | channel, int(note), 0)
+                elif kind == PITCH_BEND:
+                    bend = min(max(int(round(value / bend_range * 8192)) + 8192, 0), 16383)
+                    message = (STATUS_PITCH_BEND | channel, bend & 0x7F, bend >> 7)
+                elif kind == SUSTAIN:
+                    message = (STATUS_CONTROL_CHANGE | channel, SUSTAIN_CONTROLLER,
+                               127 if value > 0.5 else 0)
+                elif kind == PRESSURE:
+                    pressure = min(max(int(round(value * 127)), 0), 127)
+                    message = ((STATUS_CHANNEL_PRESSURE | channel, pressure) if note < 0
+                               else (STATUS_POLY_PRESSURE | channel, int(note), pressure))
+                else:
+                    continue
+                data += _variable_length(max(0, int(tick) - previous))
+                data += bytes(message)
+                previous = max(previous, int(tick))
+                written += 1
+            f.write(data)
+        f.write(b"\0\xff\x2f\0")
+        end = f.tell()
+        f.seek(start - 4)
+        f.write(struct.pack(">I", end - start))
+    return written
+
+# ----------------------------
+# Import
+# ----------------------------
+def _read_track(data, position, end, track, rows, tempos):
+    """
+    Collect the events of one MTrk chunk: playable ones as
+    (tick, track, order, kind, note, value) rows and tempo changes as
+    (tick, microseconds per quarter).
+    """
+    tick = 0
+    running = None
+    order = 0
+    while position < end:
+        delta = 0
+        while True:
+            byte = data[position]
+            position += 1
+            delta = (delta << 7) | (byte & 0x7F)
+            if not byte & 0x80:
+                break
+        tick += delta
+        if data[position] & 0x80:
+            status = data[position]
+            position += 1
+        else:
+            # Running status: only channel messages set it, and meta and
+            # sysex events cancel it
+            if running is None:
+                raise ValueError(f"Data byte without a status in track {track}")
+            status = running
+        if status == 0xFF:
+            kind = data[position]
+            length = 0
+            position += 1
+            while True:
+                byte = data[position]
+                position += 1
+                length = (length << 7) | (byte & 0x7F)
+                if not byte & 0x80:
+                    break
+            if kind == 0x51 and length == 3:
+                tempos.append((tick, int.from_bytes(data[position:position + 3], "big")))
+            position += length
+            running = None
+            if kind == 0x2F:
+                break
+            continue
+        if status in (0xF0, 0xF7):
+            length = 0
+            while True:
+                byte = data[position]
+                position += 1
+                length = (length << 7) | (byte & 0x7F)
+                if not byte & 0x80:
+                    break
+            position += length
+            running = None
+            continue
+        running = status
+        size = 1 if status & 0xF0 in (0xC0, 0xD0) else 2
+        message = (status,) + tuple(data[position:position + size])
+        position += size
+        event = parse_message(message)
+        if event is not None:
+            rows.append((tick, track, order) + event)
+            order += 1
+
+def read_midi(path, sample_rate):
+    """
+    Read a format 0 or 1 Standard MIDI File into sample-indexed events
+    (sample_time, kind, note, value): notes with velocity, pitch bend, the
+    sustain pedal and aftertouch on any channel, with every track merged and
+    the tempo map applied.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != b"MThd":
+        raise ValueError(f"Not a MIDI file: {path}")
+    header_length, _, tracks, division = struct.unpack(">IHHH", data[4:14])
+    position = 8 + header_length
+    rows = []
+    tempos = []
+    track = 0
+    while position + 8 <= len(data) and track < tracks:
+        chunk, length = data[position:position + 4], struct.unpack(">I", data[position + 4:position + 8])[0]
+        position += 8
+        if chunk == b"MTrk":
+            _read_track(data, position, min(position + length, len(data)), track, rows, tempos)
+            track += 1
+        position += length
+
+    rows.sort(key=lambda row: row[:3])
+    ticks = np.array([row[0] for row in rows], dtype=np.float64)
+    if division & 0x8000:
+        # SMPTE time: frames per second times ticks per frame
+        frames_per_second = 256 - (division >> 8)
+        seconds = ticks / (frames_per_second * (division & 0xFF))
+    else:
+        # Tempo map: seconds at every tempo change, then interpolate
+        tempos = sorted(tempos) or [(0, TEMPO)]
+        if tempos[0][0] != 0:
+            tempos.insert(0, (0, TEMPO))
+        change_ticks = np.array([tick for tick, _ in tempos], dtype=np.float64)
+        seconds_per_tick = np.array([tempo for _, tempo in tempos], dtype=np.float64) / (1e6 * division)
+        change_seconds = np.concatenate(([0.0], np.cumsum(np.diff(change_ticks) * seconds_per_tick[:-1])))
+        segment = np.searchsorted(change_ticks, ticks, side="right") - 1
+        seconds = change_seconds[segment] + (ticks - change_ticks[segment]) * seconds_per_tick[segment]
+    return (np.round(seconds * sample_rate).astype(np.int64),
+            np.array([row[3] for row in rows], dtype=np.int8),
+            np.array([row[4] for row in rows], dtype=np.int32),
+            np.array([row[5] for row in rows], dtype=np.float32))
+
+def main(argv=None):
+    from sequencer import load_events_file
+    parser = argparse.ArgumentParser(description="Convert synth recordings to and from MIDI files.")
+    parser.add_argument("source", help="recording (.json, .events) or MIDI file")
+    parser.add_argument("destination", help=".mid to export, .json to import")
+    parser.add_argument("--sample-rate", type=int, default=44100, help="rate for MIDI imports")
+    args = parser.parse_args(argv)
+
+    events, sample_rate = load_events_file(args.source, args.sample_rate)
+    if os.path.splitext(args.destination)[1].lower() in (".mid", ".midi"):
+        count = write_midi(args.destination, events, sample_rate)
+    else:
+        from sequencer import save_recording
+        save_recording(args.destination, events[:3], sample_rate)
+        count = len(events[0])
+    print(f"{args.destination}: {count} events")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import argparse
+import sys
+import threading
+import time
+
+from event_queue import EventQueue, NOTE_ON, NOTE_OFF, PITCH_BEND, SUSTAIN, PRESSURE
+
+# ----------------------------
+# MIDI Configuration
+# ----------------------------
+PORT_NAME = "Python Synth"    # Name of the virtual ports
+PITCH_BEND_RANGE = 2.0        # Semitones at full bend
+SUSTAIN_CONTROLLER = 64       # Control change number of the sustain pedal
+CLOCK_DRIFT = 1e-4            # Seconds per second the MIDI clock offset may creep up
+
+# Status bytes (high nibble; the low nibble is the channel)
+STATUS_NOTE_OFF = 0x80
+STATUS_NOTE_ON = 0x90
+STATUS_POLY_PRESSURE = 0xA0
+STATUS_CONTROL_CHANGE = 0xB0
+STATUS_CHANNEL_PRESSURE = 0xD0
+STATUS_PITCH_BEND = 0xE0
+
+def parse_message(message, bend_range=PITCH_BEND_RANGE, channel=None):
+    """
+    Turn a raw MIDI message (list of bytes) into an event-queue event
+    (kind, note, value), or None for anything the synth does not play.
+    Velocity becomes an amplitude in 0..1; note-on with velocity 0 is a
+    note-off. Aftertouch becomes a pressure in 0..1, on note -1 for channel
+    pressure. `channel` (0-15) filters to one channel.
+    """
+    if len(message) < 2:
+        return None
+    status = message[0] & 0xF0
+    if channel is not None and message[0] & 0x0F != channel:
+        return None
+    data1 = message[1]
+    data2 = message[2] if len(message) > 2 else 0
+    if status == STATUS_NOTE_ON and data2 > 0:
+        return NOTE_ON, data1, data2 / 127.0
+    if status == STATUS_NOTE_OFF or status == STATUS_NOTE_ON:
+        return NOTE_OFF, data1, 0.0
+    if status == STATUS_PITCH_BEND:
+        bend = ((data2 << 7) | data1) - 8192
+        return PITCH_BEND, 0, bend / 8192.0 * bend_range
+    if status == STATUS_CONTROL_CHANGE and data1 == SUSTAIN_CONTROLLER:
+        return SUSTAIN, 0, 1.0 if data2 >= 64 else 0.0
+    if status == STATUS_POLY_PRESSURE:
+        return PRESSURE, data1, data2 / 127.0
+    if status == STATUS_CHANNEL_PRESSURE:
+        return PRESSURE, -1, data1 / 127.0
+    return None
+
+class MidiClock:
+    """
+    Map the MIDI driver's message times onto time.perf_counter(), the clock
+    the event queue turns into sample offsets. rtmidi stamps each message
+    when the driver receives it and reports the gap to the previous one;
+    the Python callback then runs whenever the GIL allows. The offset
+    between the two clocks is taken from the least-delayed message seen
+    (allowed to creep by CLOCK_DRIFT for clock drift), so callback latency
+    does not turn into timing jitter.
+    """
+    def __init__(self):
+        self.midi_time = None
+        self.offset = None
+        self._last_arrival = None
+
+    def timestamp(self, delta, arrival=None):
+        """
+        perf_counter() time of a message that arrived `delta` seconds after
+        the previous one.
+        """
+        if arrival is None:
+            arrival = time.perf_counter()
+        if self.midi_time is None:
+            self.midi_time = 0.0
+            self.offset = arrival
+        else:
+            self.midi_time += delta
+            self.offset += CLOCK_DRIFT * (arrival - self._last_arrival)
+            self.offset = min(self.offset, arrival - self.midi_time)
+        self._last_arrival = arrival
+        return self.midi_time + self.offset
+
+def _open_port(port, direction, name, virtual):
+    import rtmidi
+    device = rtmidi.MidiIn() if direction == "input" else rtmidi.MidiOut()
+    if virtual:
+        device.open_virtual_port(name)
+        return device
+    ports = device.get_ports()
+    if port is None:
+        if not ports:
+            raise RuntimeError(f"No MIDI {direction} ports (use a virtual port)")
+        index = 0
+    elif isinstance(port, int):
+        index = port
+    else:
+        matches = [i for i, port_name in enumerate(ports) if port in port_name]
+        if not matches:
+            raise RuntimeError(f"No MIDI {direction} port matching {port!r}: {ports}")
+        index = matches[0]
+    device.open_port(index)
+    return device
+
+def list_ports():
+    """
+    Return (input port names, output port names).
+    """
+    import rtmidi
+    return rtmidi.MidiIn().get_ports(), rtmidi.MidiOut().get_ports()
+
+# ----------------------------
+# Input
+# ----------------------------
+class MidiInput:
+    """
+    Receive MIDI and feed the synth. Messages are parsed on rtmidi's thread
+    and pushed, stamped with their driver arrival time, onto this input's
+    own EventQueue (the queues are single-producer), which the audio
+    callback drains at sample-accurate offsets like keyboard events.
+    handle() can be called directly to inject messages without rtmidi.
+    """
+    def __init__(self, queue=None, port=None, virtual=False, name=PORT_NAME,
+                 channel=None, bend_range=PITCH_BEND_RANGE):
+        self.queue = queue or EventQueue()
+        self.port = port
+        self.virtual = virtual
+        self.name = name
+        self.channel = channel
+        self.bend_range = bend_range
+        self.clock = MidiClock()
+        self.dropped = 0
+        self.device = None
+
+    def open(self):
+        self.device = _open_port(self.port, "input", self.name, self.virtual)
+        self.device.ignore_types(sysex=True, timing=True, active_sense=True)
+        self.device.set_callback(self._callback)
+        return self
+
+    def close(self):
+        if self.device is not None:
+            self.device.cancel_callback()
+            self.device.close_port()
+            self.device = None
+
+    def _callback(self, event, data=None):
+        message, delta = event
+        self.handle(message, delta)
+
+    def handle(self, message, delta=0.0, arrival=None):
+        """
+        Queue one raw message. Returns the parsed event or None.
+        """
+        event = parse_message(message, self.bend_range, self.channel)
+        if event is None:
+            return None
+        kind, note, value = event
+        if not self.queue.push(kind, note, value, self.clock.timestamp(delta, arrival)):
+            self.dropped += 1
+        return event
+
+# ----------------------------
+# Output
+# ----------------------------
+class MidiOutput:
+    """
+    Send what is played to a MIDI port (or a virtual one), e.g. to record
+    it in a DAW or drive another instrument.
+    """
+    def __init__(self, port=None, virtual=False, name=PORT_NAME, channel=0,
+                 bend_range=PITCH_BEND_RANGE):
+        self.port = port
+        self.virtual = virtual
+        self.name = name
+        self.channel = channel
+        self.bend_range = bend_range
+        self.device = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        self.device = _open_port(self.port, "output", self.name, self.virtual)
+        return self
+
+    def close(self):
+        if self.device is not None:
+            self.device.close_port()
+            self.device = None
+
+    def send(self, message):
+        # Keyboard, GUI and playback threads may all send
+        with self._lock:
+            if self.device is not None:
+                self.device.send_message(message)
+
+    def note_on(self, note, velocity=1.0):
+        self.send([STATUS_NOTE_ON | self.channel, note, max(1, min(127, int(round(velocity * 127))))])
+
+    def note_off(self, note):
+        self.send([STATUS_NOTE_OFF | self.channel, note, 0])
+
+    def pitch_bend(self, semitones):
+        bend = int(round(semitones / self.bend_range * 8192)) + 8192
+        bend = min(max(bend, 0), 16383)
+        self.send([STATUS_PITCH_BEND | self.channel, bend & 0x7F, bend >> 7])
+
+    def sustain(self, down):
+        self.send([STATUS_CONTROL_CHANGE | self.channel, SUSTAIN_CONTROLLER, 127 if down else 0])
+
+    def pressure(self, note, value):
+        value = min(max(int(round(value * 127)), 0), 127)
+        if note < 0:
+            self.send([STATUS_CHANNEL_PRESSURE | self.channel, value])
+        else:
+            self.send([STATUS_POLY_PRESSURE | self.channel, note, value])
+
+def main(argv=None):
+    from engine import SynthEngine
+
+    parser = argparse.ArgumentParser(description="Play the synth from a MIDI port.")
+    parser.add_argument("--list", action="store_true", help="list MIDI ports and exit")
+    parser.add_argument("--port", default=None, help="input port name (substring) or index")
+    parser.add_argument("--virtual", action="store_true", help=f"open a virtual input port named {PORT_NAME!r}")
+    parser.add_argument("--backend", default="sounddevice")
+    parser.add_argument("--waveform", default="saw")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        inputs, outputs = list_ports()
+        print("Inputs: " + ", ".join(inputs or ["(none)"]))
+        print("Outputs: " + ", ".join(outputs or ["(none)"]))
+        return 0
+    port = int(args.port) if args.port is not None and args.port.isdigit() else args.port
+    engine = SynthEngine(backend=args.backend, waveform=args.waveform)
+    engine.connect_midi_input(port, args.virtual)
+    engine.start()
+    print("Listening for MIDI, Ctrl+C to quit")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import numpy as np
+
+# ----------------------------
+# Mix Bus Configuration
+# ----------------------------
+MAX_FRAMES = 4096         # Largest block the scratch buffers can hold
+COMPENSATION_TIME = 0.03  # Seconds for the polyphony gain to settle on a new target
+LIMITER_CEILING = 0.98    # Peak level the limiter never lets through
+LOOKAHEAD = 0.0015        # Seconds the limiter sees ahead (and delays the output)
+LIMITER_HOLD = 0.01       # Seconds the limiter holds its gain before recovering
+
+class PeakLimiter:
+    """
+    Look-ahead brickwall limiter, vectorised over the block.
+
+    The gain each sample needs is ceiling / |x| (capped at 1). That curve is
+    min-filtered over the look-ahead plus the hold time, then averaged over
+    the look-ahead, so the gain glides down before a peak and back up after
+    it, and is never above what any sample needs. Both filters are O(1) per
+    sample (van Herk running minimum, cumulative-sum average), so the cost
+    of a block does not depend on the signal. The output is delayed by the
+    look-ahead; nothing is allocated per block.
+
+    Multichannel blocks (frames, channels) are limited with one gain taken
+    from the loudest channel, so the stereo image does not shift.
+    """
+    def __init__(self, sample_rate, ceiling=LIMITER_CEILING, lookahead=LOOKAHEAD,
+                 hold=LIMITER_HOLD, max_frames=MAX_FRAMES, channels=1):
+        self.ceiling = ceiling
+        self.lookahead = max(1, int(lookahead * sample_rate))
+        self.hold = max(0, int(hold * sample_rate))
+        self.window = self.hold + self.lookahead + 1
+        self.max_frames = max_frames
+        # Required gain of the samples the next block's filters still reach
+        self.history = 2 * self.lookahead + self.hold - 1
+        self._required = np.ones(self.history + max_frames)
+        self._delay = np.zeros((self.lookahead + max_frames, channels), dtype=np.float32)
+        self._peak = np.empty((max_frames, channels), dtype=np.float32)
+        padded = -(-(self.history + max_frames) // self.window) * self.window
+        self._padded = np.empty(padded)
+        self._prefix = np.empty(padded)
+        self._suffix = np.empty(padded)
+        self._minimum = np.empty(max_frames + self.lookahead - 1)
+        self._sum = np.zeros(max_frames + self.lookahead)
+        self._gain = np.empty(max_frames)
+        self.gain_reduction = 1.0       # Smallest gain applied in the last block
+
+    @property
+    def latency(self):
+        return self.lookahead
+
+    def _running_minimum(self, values, out):
+        # van Herk / Gil-Werman: prefix and suffix minima inside windows of
+        # `window` samples combine into every sliding-window minimum
+        window = self.window
+        count = len(values)
+        padded = self._padded[:-(-count // window) * window]
+        padded[:count] = values
+        padded[count:] = np.inf
+        blocks = padded.reshape(-1, window)
+        prefix = self._prefix[:len(padded)].reshape(-1, window)
+        suffix = self._suffix[:len(padded)].reshape(-1, window)
+        np.minimum.accumulate(blocks, axis=1, out=prefix)
+        np.minimum.accumulate(blocks[:, ::-1], axis=1, out=suffix[:, ::-1])
+        np.minimum(suffix.reshape(-1)[:count - window + 1],
+                   prefix.reshape(-1)[window - 1:count], out=out)
+
+    def process(self, block):
+        """
+        Limit `block` (float32, 1-D or frames x channels) in place.
+        """
+        frames = block.shape[0]
+        if frames > self.max_frames:
+            for start in range(0, frames, self.max_frames):
+                self.process(block[start:start + self.max_frames])
+            return block
+        history = self.history
+        lookahead = self.lookahead
+        frame_block = block[:, None] if block.ndim == 1 else block
+        required = self._required[:history + frames]
+        delayed = self._delay[:lookahead + frames]
+        delayed[lookahead:] = frame_block
+        # Gain each new frame needs to keep its loudest channel under the ceiling
+        peak = self._peak[:frames]
+        np.abs(frame_block, out=peak)
+        np.max(peak, axis=1, out=required[history:])
+        np.maximum(required[history:], self.ceiling, out=required[history:])
+        np.divide(self.ceiling, required[history:], out=required[history:])
+
+        minimum = self._minimum[:frames + lookahead - 1]
+        self._running_minimum(required, minimum)
+        total = self._sum[:frames + lookahead]
+        np.cumsum(minimum, out=total[1:])
+        gain = self._gain[:frames]
+        np.subtract(total[lookahead:], total[:frames], out=gain)
+        gain *= 1.0 / lookahead
+        self.gain_reduction = float(gain.min())
+
+        np.multiply(delayed[:frames], gain[:, None], out=frame_block, casting="unsafe")
+        # Keep the tail for the next block
+        required[:history] = required[frames:frames + history]
+        delayed[:lookahead] = delayed[frames:frames + lookahead]
+        return block
+
+class MixBus:
+    """
+    Final stage of the mix. The voice pool sums its voices without
+    normalising; the bus scales the sum by 1/sqrt(voice energy), where the
+    energy is the sum of squared voice gains (so soft notes count for less
+    than loud ones), approaching each new target smoothly instead of jumping
+    when notes start or stop, then runs the PeakLimiter so the output never
+    exceeds the ceiling. The cost per block is fixed. Blocks are 1-D or
+    interleaved (frames, channels) like the backend's outdata.
+    """
+    def __init__(self, sample_rate, max_frames=MAX_FRAMES, compensation_time=COMPENSATION_TIME,
+                 channels=1, **limiter_options):
+        self.sample_rate = sample_rate
+        self.max_frames = max_frames
+        self.channels = channels
+        self.limiter = PeakLimiter(sample_rate, max_frames=max_frames, channels=channels,
+                                   **limiter_options)
+        self.compensation = 1.0
+        # Fraction of the distance to the target still left after n + 1 samples
+        self._decay = np.exp(-np.arange(1, max_frames + 1) / (compensation_time * sample_rate))
+        self._ramp = np.empty(max_frames)
+
+    @property
+    def latency(self):
+        return self.limiter.latency
+
+    def process(self, block, energy):
+        """
+        Compensate and limit `block` (float32) in place. `energy` is the
+        voice pool's energy() for this block.
+        """
+        frames = block.shape[0]
+        if frames > self.max_frames:
+            for start in range(0, frames, self.max_frames):
+                self.process(block[start:start + self.max_frames], energy)
+            return block
+        target = 1.0 / np.sqrt(max(1.0, energy))
+        ramp = self._ramp[:frames]
+        np.multiply(self._decay[:frames], self.compensation - target, out=ramp)
+        ramp += target
+        frame_block = block[:, None] if block.ndim == 1 else block
+        frame_block *= ramp[:, None]
+        self.compensation = float(ramp[-1])
+        return self.limiter.process(block)
@@ -0,0 +1,223 @@
+import argparse
+import os
+import sys
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from wavetable import WAVE_KINDS, build_wavetable
+from bandlimited import BLEP_WAVEFORMS
+from voice_pool import VoicePool, SAMPLE_WAVEFORM
+from mix_bus import MixBus
+from effects import EffectsChain
+from sequencer import Sequencer, load_events_file
+from resampler import resample_blocks
+from tuning import A4_FREQUENCY, equal_temperament, tuning_increments
+
+# ----------------------------
+# Render Configuration
+# ----------------------------
+SAMPLE_RATE = 44100       # Hz
+CHANNELS = 1              # Output channels (2 for stereo, voices panned across the keyboard)
+RENDER_BLOCK = 4096       # Frames rendered per pass (the voice pool maximum)
+TAIL_DURATION = 0.5       # Seconds rendered after the last event
+EFFECT_TAIL = 3.0         # Seconds of tail when effects are on (echoes and reverb ring on)
+ATTACK_DURATION = 0.05    # seconds, same envelope as the live synth
+DECAY_DURATION = 0.1      # seconds
+SUSTAIN_LEVEL = 0.8       # fraction of the peak level
+RELEASE_DURATION = 0.1    # seconds
+
+def equal_temperament_increments(sample_rate, a4=A4_FREQUENCY):
+    """
+    Phase increment of every MIDI note number in 12-tone equal temperament
+    with A4 at `a4` Hz (see tuning.py for other tunings).
+    """
+    return equal_temperament(a4) / sample_rate
+
+# ----------------------------
+# Rendering
+# ----------------------------
+def render_blocks(events, sample_rate=SAMPLE_RATE, waveform="saw", note_increments=None,
+                  block_size=RENDER_BLOCK, tail_duration=TAIL_DURATION, instrument=None,
+                  channels=CHANNELS, voice_filter=None, effects=()):
+    """
+    Render sample-indexed events (see sequencer.py) through the same voice
+    pool and sequencer the live callback uses, without an audio device.
+    Yields float32 blocks of up to `block_size` frames until every note has
+    finished and the tail has been rendered. The block is reused between
+    iterations, so consume (or copy) it before asking for the next one.
+    The "sample" waveform plays `instrument` (a sample_instrument.SampleBank).
+    `voice_filter` is the (cutoff, resonance, key_tracking, envelope_amount)
+    of the per-voice filters, and `effects` a sequence of (effect class,
+    settings) pairs run as the master chain (see effects.py), so a render
+    can match the live sound. The mix goes through the same MixBus as the
+    live output. With channels > 1 the blocks are interleaved
+    (frames, channels).
+    """
+    if note_increments is None:
+        note_increments = equal_temperament_increments(sample_rate)
+    # Saw, square and pulse are PolyBLEP oscillators and need no table
+    tables = waveform in BLEP_WAVEFORMS or waveform == SAMPLE_WAVEFORM
+    wavetables = {} if tables else {waveform: build_wavetable(waveform)}
+    pool = VoicePool(wavetables, sample_rate, note_increments,
+                     "saw" if waveform == SAMPLE_WAVEFORM else waveform,
+                     max_frames=block_size, attack=ATTACK_DURATION, decay=DECAY_DURATION,
+                     sustain=SUSTAIN_LEVEL, release=RELEASE_DURATION, normalize=False,
+                     channels=channels)
+    mix_bus = MixBus(sample_rate, max_frames=block_size, channels=channels)
+    if instrument is not None:
+        pool.set_samples(instrument.samples, instrument.note_rows, instrument.lengths)
+    pool.set_waveform(waveform)
+    if voice_filter is not None:
+        pool.set_filter(*voice_filter)
+    chain = EffectsChain([kind(sample_rate, channels=channels, max_frames=block_size, **settings)
+                          for kind, settings in effects])
+    if effects:
+        tail_duration = max(tail_duration, EFFECT_TAIL)
+    sequencer = Sequencer(sample_rate)
+    sequencer.load_events(events)
+    sequencer.start()
+
+    total = sequencer.duration + int(tail_duration * sample_rate) + 1
+    block = np.zeros(block_size if channels == 1 else (block_size, channels), dtype=np.float32)
+    position = 0
+    while position < total:
+        frames = min(block_size, total - position)
+        sequencer.dispatch(pool, frames)
+        pool.render(block[:frames])
+        chain.process(block[:frames])
+        mix_bus.process(block[:frames], pool.energy())
+        position += frames
+        yield block[:frames]
+
+def to_pcm16(block):
+    """
+    Convert float samples in [-1, 1] to little-endian 16-bit PCM bytes.
+    """
+    return (np.clip(block, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+def write_wav(path, blocks, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+    """
+    Stream float32 blocks (1-D, or interleaved frames x channels) to a
+    16-bit WAV file, one block at a time, so a take never has to be held in
+    memory. Returns the frame count.
+    """
+    frames = 0
+    with wave.open(path, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        for block in blocks:
+            f.writeframes(to_pcm16(block))
+            frames += len(block)
+    return frames
+
+def write_flac(path, blocks, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+    """
+    Stream float32 blocks to a FLAC file. Needs the optional `soundfile`
+    package (pip install soundfile).
+    """
+    try:
+        import soundfile
+    except ImportError:
+        raise RuntimeError("FLAC export needs the soundfile package (pip install soundfile)")
+    frames = 0
+    with soundfile.SoundFile(path, "w", samplerate=sample_rate, channels=channels,
+                             format="FLAC", subtype="PCM_16") as f:
+        for block in blocks:
+            f.write(block)
+            frames += len(block)
+    return frames
+
+WRITERS = {".wav": write_wav, ".flac": write_flac}
+RECORDING_EXTENSIONS = (".json", ".events", ".mid", ".midi")
+
+def render_to_file(events, path, sample_rate=SAMPLE_RATE, waveform="saw", note_increments=None,
+                   instrument=None, output_rate=None, channels=CHANNELS, voice_filter=None,
+                   effects=()):
+    """
+    Render events straight to `path`; the extension (.wav or .flac) picks
+    the format. `voice_filter` and `effects` are as for render_blocks(). With `output_rate` the synth still renders at `sample_rate`
+    and the blocks are converted by a streaming resampler on the way to the
+    file. Returns the number of frames written.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise ValueError(f"Unsupported export format: {extension}")
+    blocks = render_blocks(events, sample_rate, waveform, note_increments, instrument=instrument,
+                           channels=channels, voice_filter=voice_filter, effects=effects)
+    output_rate = output_rate or sample_rate
+    return WRITERS[extension](path, resample_blocks(blocks, sample_rate, output_rate, channels=channels),
+                              output_rate, channels)
+
+# ----------------------------
+# Batch Rendering
+# ----------------------------
+def render_recording_file(source, destination, sample_rate=SAMPLE_RATE, waveform="saw",
+                          output_rate=None, channels=CHANNELS, tuning="equal", a4=A4_FREQUENCY):
+    """
+    Render one recording file (JSON recording, event log or MIDI file, see
+    sequencer.load_events_file) to `destination`, in `tuning` ("equal",
+    "just" or a Scala .scl file, see tuning.py).
+    """
+    events, recorded_rate = load_events_file(source, sample_rate)
+    if recorded_rate != sample_rate:
+        sample_time = np.round(events[0] * (sample_rate / recorded_rate)).astype(np.int64)
+        events = (sample_time,) + tuple(events[1:])
+    return render_to_file(events, destination, sample_rate, waveform,
+                          tuning_increments(tuning, sample_rate, a4), output_rate=output_rate,
+                          channels=channels)
+
+def render_directory(source_dir, destination_dir, extension=".wav", sample_rate=SAMPLE_RATE,
+                     waveform="saw", workers=None, output_rate=None, channels=CHANNELS,
+                     tuning="equal", a4=A4_FREQUENCY):
+    """
+    Render every recording (*.json, *.events, *.mid) in `source_dir` into
+    `destination_dir`, one recording per worker process.
+    Returns {recording name: frames}.
+    """
+    os.makedirs(destination_dir, exist_ok=True)
+    names = sorted(name for name in os.listdir(source_dir)
+                   if name.endswith(RECORDING_EXTENSIONS))
+    sources = [os.path.join(source_dir, name) for name in names]
+    destinations = [os.path.join(destination_dir, os.path.splitext(name)[0] + extension)
+                     for name in names]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        frames = executor.map(render_recording_file, sources, destinations,
+                              [sample_rate] * len(names), [waveform] * len(names),
+                              [output_rate] * len(names), [channels] * len(names),
+                              [tuning] * len(names), [a4] * len(names))
+        return dict(zip(names, frames))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render synth recordings to audio files offline.")
+    parser.add_argument("source", help="recording file (.json, .events, .mid) or directory of recordings")
+    parser.add_argument("destination", help="output file, or output directory for batch renders")
+    parser.add_argument("--waveform", default="saw", choices=sorted(set(WAVE_KINDS + BLEP_WAVEFORMS)))
+    parser.add_argument("--sample-rate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--output-rate", type=int, default=None,
+                        help="resample the files to this rate (default: --sample-rate)")
+    parser.add_argument("--channels", type=int, default=CHANNELS, help="2 for stereo")
+    parser.add_argument("--tuning", default="equal",
+                        help='"equal", "just" or the path of a Scala .scl file')
+    parser.add_argument("--a4", type=float, default=A4_FREQUENCY, help="reference pitch in Hz")
+    parser.add_argument("--format", default="wav", choices=["wav", "flac"], help="batch output format")
+    parser.add_argument("--workers", type=int, default=None, help="batch worker processes")
+    args = parser.parse_args(argv)
+    output_rate = args.output_rate or args.sample_rate
+
+    if os.path.isdir(args.source):
+        results = render_directory(args.source, args.destination, "." + args.format,
+                                   args.sample_rate, args.waveform, args.workers, args.output_rate,
+                                   args.channels, args.tuning, args.a4)
+        for name, frames in results.items():
+            print(f"{name}: {frames / output_rate:.1f} s")
+    else:
+        frames = render_recording_file(args.source, args.destination, args.sample_rate, args.waveform,
+                                       args.output_rate, args.channels, args.tuning, args.a4)
+        print(f"{args.destination}: {frames / output_rate:.1f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
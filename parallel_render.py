@@ -0,0 +1,411 @@
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from event_queue import NOTE_ON, NOTE_OFF, PITCH_BEND, SUSTAIN, PRESSURE
+from bandlimited import BLEP_WAVEFORMS
+from voice_pool import VELOCITY_CURVE, PAN_SPREAD
+from wavetable import WAVE_KINDS
+from tuning import NOTE_COUNT
+
+# ----------------------------
+# Parallel Render Configuration
+# ----------------------------
+VOICES_PER_WORKER = 64        # Voice slots in each worker's pool
+BLOCK_EVENTS = 256            # Events a worker can receive per block
+STAGED_EVENTS = 1024          # Events staged per worker; the excess waits for later blocks
+NOTE_OFF_RESERVE = 256        # Staging slots only note-offs may take
+WORKER_TIMEOUT = 5.0          # Seconds to wait for workers to start or stop
+WAIT_BUDGET = 0.5             # Fraction of a block the callback may wait for workers
+
+# Extra event kinds, broadcast to every worker
+SET_WAVEFORM = 16
+ALL_NOTES_OFF = 17
+SET_PAN = 18
+SET_FILTER = 19          # note is the set_filter() argument (0-3), or -1 to remove
+SET_TUNING = 20          # Copy the shared tuning table
+WAVEFORMS = tuple(dict.fromkeys(BLEP_WAVEFORMS + WAVE_KINDS))
+
+def _layout(workers, block_size, channels):
+    """
+    (name, dtype, shape) of every array in the shared-memory segment.
+    """
+    return [
+        ("partial", np.float32, (workers, block_size, channels)),   # Each worker's mix of the block
+        ("active", np.int32, (workers,)),                 # Sounding voices per worker
+        ("energy", np.float32, (workers,)),               # Sum of squared voice gains per worker
+        ("event_count", np.int32, (workers,)),
+        ("event_kind", np.int8, (workers, BLOCK_EVENTS)),
+        ("event_note", np.int32, (workers, BLOCK_EVENTS)),
+        ("event_value", np.float32, (workers, BLOCK_EVENTS)),
+        ("event_offset", np.int32, (workers, BLOCK_EVENTS)),
+        ("tuning", np.float64, (NOTE_COUNT,)),          # Latest set_note_increments() table
+        ("running", np.int32, (1,)),
+    ]
+
+def _map_arrays(buffer, workers, block_size, channels):
+    """
+    Carve the shared-memory buffer into named NumPy views.
+    """
+    arrays = {}
+    offset = 0
+    for name, dtype, shape in _layout(workers, block_size, channels):
+        dtype = np.dtype(dtype)
+        offset = -(-offset // 64) * 64
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        offset += dtype.itemsize * int(np.prod(shape))
+    return arrays
+
+def _segment_size(workers, block_size, channels):
+    size = 0
+    for name, dtype, shape in _layout(workers, block_size, channels):
+        size = -(-size // 64) * 64 + np.dtype(dtype).itemsize * int(np.prod(shape))
+    return size
+
+# ----------------------------
+# Worker Process
+# ----------------------------
+def _worker_main(index, segment_name, workers, block_size, pool_options, go, done):
+    """
+    Render loop of one worker. Waits for `go`, applies the events the audio
+    thread left in its slot, renders the next block of its own voices into
+    its row of the shared `partial` array and signals `done`.
+    """
+    from table_store import shared_wavetables
+    from voice_pool import VoicePool
+
+    segment = shared_memory.SharedMemory(name=segment_name)
+    channels = pool_options.get("channels", 1)
+    arrays = _map_arrays(segment.buf, workers, block_size, channels)
+    partial = arrays["partial"][index]
+    if channels == 1:
+        partial = partial[:, 0]
+    kinds, notes = arrays["event_kind"][index], arrays["event_note"][index]
+    values, offsets = arrays["event_value"][index], arrays["event_offset"][index]
+    pool = VoicePool(shared_wavetables(), normalize=False,
+                     max_frames=block_size, **pool_options)
+    filter_settings = [None] * 4
+    try:
+        done.release()      # Ready
+        while True:
+            go.acquire()
+            if not arrays["running"][0]:
+                break
+            for i in range(arrays["event_count"][index]):
+                kind = kinds[i]
+                if kind == NOTE_ON:
+                    pool.note_on(int(notes[i]), float(values[i]), int(offsets[i]))
+                elif kind == NOTE_OFF:
+                    pool.note_off(int(notes[i]), int(offsets[i]))
+                elif kind == PITCH_BEND:
+                    pool.pitch_bend(float(values[i]))
+                elif kind == SUSTAIN:
+                    pool.sustain_pedal(values[i] > 0.5, int(offsets[i]))
+                elif kind == PRESSURE:
+                    pool.set_pressure(int(notes[i]), float(values[i]))
+                elif kind == SET_WAVEFORM:
+                    pool.set_waveform(WAVEFORMS[notes[i]], float(values[i]))
+                elif kind == ALL_NOTES_OFF:
+                    pool.all_notes_off()
+                elif kind == SET_PAN:
+                    pool.set_pan(int(notes[i]), float(values[i]))
+                elif kind == SET_FILTER:
+                    # The four arguments arrive in order; NaN leaves one unchanged
+                    argument = int(notes[i])
+                    if argument < 0:
+                        pool.set_filter(None)
+                        continue
+                    filter_settings[argument] = None if np.isnan(values[i]) else float(values[i])
+                    if argument == 3:
+                        pool.set_filter(*filter_settings)
+                elif kind == SET_TUNING:
+                    pool.set_note_increments(arrays["tuning"].copy())
+            pool.render(partial)
+            arrays["active"][index] = pool.active_count()
+            arrays["energy"][index] = pool.energy()
+            done.release()
+    finally:
+        del partial, kinds, notes, values, offsets, arrays
+        segment.close()
+
+# ----------------------------
+# Parallel Voice Pool
+# ----------------------------
+class ParallelVoicePool:
+    """
+    Drop-in replacement for VoicePool that renders voices on worker
+    processes, for polyphony beyond what one core can mix in time.
+
+    Note numbers are partitioned across workers (note % workers), and each
+    worker owns an ordinary VoicePool. Blocks are exchanged through one
+    shared-memory segment: the audio thread stages events in per-worker
+    slots, and each worker renders its partial mix into its own row. Nothing
+    is pickled per block; the only per-block IPC is a pair of semaphores per
+    worker.
+
+    Workers render one block ahead: render() returns the block they
+    finished during the previous period, then hands them the events for the
+    next one. This adds one block of latency and frees the audio callback to
+    only sum the partial mixes. Every block must have the same size. A
+    worker that misses the deadline contributes silence for that block and
+    keeps its events until it catches up. Events beyond BLOCK_EVENTS per
+    worker carry over to the next block; dropped_events counts the ones a
+    full staging area had to refuse (never note-offs). Like VoicePool, the mix is scaled
+    by 1/sqrt(active voices) unless normalize=False. With channels > 1
+    workers render panned (frames, channels) partial mixes.
+    """
+    def __init__(self, sample_rate, note_increments, waveform="saw",
+                 workers=None, block_size=512, voices_per_worker=VOICES_PER_WORKER,
+                 attack=0.0, decay=0.0, sustain=1.0, release=0.0, pulse_width=0.5,
+                 normalize=True, velocity_curve=VELOCITY_CURVE, channels=1,
+                 pan_spread=PAN_SPREAD):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.block_size = block_size
+        self.sample_rate = sample_rate
+        self.note_increments = note_increments
+        self.max_voices = voices_per_worker * self.workers
+        self.waveform = waveform
+        self.pulse_width = pulse_width
+        self.normalize = normalize
+        self.channels = channels
+        self.late_blocks = 0
+        self.dropped_events = 0     # Events lost to a full staging area (never note-offs)
+        # Voices and energy of the workers' last finished block, taken
+        # before they start the next one
+        self._active = 0
+        self._energy = 0.0
+
+        self.segment = shared_memory.SharedMemory(
+            create=True, size=_segment_size(self.workers, block_size, channels))
+        self.arrays = _map_arrays(self.segment.buf, self.workers, block_size, channels)
+        for array in self.arrays.values():
+            array[...] = 0
+        self.arrays["running"][0] = 1
+
+        # Events staged by note_on()/note_off() for the next handovers
+        self._count = np.zeros(self.workers, dtype=np.int32)
+        self._kind = np.zeros((self.workers, STAGED_EVENTS), dtype=np.int8)
+        self._note = np.zeros((self.workers, STAGED_EVENTS), dtype=np.int32)
+        self._value = np.zeros((self.workers, STAGED_EVENTS), dtype=np.float32)
+        self._offset = np.zeros((self.workers, STAGED_EVENTS), dtype=np.int32)
+        self._ready = [False] * self.workers
+        self._wait = block_size / sample_rate * WAIT_BUDGET
+        self._scale = np.ones(1, dtype=np.float32)
+        # Waveform changes may come from any thread; like the sequencer's
+        # requests they are (serial, waveform, pulse_width) tuples that the
+        # audio thread stages at its next handover.
+        self._waveform_request = (0, waveform, pulse_width)
+        self._waveform_handled = 0
+        self._filter_request = (0, None)
+        self._filter_handled = 0
+        self._tuning_request = (0, None)
+        self._tuning_handled = 0
+
+        pool_options = {"sample_rate": sample_rate, "note_increments": note_increments,
+                        "waveform": waveform, "max_voices": voices_per_worker,
+                        "attack": attack, "decay": decay, "sustain": sustain,
+                        "release": release, "pulse_width": pulse_width,
+                        "velocity_curve": velocity_curve, "channels": channels,
+                        "pan_spread": pan_spread}
+        context = multiprocessing.get_context("spawn")
+        self._go = [context.Semaphore(0) for _ in range(self.workers)]
+        self._done = [context.Semaphore(0) for _ in range(self.workers)]
+        self._processes = [
+            context.Process(target=_worker_main, name=f"voice-worker-{index}", daemon=True,
+                            args=(index, self.segment.name, self.workers, block_size,
+                                  pool_options, self._go[index],
+                                  self._done[index]))
+            for index in range(self.workers)
+        ]
+        for process in self._processes:
+            process.start()
+        for index in range(self.workers):
+            if not self._done[index].acquire(timeout=WORKER_TIMEOUT * 10):
+                self.close()
+                raise RuntimeError(f"Voice worker {index} did not start")
+        # Prime the pipeline: every worker renders the first block now
+        for go in self._go:
+            go.release()
+
+    # ----------------------------
+    # Note Management
+    # ----------------------------
+    def _stage(self, worker, kind, note, value, offset):
+        # Up to BLOCK_EVENTS go to a worker per block and the rest carry over
+        # to the following blocks. Only note-offs may use the last
+        # NOTE_OFF_RESERVE slots, so a flood of other events cannot leave a
+        # note stuck.
+        count = self._count[worker]
+        limit = STAGED_EVENTS if kind == NOTE_OFF else STAGED_EVENTS - NOTE_OFF_RESERVE
+        if count >= limit:
+            self.dropped_events += 1
+            return False
+        self._kind[worker, count] = kind
+        self._note[worker, count] = note
+        self._value[worker, count] = value
+        self._offset[worker, count] = offset
+        self._count[worker] = count + 1
+        return True
+
+    def note_on(self, note, amplitude=1.0, offset=0):
+        return self._stage(note % self.workers, NOTE_ON, note, amplitude, offset)
+
+    def note_off(self, note, offset=0):
+        return self._stage(note % self.workers, NOTE_OFF, note, 0.0, offset)
+
+    def set_waveform(self, waveform, pulse_width=None):
+        if waveform not in WAVEFORMS:
+            raise ValueError(f"Unknown waveform: {waveform}")
+        if pulse_width is not None:
+            self.pulse_width = pulse_width
+        self.waveform = waveform
+        self._waveform_request = (self._waveform_request[0] + 1, waveform, self.pulse_width)
+
+    def set_filter(self, cutoff, resonance=None, key_tracking=None, envelope_amount=None):
+        # Any thread; staged at the next handover like set_waveform()
+        settings = None
+        if cutoff is not None:
+            settings = tuple(np.nan if value is None else value
+                             for value in (cutoff, resonance, key_tracking, envelope_amount))
+        self._filter_request = (self._filter_request[0] + 1, settings)
+
+    def set_note_increments(self, note_increments):
+        # Any thread; the table is copied to the workers at the next handover
+        self.note_increments = note_increments
+        self._tuning_request = (self._tuning_request[0] + 1, note_increments)
+
+    def pitch_bend(self, semitones):
+        for worker in range(self.workers):
+            self._stage(worker, PITCH_BEND, 0, semitones, 0)
+
+    def sustain_pedal(self, down, offset=0):
+        for worker in range(self.workers):
+            self._stage(worker, SUSTAIN, 0, 1.0 if down else 0.0, offset)
+
+    def set_pan(self, note, pan):
+        return self._stage(note % self.workers, SET_PAN, note, pan, 0)
+
+    def set_pressure(self, note, pressure):
+        if note >= 0:
+            self._stage(note % self.workers, PRESSURE, note, pressure, 0)
+            return
+        for worker in range(self.workers):
+            self._stage(worker, PRESSURE, -1, pressure, 0)
+
+    def all_notes_off(self):
+        # Audio thread only, like note_on() and note_off()
+        for worker in range(self.workers):
+            self._stage(worker, ALL_NOTES_OFF, 0, 0.0, 0)
+
+    def active_count(self):
+        # Of the block render() last returned
+        return self._active
+
+    def energy(self):
+        return self._energy
+
+    # ----------------------------
+    # Rendering
+    # ----------------------------
+    def render(self, out):
+        """
+        Write the block the workers rendered ahead into `out`, then give them
+        the staged events and start the next block.
+        """
+        if out.shape[0] != self.block_size:
+            raise ValueError(f"Parallel render needs fixed {self.block_size}-frame blocks")
+        arrays = self.arrays
+        deadline = time.perf_counter() + self._wait
+        for worker in range(self.workers):
+            if not self._ready[worker]:
+                timeout = max(0.0, deadline - time.perf_counter())
+                self._ready[worker] = self._done[worker].acquire(True, timeout)
+        # Mono blocks are summed through a (frames, 1) view
+        frame_block = out[:, None] if out.ndim == 1 else out
+        frame_block[:] = 0.0
+        note_count = 0
+        energy = 0.0
+        for worker in range(self.workers):
+            if self._ready[worker]:
+                frame_block += arrays["partial"][worker]
+                note_count += int(arrays["active"][worker])
+                energy += float(arrays["energy"][worker])
+            else:
+                self.late_blocks += 1
+        # Snapshot before the workers are released and overwrite them
+        self._active = note_count
+        self._energy = energy
+        if self.normalize and note_count > 0:
+            self._scale[0] = 1.0 / np.sqrt(note_count)
+            out *= self._scale[0]
+
+        serial, waveform, pulse_width = self._waveform_request
+        if serial != self._waveform_handled:
+            self._waveform_handled = serial
+            for worker in range(self.workers):
+                self._stage(worker, SET_WAVEFORM, WAVEFORMS.index(waveform), pulse_width, 0)
+        serial, note_increments = self._tuning_request
+        if serial != self._tuning_handled:
+            self._tuning_handled = serial
+            arrays["tuning"][:] = note_increments
+            for worker in range(self.workers):
+                self._stage(worker, SET_TUNING, 0, 0.0, 0)
+        serial, settings = self._filter_request
+        if serial != self._filter_handled:
+            self._filter_handled = serial
+            for worker in range(self.workers):
+                if settings is None:
+                    self._stage(worker, SET_FILTER, -1, 0.0, 0)
+                    continue
+                for argument, value in enumerate(settings):
+                    self._stage(worker, SET_FILTER, argument, value, 0)
+
+        # Hand over the next block's events to every worker that is idle
+        for worker in range(self.workers):
+            if not self._ready[worker]:
+                continue
+            staged = int(self._count[worker])
+            count = min(staged, BLOCK_EVENTS)
+            arrays["event_count"][worker] = count
+            if count:
+                arrays["event_kind"][worker, :count] = self._kind[worker, :count]
+                arrays["event_note"][worker, :count] = self._note[worker, :count]
+                arrays["event_value"][worker, :count] = self._value[worker, :count]
+                arrays["event_offset"][worker, :count] = self._offset[worker, :count]
+                # Carry the rest to the next block, at its start
+                rest = staged - count
+                if rest:
+                    for staging in (self._kind, self._note, self._value, self._offset):
+                        staging[worker, :rest] = staging[worker, count:staged]
+                    self._offset[worker, :rest] = 0
+                self._count[worker] = rest
+            self._ready[worker] = False
+            self._go[worker].release()
+        return out
+
+    def close(self):
+        """
+        Stop the workers and free the shared memory.
+        """
+        if self.segment is None:
+            return
+        self.arrays["running"][0] = 0
+        for go in self._go:
+            go.release()
+        for process in self._processes:
+            process.join(WORKER_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+        self.arrays = None
+        self.segment.close()
+        self.segment.unlink()
+        self.segment = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
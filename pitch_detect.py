@@ -0,0 +1,294 @@
+import argparse
+import sys
+import threading
+import wave
+
+import numpy as np
+
+# ----------------------------
+# Pitch Detection Configuration
+# ----------------------------
+SAMPLE_RATE = 44100
+WINDOW = 2048             # Samples per analysis frame (46 ms at 44.1 kHz)
+HOP = 512                 # Samples between frames
+MIN_FREQUENCY = 50.0      # Hz
+MAX_FREQUENCY = 2000.0    # Hz
+YIN_THRESHOLD = 0.15      # Dip in the normalised difference that counts as periodic
+SILENCE_RMS = 1e-3        # Frames quieter than this are reported unvoiced
+CAPTURE_CAPACITY = 1 << 16    # Input samples the capture ring can hold (power of two)
+
+NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+
+def note_name(frequency):
+    """
+    Nearest equal-tempered note name (A4 = 440 Hz), e.g. "C#4".
+    """
+    if not frequency > 0:
+        return "-"
+    note = int(round(69 + 12 * np.log2(frequency / 440.0)))
+    return f"{NOTE_NAMES[note % 12]}{note // 12 - 1}"
+
+# ----------------------------
+# YIN
+# ----------------------------
+def yin(frames, sample_rate, min_frequency=MIN_FREQUENCY, max_frequency=MAX_FREQUENCY,
+        threshold=YIN_THRESHOLD):
+    """
+    Estimate the fundamental of every row of `frames` (n_frames x window)
+    with YIN (de Cheveigne & Kawahara, 2002), vectorised across frames.
+    The difference function is built from an FFT cross-correlation and
+    running energy sums, so a frame costs O(W log W) instead of O(W^2).
+    Returns (f0, confidence): f0 in Hz (0 where the frame is unvoiced) and
+    confidence = 1 - the normalised difference at the chosen lag.
+    """
+    frames = np.asarray(frames, dtype=np.float64)
+    count, window = frames.shape
+    half = window // 2
+    tau_min = max(2, int(sample_rate / max_frequency))
+    tau_max = min(half - 2, int(np.ceil(sample_rate / min_frequency)))
+
+    # d(tau) = sum_j (x_j - x_{j+tau})^2 over j < half
+    #        = E(0) + E(tau) - 2 r(tau)
+    size = 1 << int(np.ceil(np.log2(window + half)))
+    spectrum = np.fft.rfft(frames, size)
+    spectrum *= np.conj(np.fft.rfft(frames[:, :half], size))
+    correlation = np.fft.irfft(spectrum, size)[:, :half]
+    energy = np.zeros((count, window + 1))
+    np.cumsum(frames * frames, axis=1, out=energy[:, 1:])
+    lags = np.arange(half)
+    difference = energy[:, half:half + 1] + energy[:, lags + half] - energy[:, lags] - 2 * correlation
+    np.maximum(difference, 0.0, out=difference)
+
+    # Cumulative mean normalised difference d'(tau) = d(tau) * tau / sum d(1..tau)
+    running = np.cumsum(difference[:, 1:], axis=1)
+    normalised = np.ones_like(difference)
+    normalised[:, 1:] = difference[:, 1:] * lags[1:] / np.maximum(running, 1e-12)
+
+    # First lag that is below the threshold and at the bottom of its dip
+    search = normalised[:, tau_min:tau_max + 1]
+    candidate = (search[:, :-1] < threshold) & (search[:, :-1] <= search[:, 1:])
+    voiced = candidate.any(axis=1)
+    tau = np.where(voiced, candidate.argmax(axis=1), search.argmin(axis=1)) + tau_min
+
+    # Parabolic interpolation around the chosen lag
+    rows = np.arange(count)
+    before = normalised[rows, tau - 1]
+    at = normalised[rows, tau]
+    after = normalised[rows, tau + 1]
+    curvature = before - 2 * at + after
+    shift = np.where(np.abs(curvature) > 1e-12, 0.5 * (before - after) / np.where(curvature == 0, 1, curvature), 0.0)
+    shift = np.clip(shift, -0.5, 0.5)
+
+    rms = np.sqrt(energy[:, window] / window)
+    voiced &= rms > SILENCE_RMS
+    f0 = np.where(voiced, sample_rate / (tau + shift), 0.0)
+    confidence = np.where(rms > SILENCE_RMS, np.clip(1.0 - at, 0.0, 1.0), 0.0)
+    return f0, confidence
+
+class PitchDetector:
+    """
+    Streaming YIN: feed blocks of any size to process() and get one
+    (time, f0, confidence) estimate per hop, where time is the end of the
+    analysis window in seconds since the first sample. Every frame that
+    completes inside a block is analysed in one vectorised call, and the
+    latency is bounded by one window plus one hop.
+    """
+    def __init__(self, sample_rate=SAMPLE_RATE, window=WINDOW, hop=HOP,
+                 min_frequency=MIN_FREQUENCY, max_frequency=MAX_FREQUENCY,
+                 threshold=YIN_THRESHOLD, max_block=8192):
+        self.sample_rate = sample_rate
+        self.window = window
+        self.hop = hop
+        self.min_frequency = min_frequency
+        self.max_frequency = max_frequency
+        self.threshold = threshold
+        self._buffer = np.zeros(window + max_block, dtype=np.float32)
+        self._filled = 0
+        self._position = 0        # Stream index of _buffer[0]
+
+    def process(self, block):
+        """
+        Append `block` (1-D samples) and analyse every completed frame.
+        Returns (times, f0, confidence) arrays, possibly empty.
+        """
+        block = np.asarray(block, dtype=np.float32).reshape(-1)
+        results = []
+        start = 0
+        while start < len(block):
+            n = min(len(block) - start, len(self._buffer) - self._filled)
+            self._buffer[self._filled:self._filled + n] = block[start:start + n]
+            self._filled += n
+            start += n
+            if self._filled >= self.window:
+                results.append(self._analyse())
+        if not results:
+            empty = np.zeros(0)
+            return empty, empty, empty
+        return tuple(np.concatenate(parts) for parts in zip(*results))
+
+    def _analyse(self):
+        count = (self._filled - self.window) // self.hop + 1
+        frames = np.lib.stride_tricks.sliding_window_view(
+            self._buffer[:self._filled], self.window)[::self.hop][:count]
+        f0, confidence = yin(frames, self.sample_rate, self.min_frequency,
+                             self.max_frequency, self.threshold)
+        ends = self._position + np.arange(count) * self.hop + self.window
+        consumed = count * self.hop
+        remaining = self._filled - consumed
+        self._buffer[:remaining] = self._buffer[consumed:self._filled]
+        self._filled = remaining
+        self._position += consumed
+        return ends / self.sample_rate, f0, confidence
+
+# ----------------------------
+# Sources
+# ----------------------------
+def read_wav_blocks(path, blocksize=HOP):
+    """
+    Yield (sample_rate, block) pairs of float32 mono samples from a 16-bit
+    or 32-bit PCM WAV file; multi-channel files are averaged to mono.
+    """
+    with wave.open(path, "rb") as f:
+        sample_rate = f.getframerate()
+        channels = f.getnchannels()
+        width = f.getsampwidth()
+        if width not in (2, 4):
+            raise ValueError(f"Unsupported WAV sample width: {width * 8} bits")
+        dtype = "<i2" if width == 2 else "<i4"
+        scale = 1.0 / (32768.0 if width == 2 else 2147483648.0)
+        while True:
+            data = f.readframes(blocksize)
+            if not data:
+                break
+            samples = np.frombuffer(data, dtype=dtype).reshape(-1, channels)
+            yield sample_rate, (samples.mean(axis=1) * scale).astype(np.float32)
+
+def detect_file(path, blocksize=HOP, **options):
+    """
+    Run the streaming detector over a WAV file.
+    Returns (times, f0, confidence) arrays.
+    """
+    detector = None
+    results = []
+    for sample_rate, block in read_wav_blocks(path, blocksize):
+        if detector is None:
+            detector = PitchDetector(sample_rate, **options)
+        results.append(detector.process(block))
+    if not results:
+        empty = np.zeros(0)
+        return empty, empty, empty
+    return tuple(np.concatenate(parts) for parts in zip(*results))
+
+class InputCapture:
+    """
+    Capture the default input device with sounddevice and track its pitch.
+    The PortAudio callback only copies samples into a preallocated
+    single-producer ring; a background thread drains the ring, runs the
+    PitchDetector and calls `on_pitch(time, f0, confidence)` per hop. The
+    input callback therefore does no analysis and cannot delay the output
+    stream. `latest` holds the most recent (time, f0, confidence).
+    """
+    def __init__(self, detector=None, on_pitch=None, sample_rate=SAMPLE_RATE, blocksize=HOP,
+                 device=None, capacity=CAPTURE_CAPACITY):
+        if capacity & (capacity - 1):
+            raise ValueError("Capture capacity must be a power of two")
+        self.detector = detector or PitchDetector(sample_rate)
+        self.on_pitch = on_pitch
+        self.sample_rate = sample_rate
+        self.blocksize = blocksize
+        self.device = device
+        self.latest = (0.0, 0.0, 0.0)
+        self.overflows = 0
+        self._ring = np.zeros(capacity, dtype=np.float32)
+        self._mask = capacity - 1
+        self.write_index = 0
+        self.read_index = 0
+        self._stop = threading.Event()
+        self._data = threading.Event()
+        self._thread = None
+        self.stream = None
+
+    def _callback(self, indata, frames, time_info, status):
+        write = self.write_index
+        if write + frames - self.read_index > len(self._ring):
+            self.overflows += 1
+            return
+        start = write & self._mask
+        first = min(frames, len(self._ring) - start)
+        self._ring[start:start + first] = indata[:first, 0]
+        self._ring[:frames - first] = indata[first:frames, 0]
+        self.write_index = write + frames
+        self._data.set()
+
+    def start(self):
+        import sounddevice as sd
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pitch-detect", daemon=True)
+        self._thread.start()
+        self.stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype='float32',
+            blocksize=self.blocksize,
+            device=self.device,
+            callback=self._callback
+        )
+        self.stream.start()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        self._stop.set()
+        self._data.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._data.wait()
+            self._data.clear()
+            read = self.read_index
+            write = self.write_index
+            if write == read:
+                continue
+            start = read & self._mask
+            end = start + (write - read)
+            if end <= len(self._ring):
+                block = self._ring[start:end].copy()
+            else:
+                block = np.concatenate((self._ring[start:], self._ring[:end - len(self._ring)]))
+            self.read_index = write
+            for estimate in zip(*self.detector.process(block)):
+                self.latest = estimate
+                if self.on_pitch is not None:
+                    self.on_pitch(*estimate)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Track the pitch of a WAV file or the microphone.")
+    parser.add_argument("source", nargs="?", help="WAV file (default: live input)")
+    parser.add_argument("--min-confidence", type=float, default=1.0 - YIN_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    def report(time_s, f0, confidence):
+        if confidence >= args.min_confidence and f0 > 0:
+            print(f"{time_s:8.3f} s  {f0:8.2f} Hz  {note_name(f0):<4} confidence {confidence:.2f}")
+
+    if args.source:
+        for estimate in zip(*detect_file(args.source)):
+            report(*estimate)
+        return 0
+    capture = InputCapture(on_pitch=report)
+    capture.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -30,7 +30,8 @@ class Window(QMainWindow):
                 "Soundfonts\n"
                 "F1: Sawtooth, F2: Square, F3: Triangle, F4: Cosine\n"
                 "Recording Related\n"
-                "F5: Recording On/Off, F6: Playback Start, F7: Playback Stop and Reset",self)
+                "F5: Recording On/Off, F6: Playback Start, F7: Playback Stop and Reset\n"
+                "F8: Export Recording to WAV",self)
         self.hints.setGeometry(0, 50,1000,100)
         
 
@@ -54,14 +55,23 @@ class Window(QMainWindow):
             self.playback.setText("Playback: On")
         if e.key() == Qt.Key_F7:
             self.playback.setText("Playback: Off")
+        if e.key() == Qt.Key_Escape:
+            self.close()
 
 
+def run_window():
+    """
+    Show the window and run the Qt event loop until it is closed.
+    Must be called from the main thread. Returns the exit code.
+    """
+    # create pyqt5 app
+    App = QApplication.instance() or QApplication(sys.argv)
 
-# create pyqt5 app
-App = QApplication(sys.argv)
+    # create the instance of Window
+    window = Window()
 
-# create the instance of Window
-window = Window()
+    # start the app
+    return App.exec()
 
-# start the app
-sys.exit(App.exec())
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(run_window())
\ No newline at end of file
@@ -0,0 +1,117 @@
+from fractions import Fraction
+
+import numpy as np
+
+# ----------------------------
+# Resampler Configuration
+# ----------------------------
+RESAMPLER_TAPS = 32       # Filter taps per output sample when not decimating
+KAISER_BETA = 8.6         # Filter window shape (about 80 dB stopband)
+MAX_PHASES = 1024         # Largest interpolation factor; other ratios are approximated
+
+# ----------------------------
+# Filter Kernel
+# ----------------------------
+def sinc_kernel(distance, cutoff, half):
+    """
+    Kaiser-windowed sinc low-pass at `cutoff` (fraction of Nyquist),
+    evaluated at `distance` samples from its centre and zero beyond `half`.
+    Shared by every resampler in the synth.
+    """
+    taper = np.clip(1.0 - (distance / half) ** 2, 0.0, None)
+    kernel = cutoff * np.sinc(cutoff * distance) * np.i0(KAISER_BETA * np.sqrt(taper))
+    return kernel / np.i0(KAISER_BETA)
+
+# ----------------------------
+# Streaming Resampler
+# ----------------------------
+class StreamingResampler:
+    """
+    Polyphase windowed-sinc sample-rate converter that keeps its state
+    between blocks, so a stream can be converted block by block with no
+    clicks at the block boundaries.
+
+    The rate ratio is reduced to up/down (48000/44100 = 160/147). Output
+    sample n sits at input time n * down / up; its fractional part selects
+    one of `up` precomputed filter phases, so every output costs one dot
+    product of `taps` samples. When converting down the filter's cutoff
+    follows the new Nyquist frequency. Output stays time-aligned with the
+    input; each block is held back by taps / 2 input samples of look-ahead.
+    With channels > 1 blocks are interleaved (frames, channels) and every
+    channel goes through the same filter phases.
+    """
+    def __init__(self, input_rate, output_rate, taps=RESAMPLER_TAPS, channels=1):
+        ratio = Fraction(int(output_rate), int(input_rate)).limit_denominator(MAX_PHASES)
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.channels = channels
+        self.up = ratio.numerator
+        self.down = ratio.denominator
+        cutoff = min(1.0, self.up / self.down)
+        self.half = int(np.ceil(taps / 2 / cutoff))
+
+        # bank[p, k]: weight of input sample i + k - half + 1 for an output at
+        # input time i + p / up
+        phase = np.arange(self.up)[:, None] / self.up
+        distance = phase - np.arange(-self.half + 1, self.half + 1)
+        self.bank = sinc_kernel(distance, cutoff, self.half).astype(np.float32)
+        self._offsets = np.arange(2 * self.half)
+        self.reset()
+
+    def reset(self):
+        # The stream starts after `half` samples of silence
+        self._history = np.zeros((self.half, self.channels), dtype=np.float32)
+        self._history_start = -self.half      # Input index of _history[0]
+        self._produced = 0                    # Output samples so far
+        self._consumed = 0                    # Input samples so far
+
+    def process(self, block):
+        """
+        Convert the next block of input (1-D, or frames x channels) and
+        return every output sample that it completes, in the same layout.
+        """
+        block = np.asarray(block, dtype=np.float32).reshape(-1, self.channels)
+        history = np.concatenate((self._history, block))
+        self._consumed += len(block)
+        # Output n needs input up to (n * down) // up + half
+        last = (self._consumed - self.half) * self.up
+        count = max(0, -(-last // self.down) - self._produced) if last > 0 else 0
+        outputs = np.arange(self._produced, self._produced + count, dtype=np.int64) * self.down
+        base = outputs // self.up
+        phase = outputs - base * self.up
+        index = (base - self._history_start - self.half + 1)[:, None] + self._offsets
+        out = np.einsum("ijc,ij->ic", history[index], self.bank[phase]).astype(np.float32)
+        self._produced += count
+
+        # Keep only what the next output still needs
+        keep_from = (self._produced * self.down) // self.up - self.half + 1
+        drop = max(0, min(keep_from - self._history_start, len(history)))
+        self._history = history[drop:]
+        self._history_start += drop
+        return out[:, 0] if self.channels == 1 else out
+
+    def flush(self):
+        """
+        Return the tail still held in the filter, then reset.
+        """
+        expected = -(-self._consumed * self.up // self.down)
+        out = self.process(np.zeros((self.half + 1, self.channels), dtype=np.float32))
+        out = out[:max(0, len(out) - (self._produced - expected))]
+        self.reset()
+        return out
+
+def resample_blocks(blocks, input_rate, output_rate, taps=RESAMPLER_TAPS, channels=1):
+    """
+    Stream an iterable of blocks through a StreamingResampler, yielding the
+    converted blocks and the filter tail. Passes the blocks through
+    unchanged when the rates match.
+    """
+    if input_rate == output_rate:
+        yield from blocks
+        return
+    resampler = StreamingResampler(input_rate, output_rate, taps, channels)
+    for block in blocks:
+        out = resampler.process(block)
+        if len(out):
+            yield out
+    yield resampler.flush()
@@ -0,0 +1,256 @@
+import argparse
+import hashlib
+import multiprocessing
+import os
+import sys
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from keymap import KEY_FREQUENCIES, KEY_NOTES
+from resampler import RESAMPLER_TAPS, resample_blocks, sinc_kernel
+from pitch_detect import PitchDetector, read_wav_blocks, YIN_THRESHOLD, note_name
+from wave_cache import CACHE_DIR, cached_tables, table_info
+
+# ----------------------------
+# Instrument Configuration
+# ----------------------------
+SAMPLE_RATE = 44100
+ROOT_SPACING = 6          # Semitones between roots; no key is repitched more than half of this
+KERNEL_PHASES = 256       # Kernel table entries per input sample
+RESAMPLE_CHUNK = 8192     # Output samples computed per vectorised pass
+PV_FRAME = 2048           # Phase vocoder frame (samples)
+PV_HOP = 512              # Phase vocoder synthesis hop (samples)
+MAX_SECONDS = 8.0         # Recordings are cut to this length
+BANK_VERSION = 1          # Bump whenever the generated banks change
+
+# A bank file is a wave_cache file whose payload is one row per key note:
+#   length (as float32) | samples ... | zero padding to the longest row + 1
+# The trailing zero column lets the voice pool clamp its read index instead
+# of testing for the end of the sample.
+
+# ----------------------------
+# Resampling and Pitch Shifting
+# ----------------------------
+def resample(samples, ratio, length=None, taps=RESAMPLER_TAPS):
+    """
+    Read `samples` at `ratio` input samples per output sample (ratio > 1
+    raises the pitch and shortens the sound) with the Kaiser-windowed sinc
+    of resampler.py.
+    When reading faster than the input the kernel is widened and its cutoff
+    lowered, so nothing above the new Nyquist folds back.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    if length is None:
+        length = int(len(samples) / ratio)
+    cutoff = min(1.0, 1.0 / ratio)
+    half = int(np.ceil(taps / 2 / cutoff))
+    # The kernel is tabulated once per call and linearly interpolated, which
+    # is far cheaper than evaluating sinc and Bessel terms for every tap
+    grid = np.linspace(-half, half, 2 * half * KERNEL_PHASES + 1)
+    table = np.append(sinc_kernel(grid, cutoff, half), 0.0)
+    padded = np.pad(samples, (half, half + 1))
+    offsets = np.arange(-half + 1, half + 1)
+    out = np.empty(length, dtype=np.float32)
+    for start in range(0, length, RESAMPLE_CHUNK):
+        t = np.arange(start, min(start + RESAMPLE_CHUNK, length)) * ratio
+        base = np.floor(t)
+        index = base.astype(np.intp)[:, None] + offsets
+        np.clip(index, -half, len(samples) + half, out=index)
+        # Distance from every tap to the read position, in table steps
+        position = ((t - base)[:, None] - offsets + half) * KERNEL_PHASES
+        step = position.astype(np.intp)
+        position -= step
+        kernel = table[step]
+        kernel += position * (table[step + 1] - kernel)
+        out[start:start + len(t)] = np.einsum("ij,ij->i", padded[index + half], kernel)
+    return out
+
+def time_stretch(samples, factor, frame=PV_FRAME, hop=PV_HOP):
+    """
+    Stretch `samples` to `factor` times their length without changing the
+    pitch, with a phase vocoder: STFT frames are read at 1/factor of the
+    synthesis rate, magnitudes interpolated between frames and phases
+    advanced by each bin's measured frequency.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    window = np.hanning(frame + 1)[:frame]
+    padded = np.pad(samples, (frame // 2, frame))
+    count = (len(padded) - frame) // hop + 1
+    frames = np.lib.stride_tricks.sliding_window_view(padded, frame)[::hop][:count]
+    spectrum = np.fft.rfft(frames * window, axis=1)
+    spectrum = np.vstack((spectrum, np.zeros_like(spectrum[:1])))
+
+    steps = np.arange(0.0, count - 1, 1.0 / factor)
+    below = steps.astype(np.intp)
+    weight = (steps - below)[:, None]
+    magnitude = (1.0 - weight) * np.abs(spectrum[below]) + weight * np.abs(spectrum[below + 1])
+    expected = 2 * np.pi * hop * np.arange(frame // 2 + 1) / frame
+    advance = np.angle(spectrum[below + 1]) - np.angle(spectrum[below]) - expected
+    advance -= 2 * np.pi * np.round(advance / (2 * np.pi))
+    advance += expected
+    phase = np.angle(spectrum[0]) + np.vstack((np.zeros_like(advance[:1]), np.cumsum(advance[:-1], axis=0)))
+    synthesis = np.fft.irfft(magnitude * np.exp(1j * phase), frame, axis=1) * window
+
+    # Overlap-add, one hop-sized slice of every frame at a time
+    overlap = frame // hop
+    length = (len(steps) + overlap - 1) * hop
+    out = np.zeros(length)
+    norm = np.zeros(length)
+    square = (window * window).reshape(overlap, hop)
+    for part in range(overlap):
+        section = slice(part * hop, (part + len(steps)) * hop)
+        out[section] += synthesis[:, part * hop:(part + 1) * hop].reshape(-1)
+        norm[section] += np.tile(square[part], len(steps))
+    out /= np.maximum(norm, 1e-3)
+    start = int(frame // 2 * factor)
+    return out[start:start + int(len(samples) * factor)]
+
+def pitch_shift(samples, semitones):
+    """
+    Shift `samples` by `semitones` keeping their duration: a phase vocoder
+    stretch followed by a resample back to the original length.
+    """
+    if semitones == 0:
+        return np.asarray(samples, dtype=np.float32)
+    factor = 2.0 ** (semitones / 12.0)
+    return resample(time_stretch(samples, factor), factor, len(samples))
+
+# ----------------------------
+# Instrument Building
+# ----------------------------
+def read_sample(path, sample_rate=SAMPLE_RATE):
+    """
+    Load a WAV recording as float32 mono at `sample_rate`, converting it
+    with the streaming resampler while it is read.
+    """
+    with wave.open(path, "rb") as f:
+        source_rate = f.getframerate()
+    blocks = (block for _, block in read_wav_blocks(path, 65536))
+    blocks = list(resample_blocks(blocks, source_rate, sample_rate))
+    samples = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+    return samples[:int(MAX_SECONDS * sample_rate)]
+
+def detect_root(samples, sample_rate=SAMPLE_RATE):
+    """
+    Fundamental of a recorded note: the median of every confident YIN
+    estimate (pitch_detect.py) across the recording.
+    """
+    _, f0, confidence = PitchDetector(sample_rate).process(samples)
+    voiced = f0[(f0 > 0) & (confidence >= 1.0 - YIN_THRESHOLD)]
+    if not len(voiced):
+        raise ValueError("Could not detect the pitch of the sample")
+    return float(np.median(voiced))
+
+def plan_instrument(root_frequency, key_frequencies=KEY_FREQUENCIES, key_notes=KEY_NOTES,
+                    spacing=ROOT_SPACING):
+    """
+    Decide how every key note is made. Roots are pitch-shifted copies of the
+    recording every `spacing` semitones across the key map; each note is
+    resampled from its nearest root.
+    Returns (root shifts in semitones, [(note, frequency, root index)]).
+    """
+    frequencies = {key_notes[key]: frequency for key, frequency in key_frequencies.items()}
+    distance = {note: 12 * np.log2(frequency / root_frequency)
+                for note, frequency in frequencies.items()}
+    steps = {note: int(round(semitones / spacing)) for note, semitones in distance.items()}
+    first = min(steps.values())
+    shifts = [step * spacing for step in range(first, max(steps.values()) + 1)]
+    notes = [(note, frequencies[note], steps[note] - first) for note in sorted(frequencies)]
+    return shifts, notes
+
+def _render_note(root, root_frequency, frequency):
+    ratio = frequency / root_frequency
+    return resample(root, ratio, int(np.ceil(len(root) / ratio)))
+
+def build_bank(samples, root_frequency, key_frequencies=KEY_FREQUENCIES, key_notes=KEY_NOTES,
+               spacing=ROOT_SPACING, workers=None):
+    """
+    Render every key note of the key map from one recording. Roots and notes
+    are built on `workers` processes (all cores by default).
+    Returns the bank payload (see the file format above).
+    """
+    shifts, notes = plan_instrument(root_frequency, key_frequencies, key_notes, spacing)
+    root_frequencies = [root_frequency * 2.0 ** (shift / 12.0) for shift in shifts]
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        roots = list(executor.map(pitch_shift, [samples] * len(shifts), shifts))
+        rendered = list(executor.map(_render_note,
+                                     [roots[root] for _, _, root in notes],
+                                     [root_frequencies[root] for _, _, root in notes],
+                                     [frequency for _, frequency, _ in notes]))
+    width = max(len(note) for note in rendered) + 1
+    bank = np.zeros((len(rendered), width + 1), dtype=np.float32)
+    for row, note in enumerate(rendered):
+        bank[row, 0] = len(note)
+        bank[row, 1:len(note) + 1] = note
+    return bank
+
+class SampleBank:
+    """
+    A built instrument: `samples` holds one pre-pitched row per key note
+    (zero-padded, with a trailing zero column), `lengths` the length of each
+    row and `note_rows` the row of every MIDI note number (-1 if unmapped).
+    The arrays are read-only views of the memory-mapped bank file.
+    """
+    def __init__(self, data, notes, root_frequency):
+        self.lengths = data[:, 0].astype(np.int64)
+        self.samples = data[:, 1:]
+        self.note_rows = np.full(128, -1, dtype=np.intp)
+        self.note_rows[notes] = np.arange(len(notes))
+        self.root_frequency = root_frequency
+
+def load_instrument(path, sample_rate=SAMPLE_RATE, key_frequencies=KEY_FREQUENCIES,
+                    key_notes=KEY_NOTES, root_frequency=None, spacing=ROOT_SPACING,
+                    workers=None, cache_dir=CACHE_DIR):
+    """
+    Build the instrument for the recording at `path` once and map it from
+    the cache afterwards. The cache is keyed on the recording's contents,
+    so editing the file rebuilds it. The pitch is detected unless
+    `root_frequency` is given; the detected pitch is stored in the cache
+    header, so a cached load only hashes the file.
+    """
+    with open(path, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    notes = sorted({key_notes[key]: frequency for key, frequency in key_frequencies.items()}.items())
+    params = {
+        "sample_sha1": digest,
+        "sample_rate": sample_rate,
+        "root_frequency": root_frequency,      # None: detected at build time
+        "notes": notes,
+        "root_spacing": spacing,
+        "sinc_taps": RESAMPLER_TAPS,
+        "pv_frame": PV_FRAME,
+        "pv_hop": PV_HOP,
+        "bank_version": BANK_VERSION,
+    }
+    name = os.path.splitext(os.path.basename(path))[0]
+    bank_path = os.path.join(cache_dir, f"{name}-{digest[:16]}.samples")
+
+    def builder():
+        samples = read_sample(path, sample_rate)
+        root = root_frequency or detect_root(samples, sample_rate)
+        bank = build_bank(samples, root, key_frequencies, key_notes, spacing, workers)
+        return bank, {"root_frequency": root}
+
+    data = cached_tables(bank_path, params, builder)
+    root = root_frequency or table_info(bank_path)["root_frequency"]
+    return SampleBank(data, [note for note, _ in notes], root)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a playable instrument from one recorded note.")
+    parser.add_argument("sample", help="WAV recording of a single note")
+    parser.add_argument("--root", type=float, default=None, help="pitch of the recording in Hz (default: detect)")
+    parser.add_argument("--sample-rate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    bank = load_instrument(args.sample, args.sample_rate, root_frequency=args.root,
+                           workers=args.workers)
+    print(f"Root {bank.root_frequency:.2f} Hz ({note_name(bank.root_frequency)}), "
+          f"{len(bank.lengths)} notes, {bank.samples.nbytes / 1e6:.1f} MB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
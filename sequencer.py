@@ -0,0 +1,268 @@
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from event_queue import NOTE_ON, NOTE_OFF, PITCH_BEND, SUSTAIN, PRESSURE
+
+# ----------------------------
+# Recording Files
+# ----------------------------
+RECORDING_VERSION = 1
+
+def save_recording(path, events, sample_rate):
+    """
+    Save sample-indexed events to a JSON recording file. Notes are stored as
+    note numbers, so the file does not depend on the keyboard layout.
+    """
+    sample_time, kinds, notes = events
+    with open(path, "w") as f:
+        json.dump({
+            "version": RECORDING_VERSION,
+            "sample_rate": sample_rate,
+            "events": [[int(t), int(k), int(n)] for t, k, n in zip(sample_time, kinds, notes)],
+        }, f)
+
+def load_recording(path):
+    """
+    Load a recording file written by save_recording().
+    Returns (events, sample_rate).
+    """
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("version") != RECORDING_VERSION:
+        raise ValueError(f"Unsupported recording version in {path}")
+    rows = np.asarray(data["events"], dtype=np.int64).reshape(-1, 3)
+    events = (rows[:, 0].copy(), rows[:, 1].astype(np.int8), rows[:, 2].astype(np.int32))
+    return events, data["sample_rate"]
+
+# ----------------------------
+# Event Logs
+# ----------------------------
+# An event log is a 32-byte header
+#   magic (8 bytes) | version (uint32) | sample rate (uint32) | origin (float64, time.time()) | reserved
+# followed by fixed-size little-endian records, appended as they happen.
+# Loading maps the file with np.memmap, so a recording of any length opens
+# instantly and its columns are zero-copy views the sequencer can search.
+EVENT_LOG_MAGIC = b"SYNTHEVT"
+EVENT_LOG_VERSION = 1
+EVENT_DTYPE = np.dtype([
+    ("sample_time", "<i8"),
+    ("value", "<f4"),          # Velocity 0..1, bend in semitones, pedal 0/1 or pressure 0..1
+    ("kind", "i1"),
+    ("note", "i1"),
+    ("reserved", "V2"),
+])
+_LOG_HEADER = struct.Struct("<8sIId8x")
+
+class EventLog:
+    """
+    Recorder that streams events to disk instead of keeping them in memory.
+    record() converts a time.time() stamp to a sample index (the first event
+    of the log is sample 0) and appends one record; memory use does not grow
+    with the length of the session. Reopening an existing log appends to it.
+    """
+    def __init__(self, path, sample_rate):
+        self.path = path
+        header = _read_log_header(path) if os.path.exists(path) else None
+        if header is None:
+            self.file = open(path, "wb")
+            self.sample_rate = sample_rate
+            self.origin = 0.0
+            self.file.write(_LOG_HEADER.pack(EVENT_LOG_MAGIC, EVENT_LOG_VERSION, sample_rate, 0.0))
+            self.count = 0
+        else:
+            self.sample_rate, self.origin, self.count = header
+            self.file = open(path, "r+b")
+            # Drop a partly written record left by a crash
+            self.file.truncate(_LOG_HEADER.size + self.count * EVENT_DTYPE.itemsize)
+            self.file.seek(0, os.SEEK_END)
+        self._record = np.zeros(1, dtype=EVENT_DTYPE)
+
+    def __len__(self):
+        return self.count
+
+    def record(self, kind, note, value=1.0, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        if self.count == 0 and self.origin == 0.0:
+            self.origin = timestamp
+            self.file.seek(0)
+            self.file.write(_LOG_HEADER.pack(EVENT_LOG_MAGIC, EVENT_LOG_VERSION,
+                                              self.sample_rate, self.origin))
+            self.file.seek(0, os.SEEK_END)
+        record = self._record
+        record["sample_time"] = int(round((timestamp - self.origin) * self.sample_rate))
+        record["value"] = value
+        record["kind"] = kind
+        record["note"] = note
+        self.file.write(record.tobytes())
+        self.count += 1
+
+    def events(self):
+        """
+        Flush and map the log. Returns (sample_time, kind, note, value) views.
+        """
+        self.file.flush()
+        return load_event_log(self.path)[0]
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+def _read_log_header(path):
+    try:
+        with open(path, "rb") as f:
+            prefix = f.read(_LOG_HEADER.size)
+    except OSError:
+        return None
+    if len(prefix) != _LOG_HEADER.size:
+        return None
+    magic, version, sample_rate, origin = _LOG_HEADER.unpack(prefix)
+    if magic != EVENT_LOG_MAGIC or version != EVENT_LOG_VERSION:
+        return None
+    count = (os.path.getsize(path) - _LOG_HEADER.size) // EVENT_DTYPE.itemsize
+    return sample_rate, origin, count
+
+def load_event_log(path):
+    """
+    Map an event log read-only. Returns (events, sample_rate), where events
+    are (sample_time, kind, note, value) column views of the file.
+    """
+    header = _read_log_header(path)
+    if header is None:
+        raise ValueError(f"Not an event log: {path}")
+    sample_rate, _, count = header
+    if count == 0:
+        records = np.zeros(0, dtype=EVENT_DTYPE)
+    else:
+        records = np.memmap(path, dtype=EVENT_DTYPE, mode="r", offset=_LOG_HEADER.size, shape=(count,))
+    return (records["sample_time"], records["kind"], records["note"], records["value"]), sample_rate
+
+def load_events_file(path, sample_rate=44100):
+    """
+    Load any recording the synth can play: a JSON recording, an event log
+    (.events) or a Standard MIDI File (.mid). Returns (events, sample_rate);
+    MIDI files are timed in seconds and converted at `sample_rate`.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".mid", ".midi"):
+        from midi_file import read_midi
+        return read_midi(path, sample_rate), sample_rate
+    if extension == ".events":
+        return load_event_log(path)
+    return load_recording(path)
+
+# ----------------------------
+# Sequencer
+# ----------------------------
+class Sequencer:
+    """
+    Plays sample-indexed events back from inside the audio callback.
+    dispatch() is called once per block, before the voice pool renders, and
+    applies every event that falls inside the block at its exact sample
+    offset. Timing is therefore sample-accurate, never drifts, mixes with
+    live playing through the same pool, and costs no thread wake-ups.
+
+    load_events(), start() and stop() may be called from any thread: they only swap
+    in new arrays or set a request flag that the audio thread picks up at
+    the start of its next block.
+
+    Events are (sample_time, kind, note) arrays, optionally followed by a
+    value column (velocity, bend or pedal, see EventLog). They may be
+    memory-mapped: starting part-way through is a binary search, so even a
+    recording hours long seeks in well under a millisecond.
+    """
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        # Events the audio thread is playing, and the ones last loaded (which
+        # reach the audio thread with the next request)
+        self.events = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int8),
+                       np.zeros(0, dtype=np.int32))
+        self.loaded = self.events
+        self.playing = False
+        self.position = 0           # Samples since playback started
+        self.cursor = 0             # Index of the next event to apply
+        self.sounding = set()       # Notes started by playback (audio thread only)
+        # Requests are (serial, action, position, events) tuples swapped in
+        # atomically; the audio thread acts on each serial once, so no request
+        # is lost, and swaps the events and resets its cursor in one step.
+        self._request = (0, None, 0, self.events)
+        self._handled = 0
+
+    def load_events(self, events):
+        """
+        Swap in (sample_time, kind, note) arrays. Any running playback stops.
+        """
+        self.loaded = events
+        self._post("stop")
+
+    def start(self, seconds=0.0):
+        """
+        Play from `seconds` into the events (the beginning by default).
+        """
+        self._post("start", int(round(seconds * self.sample_rate)))
+
+    def stop(self):
+        self._post("stop")
+
+    def _post(self, action, position=0):
+        self._request = (self._request[0] + 1, action, position, self.loaded)
+
+    @property
+    def duration(self):
+        """
+        Length of the loaded events in samples.
+        """
+        sample_time = self.loaded[0]
+        return int(sample_time[-1]) if len(sample_time) else 0
+
+    def dispatch(self, pool, frames):
+        """
+        Apply the events of the next `frames` samples to `pool`.
+        Returns True while playback is running.
+        """
+        serial, action, position, events = self._request
+        if serial != self._handled:
+            self._handled = serial
+            self._release_all(pool)
+            self.events = events
+            self.playing = (action == "start")
+            self.position = position
+            self.cursor = int(np.searchsorted(self.events[0], position, side="left"))
+        if not self.playing:
+            return False
+
+        sample_time, kinds, notes = self.events[:3]
+        values = self.events[3] if len(self.events) > 3 else None
+        block_end = self.position + frames
+        end = int(np.searchsorted(sample_time, block_end, side="left"))
+        for i in range(self.cursor, end):
+            offset = int(sample_time[i]) - self.position
+            note = int(notes[i])
+            kind = kinds[i]
+            if kind == NOTE_ON:
+                pool.note_on(note, 1.0 if values is None else float(values[i]), offset)
+                self.sounding.add(note)
+            elif kind == NOTE_OFF:
+                pool.note_off(note, offset)
+                self.sounding.discard(note)
+            elif kind == PITCH_BEND:
+                pool.pitch_bend(float(values[i]))
+            elif kind == SUSTAIN:
+                pool.sustain_pedal(values[i] > 0.5, offset)
+            elif kind == PRESSURE:
+                pool.set_pressure(note, float(values[i]))
+        self.cursor = end
+        self.position = block_end
+        if self.cursor >= len(sample_time):
+            self._release_all(pool, frames - 1)
+            self.playing = False
+        return self.playing
+
+    def _release_all(self, pool, offset=0):
+        for note in self.sounding:
+            pool.note_off(note, offset)
+        self.sounding.clear()
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from wavetable import WAVE_KINDS, build_wavetable
+from wave_cache import cached_tables, load_tables, wavetable_params, _normalise
+
+try:
+    import fcntl
+except ImportError:          # Windows: fall back to an exclusive lock file
+    fcntl = None
+
+# ----------------------------
+# Store Configuration
+# ----------------------------
+# Tables live in RAM-backed /dev/shm where it exists, so every synth process
+# on the host maps the same physical pages. Each file is named after a hash
+# of its generation parameters, so synths running different table sizes or
+# generator versions never overwrite each other's tables.
+_SHM_ROOT = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+STORE_DIR = os.path.join(_SHM_ROOT, f"synth-wavetables-{os.getuid() if hasattr(os, 'getuid') else 0}")
+LOCK_TIMEOUT = 60.0       # Seconds to wait for another process to finish building
+LOCK_POLL = 0.01          # Seconds between lock attempts without fcntl
+
+def store_path(store_dir, kind):
+    """
+    Path of the table file for `kind`.
+    """
+    table_params = _normalise(wavetable_params(kind))
+    digest = hashlib.sha1(json.dumps(table_params, sort_keys=True).encode("utf-8")).hexdigest()
+    return os.path.join(store_dir, f"{kind}-{digest[:16]}.wavetable")
+
+@contextmanager
+def store_lock(store_dir, timeout=LOCK_TIMEOUT):
+    """
+    Hold the store's build lock, so only one process on the host renders
+    missing tables while the others wait and then attach to the result.
+    """
+    os.makedirs(store_dir, mode=0o700, exist_ok=True)
+    lock_path = os.path.join(store_dir, ".lock")
+    if fcntl is not None:
+        with open(lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                # The holder most likely died; take the lock over
+                os.remove(lock_path)
+            time.sleep(LOCK_POLL)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+def shared_wavetables(kinds=WAVE_KINDS, store_dir=STORE_DIR):
+    """
+    Return a dict of kind -> wavetable mip stack from the host-wide store.
+    Tables that are already in the store are mapped read-only straight away
+    (no lock, no copy). Missing or stale ones are built by the first process
+    to take the lock; processes that were waiting on it find them built and
+    just map them.
+    """
+    paths = {kind: store_path(store_dir, kind) for kind in kinds}
+    wavetables = {}
+    for kind in kinds:
+        tables = load_tables(paths[kind], wavetable_params(kind))
+        if tables is not None:
+            wavetables[kind] = tables
+    missing = [kind for kind in kinds if kind not in wavetables]
+    if missing:
+        with store_lock(store_dir):
+            for kind in missing:
+                wavetables[kind] = cached_tables(paths[kind], wavetable_params(kind),
+                                                 lambda: build_wavetable(kind))
+    return wavetables
+
+def clear_store(store_dir=STORE_DIR):
+    """
+    Delete every table file in the store. Processes that still map a file
+    keep their pages until they exit.
+    """
+    if not os.path.isdir(store_dir):
+        return
+    with store_lock(store_dir):
+        for name in os.listdir(store_dir):
+            if name.endswith(".wavetable"):
+                os.remove(os.path.join(store_dir, name))
@@ -0,0 +1,215 @@
+import sys
+import threading
+import time
+
+import numpy as np
+
+# ----------------------------
+# Telemetry Configuration
+# ----------------------------
+TELEMETRY_CAPACITY = 4096     # Blocks the ring can hold (power of two)
+POLL_INTERVAL = 0.25          # Seconds between reader passes
+
+# Status bits, one per PortAudio callback flag
+OUTPUT_UNDERFLOW = 1
+OUTPUT_OVERFLOW = 2
+INPUT_UNDERFLOW = 4
+INPUT_OVERFLOW = 8
+PRIMING_OUTPUT = 16
+STATUS_FLAGS = {
+    "output_underflow": OUTPUT_UNDERFLOW,
+    "output_overflow": OUTPUT_OVERFLOW,
+    "input_underflow": INPUT_UNDERFLOW,
+    "input_overflow": INPUT_OVERFLOW,
+    "priming_output": PRIMING_OUTPUT,
+}
+
+# Render time as a fraction of the block's real-time deadline
+LOAD_BINS = np.append(np.arange(0.0, 2.01, 0.05), np.inf)
+
+def status_bits(status):
+    """
+    Pack a sounddevice CallbackFlags object into the status bits above.
+    """
+    bits = 0
+    for name, bit in STATUS_FLAGS.items():
+        if getattr(status, name, False):
+            bits |= bit
+    return bits
+
+class CallbackTelemetry:
+    """
+    Single-producer ring buffer of per-block audio callback records.
+    The audio thread writes one record per block into preallocated arrays
+    (render time, frames, voices, status bits and the PortAudio time_info
+    stamps) and bumps write_index; nothing is allocated, locked or printed on
+    the audio thread. A TelemetryReader drains the ring in the background.
+    If the reader falls more than a ring behind, the oldest records are
+    overwritten and counted as dropped.
+    """
+    def __init__(self, sample_rate, capacity=TELEMETRY_CAPACITY):
+        if capacity & (capacity - 1):
+            raise ValueError("Telemetry capacity must be a power of two")
+        self.sample_rate = sample_rate
+        self.capacity = capacity
+        self._mask = capacity - 1
+        self.render_ns = np.zeros(capacity, dtype=np.int64)
+        self.frames = np.zeros(capacity, dtype=np.int32)
+        self.voices = np.zeros(capacity, dtype=np.int16)
+        self.status = np.zeros(capacity, dtype=np.uint8)
+        self.current_time = np.zeros(capacity, dtype=np.float64)
+        self.output_time = np.zeros(capacity, dtype=np.float64)
+        self.write_index = 0
+
+    # ----------------------------
+    # Producer Side
+    # ----------------------------
+    def record(self, render_ns, frames, voices, status, time_info):
+        """
+        Store one block's record. Called from the audio thread.
+        """
+        slot = self.write_index & self._mask
+        self.render_ns[slot] = render_ns
+        self.frames[slot] = frames
+        self.voices[slot] = voices
+        self.status[slot] = status_bits(status) if status else 0
+        if time_info is None:
+            self.current_time[slot] = np.nan
+            self.output_time[slot] = np.nan
+        else:
+            self.current_time[slot] = time_info.currentTime
+            self.output_time[slot] = time_info.outputBufferDacTime
+        self.write_index += 1
+
+    def instrument(self, callback, voice_pool=None):
+        """
+        Wrap an audio callback so every call is timed and recorded.
+        `voice_pool`, if given, supplies the sounding voice count.
+        """
+        def instrumented_callback(outdata, frames, time_info, status):
+            start = time.perf_counter_ns()
+            callback(outdata, frames, time_info, status)
+            render_ns = time.perf_counter_ns() - start
+            voices = voice_pool.active_count() if voice_pool is not None else 0
+            self.record(render_ns, frames, voices, status, time_info)
+        return instrumented_callback
+
+class TelemetryReader:
+    """
+    Background consumer of a CallbackTelemetry ring. Keeps running counters
+    and histograms of callback load (render time / deadline) and voice
+    count, and reports xruns to stderr in place of the callback's old
+    print(status). snapshot() returns a copy that is safe to use from any
+    thread.
+    """
+    def __init__(self, telemetry, interval=POLL_INTERVAL, log_xruns=True, max_voices=64):
+        self.telemetry = telemetry
+        self.interval = interval
+        self.log_xruns = log_xruns
+        self.read_index = 0
+        self.counters = {"blocks": 0, "dropped": 0, "deadline_misses": 0}
+        self.counters.update({name: 0 for name in STATUS_FLAGS})
+        self.load_histogram = np.zeros(len(LOAD_BINS) - 1, dtype=np.int64)
+        self.voice_histogram = np.zeros(max_voices + 1, dtype=np.int64)
+        self.max_load = 0.0
+        self.output_latency = (np.inf, 0.0)   # (min, max) seconds from callback to DAC
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-reader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.poll()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        """
+        Fold every record written since the last poll into the counters and
+        histograms. Returns the number of records read.
+        """
+        telemetry = self.telemetry
+        write = telemetry.write_index
+        read = self.read_index
+        dropped = max(0, write - read - telemetry.capacity)
+        read += dropped
+        if read >= write:
+            return 0
+        slots = np.arange(read, write) & telemetry._mask
+        render_ns = telemetry.render_ns[slots]
+        frames = telemetry.frames[slots]
+        voices = telemetry.voices[slots]
+        status = telemetry.status[slots]
+        latency = telemetry.output_time[slots] - telemetry.current_time[slots]
+        # Records the writer lapped while they were being copied are torn
+        overwritten = max(0, telemetry.write_index - telemetry.capacity - read)
+        if overwritten:
+            dropped += overwritten
+            render_ns, frames, voices, status, latency = (
+                render_ns[overwritten:], frames[overwritten:], voices[overwritten:],
+                status[overwritten:], latency[overwritten:])
+        self.read_index = write
+
+        load = render_ns / (frames / telemetry.sample_rate * 1e9)
+        flags = {name: int(np.count_nonzero(status & bit)) for name, bit in STATUS_FLAGS.items()}
+        latency = latency[np.isfinite(latency)]
+        with self._lock:
+            self.counters["blocks"] += len(load)
+            self.counters["dropped"] += dropped
+            self.counters["deadline_misses"] += int(np.count_nonzero(load > 1.0))
+            for name, count in flags.items():
+                self.counters[name] += count
+            self.load_histogram += np.histogram(load, LOAD_BINS)[0]
+            self.voice_histogram += np.bincount(np.clip(voices, 0, len(self.voice_histogram) - 1),
+                                                minlength=len(self.voice_histogram))
+            if len(load):
+                self.max_load = max(self.max_load, float(load.max()))
+            if len(latency):
+                self.output_latency = (min(self.output_latency[0], float(latency.min())),
+                                       max(self.output_latency[1], float(latency.max())))
+        xruns = {name: count for name, count in flags.items() if count and name != "priming_output"}
+        if self.log_xruns and xruns:
+            print("Audio xruns: " + ", ".join(f"{name} x{count}" for name, count in xruns.items()),
+                  file=sys.stderr)
+        return len(load)
+
+    def snapshot(self):
+        """
+        Return the counters and histograms collected so far as a dict.
+        """
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "load_bins": LOAD_BINS.tolist(),
+                "load_histogram": self.load_histogram.tolist(),
+                "voice_histogram": self.voice_histogram.tolist(),
+                "max_load": self.max_load,
+                "output_latency": self.output_latency if self.output_latency[1] else None,
+            }
+
+    def report(self, file=sys.stdout):
+        """
+        Print a short summary: counters, the 50th/99th percentile load read
+        off the histogram, and the worst block.
+        """
+        snapshot = self.snapshot()
+        counters = snapshot["counters"]
+        print("Audio callback telemetry:", file=file)
+        print("  " + ", ".join(f"{name}={count}" for name, count in counters.items()), file=file)
+        histogram = np.asarray(snapshot["load_histogram"])
+        if histogram.sum():
+            cumulative = np.cumsum(histogram) / histogram.sum()
+            p50 = LOAD_BINS[np.searchsorted(cumulative, 0.50) + 1]
+            p99 = LOAD_BINS[np.searchsorted(cumulative, 0.99) + 1]
+            print(f"  load p50 <= {p50:.0%}, p99 <= {p99:.0%}, max {snapshot['max_load']:.0%}",
+                  file=file)
@@ -0,0 +1,38 @@
+import numpy as np
+
+from effects import EffectsChain, FeedbackDelay, Reverb, StateVariableFilter, MAX_FRAMES
+
+def test_blocks_longer_than_max_frames():
+    signal = np.zeros((MAX_FRAMES + 904, 2), dtype=np.float32)
+    signal[0] = 1.0
+    for effect in (FeedbackDelay(44100, time=0.3, channels=2),
+                   Reverb(192000, channels=2)):
+        whole = signal.copy()
+        effect.process(whole)
+        effect.reset()
+        # Same result as the block split in two
+        split = signal.copy()
+        effect.process(split[:1000])
+        effect.process(split[1000:])
+        np.testing.assert_allclose(whole, split, atol=1e-6)
+
+def test_enable_resets_on_the_audio_thread():
+    delay = FeedbackDelay(44100, time=0.01)
+    chain = EffectsChain([delay])
+    block = np.zeros(256, dtype=np.float32)
+    block[0] = 1.0
+    chain.process(block)
+    chain.enable(delay, False)
+    chain.enable(delay, True)
+    # The echo still sits in the line until the chain's next block
+    assert np.abs(delay.lines.ring).max() > 0
+    silence = np.zeros(1024, dtype=np.float32)
+    chain.process(silence)
+    assert not silence.any()
+
+def test_export_settings_rebuild_the_effect():
+    for effect in (StateVariableFilter(44100, 800.0, 3.0, mode="highpass"),
+                   FeedbackDelay(44100, time=0.2, feedback=0.3, mix=0.4),
+                   Reverb(44100, room=0.7, tone=3000.0, mix=0.2)):
+        copy = type(effect)(44100, **effect.settings())
+        assert copy.settings() == effect.settings()
@@ -0,0 +1,20 @@
+import numpy as np
+
+from engine import SynthEngine
+
+def render_note(waveform, note, frames=4096):
+    engine = SynthEngine(backend="null", waveform=waveform, channels=1)
+    engine.initialize()
+    pool = engine.voice_pool
+    pool.note_on(note)
+    out = np.zeros(frames, dtype=np.float32)
+    pool.render(out)
+    return out
+
+def test_notes_outside_the_key_map_sound():
+    # The key map covers notes 48-84; MIDI input and playback reach the rest
+    high = render_note("saw", 96)
+    assert high.std() > 0.1
+    low = render_note("cos", 36)
+    assert low.std() > 0.1
+    assert abs(low[2048:].mean()) < 0.05
@@ -0,0 +1,36 @@
+from event_queue import EventQueue, NOTE_ON, NOTE_OFF
+
+class RecordingPool:
+    def __init__(self):
+        self.calls = []
+
+    def note_on(self, note, amplitude, offset):
+        self.calls.append(("on", note, offset))
+
+    def note_off(self, note, offset):
+        self.calls.append(("off", note, offset))
+
+def test_events_land_at_their_sample_offset():
+    queue = EventQueue()
+    now = 10.0
+    # 100 and 300 samples before the end of a 512-frame block at 1 kHz
+    queue.push(NOTE_ON, 60, 1.0, timestamp=now - 0.1)
+    queue.push(NOTE_OFF, 60, 0.0, timestamp=now - 0.3)
+    # Older than the block: clamped to its start
+    queue.push(NOTE_ON, 62, 1.0, timestamp=now - 5.0)
+    pool = RecordingPool()
+    assert queue.dispatch(pool, 512, 1000, now=now) == 3
+    assert pool.calls == [("on", 60, 412), ("off", 60, 212), ("on", 62, 0)]
+    assert len(queue) == 0
+
+def test_full_queue_drops_new_events():
+    queue = EventQueue(capacity=4)
+    for note in range(4):
+        assert queue.note_on(60 + note)
+    assert not queue.note_on(70)
+    assert len(queue) == 4
+    pool = RecordingPool()
+    queue.dispatch(pool, 64, 44100)
+    assert [call[1] for call in pool.calls] == [60, 61, 62, 63]
+    # Draining frees the ring again
+    assert queue.note_off(60)
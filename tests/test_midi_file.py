@@ -0,0 +1,44 @@
+import struct
+
+import numpy as np
+import pytest
+
+from event_queue import NOTE_ON, NOTE_OFF, PITCH_BEND, SUSTAIN, PRESSURE
+from midi_file import write_midi, read_midi, TICKS_PER_QUARTER
+
+def write_track(path, track):
+    with open(path, "wb") as f:
+        f.write(b"MThd" + struct.pack(">IHHH", 6, 0, 1, TICKS_PER_QUARTER))
+        f.write(b"MTrk" + struct.pack(">I", len(track)) + track)
+
+def test_write_read_round_trip(tmp_path):
+    path = str(tmp_path / "take.mid")
+    events = (np.array([0, 22050, 22050, 44100, 66150, 88200], dtype=np.int64),
+              np.array([NOTE_ON, PITCH_BEND, SUSTAIN, PRESSURE, SUSTAIN, NOTE_OFF], dtype=np.int8),
+              np.array([60, 0, 0, 60, 0, 60], dtype=np.int32),
+              np.array([0.5, 1.0, 1.0, 0.25, 0.0, 0.0], dtype=np.float32))
+    assert write_midi(path, events, 44100) == 6
+    sample_time, kinds, notes, values = read_midi(path, 44100)
+    np.testing.assert_array_equal(sample_time, events[0])
+    np.testing.assert_array_equal(kinds, events[1])
+    np.testing.assert_array_equal(notes, events[2])
+    np.testing.assert_allclose(values, events[3], atol=1 / 127)
+
+def test_running_status(tmp_path):
+    path = str(tmp_path / "running.mid")
+    # Note on 60, then note on 64 and a zero-velocity "off" sharing its status
+    write_track(path, b"\x00\x90\x3c\x40" b"\x00\x40\x40" b"\x83\x60\x3c\x00"
+                      b"\x00\xff\x2f\x00")
+    sample_time, kinds, notes, _ = read_midi(path, 1000)
+    assert list(kinds) == [NOTE_ON, NOTE_ON, NOTE_OFF]
+    assert list(notes) == [60, 64, 60]
+    # 480 ticks is one quarter note at 120 bpm
+    assert list(sample_time) == [0, 0, 500]
+
+def test_meta_events_cancel_running_status(tmp_path):
+    path = str(tmp_path / "broken.mid")
+    # A data byte straight after a meta event has no status to run on
+    write_track(path, b"\x00\x90\x3c\x40" b"\x00\xff\x01\x01x" b"\x00\x3c\x00"
+                      b"\x00\xff\x2f\x00")
+    with pytest.raises(ValueError):
+        read_midi(path, 1000)
@@ -0,0 +1,30 @@
+import numpy as np
+
+from mix_bus import MixBus, PeakLimiter, LIMITER_CEILING
+
+def test_limiter_never_exceeds_the_ceiling():
+    limiter = PeakLimiter(44100, channels=2)
+    rng = np.random.default_rng(1)
+    signal = (rng.standard_normal((8192, 2)) * 3.0).astype(np.float32)
+    out = signal.copy()
+    for start in range(0, len(out), 300):
+        limiter.process(out[start:start + 300])
+    assert np.abs(out).max() <= LIMITER_CEILING + 1e-6
+    assert limiter.gain_reduction < 1.0
+
+def test_limiter_delays_quiet_signals_by_its_latency():
+    limiter = PeakLimiter(44100)
+    signal = np.zeros(1024, dtype=np.float32)
+    signal[10] = 0.5
+    out = limiter.process(signal.copy())
+    assert np.flatnonzero(out).tolist() == [10 + limiter.latency]
+    assert out[10 + limiter.latency] == 0.5
+
+def test_mix_bus_compensates_polyphony():
+    bus = MixBus(44100)
+    assert bus.latency == bus.limiter.latency
+    block = np.full(44100, 0.1, dtype=np.float32)
+    bus.process(block, 4.0)
+    # Settles on 1/sqrt(energy) without ever jumping
+    assert abs(block[-1] - 0.05) < 1e-4
+    assert np.all(np.diff(block[bus.latency:]) <= 1e-7)
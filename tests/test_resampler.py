@@ -0,0 +1,25 @@
+import numpy as np
+
+from resampler import StreamingResampler, resample_blocks
+
+def test_block_splitting_does_not_change_the_output():
+    rng = np.random.default_rng(2)
+    signal = rng.standard_normal((5000, 2)).astype(np.float32)
+    whole = StreamingResampler(44100, 48000, channels=2)
+    expected = np.concatenate((whole.process(signal), whole.flush()))
+    split = StreamingResampler(44100, 48000, channels=2)
+    parts = [split.process(signal[0:1]), split.process(signal[1:333])]
+    parts += [split.process(signal[start:start + 700]) for start in range(333, 5000, 700)]
+    got = np.concatenate(parts + [split.flush()])
+    np.testing.assert_allclose(got, expected, atol=1e-6)
+    # 48000/44100 as many samples as went in
+    assert len(got) == -(-5000 * 160 // 147)
+
+def test_sine_survives_conversion():
+    t = np.arange(44100) / 44100
+    sine = np.sin(2 * np.pi * 1000 * t).astype(np.float32)
+    out = np.concatenate(list(resample_blocks([sine[i:i + 512] for i in range(0, 44100, 512)],
+                                              44100, 48000)))
+    reference = np.sin(2 * np.pi * 1000 * np.arange(len(out)) / 48000)
+    # Away from the edges the converted sine matches one sampled at 48 kHz
+    np.testing.assert_allclose(out[1000:-1000], reference[1000:-1000], atol=1e-3)
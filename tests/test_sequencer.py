@@ -0,0 +1,71 @@
+import numpy as np
+
+from event_queue import NOTE_ON, NOTE_OFF
+from sequencer import Sequencer, EventLog, load_event_log
+
+class RecordingPool:
+    def __init__(self):
+        self.calls = []
+
+    def note_on(self, note, amplitude, offset):
+        self.calls.append(("on", note, offset))
+
+    def note_off(self, note, offset):
+        self.calls.append(("off", note, offset))
+
+def make_events(rows):
+    sample_time, kinds, notes = zip(*rows)
+    return (np.array(sample_time, dtype=np.int64), np.array(kinds, dtype=np.int8),
+            np.array(notes, dtype=np.int32))
+
+EVENTS = make_events([(100, NOTE_ON, 60), (300, NOTE_OFF, 60), (1000, NOTE_ON, 64),
+                      (1200, NOTE_OFF, 64)])
+
+def test_events_play_at_their_sample_offsets():
+    sequencer = Sequencer(1000)
+    sequencer.load_events(EVENTS)
+    sequencer.start()
+    pool = RecordingPool()
+    while sequencer.dispatch(pool, 256):
+        pass
+    assert pool.calls == [("on", 60, 100), ("off", 60, 44), ("on", 64, 232), ("off", 64, 176)]
+    assert sequencer.duration == 1200
+
+def test_seek_starts_mid_recording():
+    sequencer = Sequencer(1000)
+    sequencer.load_events(EVENTS)
+    sequencer.start(0.9)
+    pool = RecordingPool()
+    sequencer.dispatch(pool, 256)
+    # Events before 900 samples are skipped; 1000 falls 100 into the block
+    assert pool.calls == [("on", 64, 100)]
+
+def test_load_events_stops_playback_and_swaps_on_the_next_block():
+    sequencer = Sequencer(1000)
+    sequencer.load_events(EVENTS)
+    sequencer.start()
+    pool = RecordingPool()
+    sequencer.dispatch(pool, 200)
+    assert pool.calls == [("on", 60, 100)]
+    # Loading from another thread only posts a request; the audio thread
+    # keeps its events until its next block, then releases the held note
+    sequencer.load_events(make_events([(10, NOTE_ON, 72)]))
+    assert sequencer.events[0][0] == 100
+    assert sequencer.duration == 10
+    assert not sequencer.dispatch(pool, 200)
+    assert pool.calls[-1] == ("off", 60, 0)
+    sequencer.start()
+    sequencer.dispatch(pool, 200)
+    assert pool.calls[-2:] == [("on", 72, 10), ("off", 72, 199)]
+
+def test_event_log_round_trip(tmp_path):
+    path = str(tmp_path / "take.events")
+    log = EventLog(path, 44100)
+    log.record(NOTE_ON, 60, 0.5, timestamp=100.0)
+    log.record(NOTE_OFF, 60, 0.0, timestamp=101.0)
+    log.close()
+    events, sample_rate = load_event_log(path)
+    assert sample_rate == 44100
+    assert list(events[0]) == [0, 44100]
+    assert list(events[1]) == [NOTE_ON, NOTE_OFF]
+    assert events[3][0] == 0.5
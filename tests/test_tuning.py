@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from tuning import (equal_temperament, just_intonation, read_scala, parse_pitch,
+                    tuning_frequencies, tuning_increments, note_frequency, TUNING_ROOT)
+
+SCALE = """! meantone.scl
+!
+Quarter-comma meantone (excerpt)
+ 3
+!
+ 193.157
+ 5/4
+ 2
+"""
+
+def test_equal_temperament():
+    table = equal_temperament()
+    assert table[69] == 440.0
+    assert table[81] == pytest.approx(880.0)
+    assert table[60] == pytest.approx(note_frequency(60))
+    assert equal_temperament(432.0)[69] == 432.0
+
+def test_just_intonation_on_its_root():
+    table = just_intonation()
+    root = table[TUNING_ROOT]
+    assert root == pytest.approx(note_frequency(TUNING_ROOT))
+    assert table[TUNING_ROOT + 7] == pytest.approx(root * 1.5)
+    assert table[TUNING_ROOT + 4] == pytest.approx(root * 1.25)
+    assert table[TUNING_ROOT - 12] == pytest.approx(root / 2)
+
+def test_parse_pitch():
+    assert parse_pitch("3/2") == 1.5
+    assert parse_pitch("2 ! octave") == 2.0
+    assert parse_pitch("1200.0") == pytest.approx(2.0)
+    with pytest.raises(ValueError):
+        parse_pitch("-3/2")
+
+def test_scala_file(tmp_path):
+    path = tmp_path / "meantone.scl"
+    path.write_text(SCALE)
+    description, ratios = read_scala(str(path))
+    assert description == "Quarter-comma meantone (excerpt)"
+    assert ratios == pytest.approx([2 ** (193.157 / 1200), 1.25, 2.0])
+    table = tuning_frequencies(str(path))
+    root = note_frequency(TUNING_ROOT)
+    # Three degrees per period: the scale repeats every three notes
+    assert table[TUNING_ROOT:TUNING_ROOT + 4] == pytest.approx(
+        [root, root * ratios[0], root * 1.25, root * 2])
+    increments = tuning_increments(str(path), 48000)
+    np.testing.assert_allclose(increments, table / 48000)
+
+def test_short_scala_file(tmp_path):
+    path = tmp_path / "short.scl"
+    path.write_text("Too short\n3\n3/2\n2\n")
+    with pytest.raises(ValueError):
+        read_scala(str(path))
+    with pytest.raises(ValueError):
+        tuning_frequencies("pythagorean")
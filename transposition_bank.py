@@ -0,0 +1,41 @@
+# ----------------------------
+# Bank Configuration
+# ----------------------------
+TRANSPOSITIONS = 53                  # Semitone shifts the keyboard can reach
+
+class Transposition:
+    """
+    Everything the voice pool needs to play one transposition: the phase
+    increment of every note number and the wavetable its voices read.
+    """
+    def __init__(self, shift, note_increments, table):
+        self.shift = shift
+        self.note_increments = note_increments
+        self.table = table
+
+def build_transposition(shift, base_increments, wavetable):
+    """
+    Compute transposition `shift` (in semitones) from the untransposed
+    increments. Every shift starts again from the base table, so nothing
+    compounds from one transposition to the next.
+    """
+    note_increments = base_increments * 2.0 ** (shift / 12.0)
+    return Transposition(shift, note_increments, wavetable)
+
+class TranspositionBank:
+    """
+    The transpositions the keyboard can reach. A transposition is one
+    multiply over 128 increments sharing the untransposed wavetable, so
+    get() builds it on demand in microseconds; nothing is cached.
+    """
+    def __init__(self, builder, count=TRANSPOSITIONS):
+        self.builder = builder
+        self.count = count
+
+    def get(self, shift):
+        """
+        Return transposition `shift`.
+        """
+        if not 0 <= shift < self.count:
+            raise IndexError(f"Transposition {shift} out of range 0-{self.count - 1}")
+        return self.builder(shift)
@@ -0,0 +1,118 @@
+import os
+
+# ----------------------------
+# Tuning Configuration
+# ----------------------------
+A4_FREQUENCY = 440.0      # Hz, concert pitch reference
+A4_NOTE = 69              # MIDI note number of A4
+NOTE_COUNT = 128          # Notes in every table (MIDI note numbers)
+TUNING_ROOT = 60          # Note that degree 0 of ratio tunings falls on (C4)
+
+# 5-limit just intonation, Scala style: the degrees above 1/1, ending with
+# the period (the octave)
+JUST_RATIOS = (16 / 15, 9 / 8, 6 / 5, 5 / 4, 4 / 3, 45 / 32, 3 / 2, 8 / 5, 5 / 3, 9 / 5,
+               15 / 8, 2.0)
+
+def note_frequency(note, a4=A4_FREQUENCY):
+    """
+    Frequency of `note` in 12-tone equal temperament.
+    """
+    return a4 * 2.0 ** ((note - A4_NOTE) / 12.0)
+
+# ----------------------------
+# Frequency Tables
+# ----------------------------
+def equal_temperament(a4=A4_FREQUENCY, divisions=12):
+    """
+    Frequency of every note number in `divisions`-tone equal temperament
+    with A4 at `a4` Hz.
+    """
+    import numpy as np
+    notes = np.arange(NOTE_COUNT)
+    return a4 * np.exp2((notes - A4_NOTE) / divisions)
+
+def ratio_tuning(ratios, root=TUNING_ROOT, root_frequency=None, a4=A4_FREQUENCY):
+    """
+    Frequency of every note number for a scale given, like a Scala file, as
+    the ratios of its degrees above 1/1 with the period last. Degree 0 is
+    `root`, sounding at `root_frequency` (by default its equal-tempered
+    frequency with A4 at `a4`); the scale repeats every period.
+    """
+    import numpy as np
+    if not ratios:
+        raise ValueError("A scale needs at least one degree")
+    degrees = np.array((1.0,) + tuple(ratios[:-1]))
+    period = float(ratios[-1])
+    if root_frequency is None:
+        root_frequency = note_frequency(root, a4)
+    periods, degree = np.divmod(np.arange(NOTE_COUNT) - root, len(degrees))
+    return root_frequency * period ** periods.astype(np.float64) * degrees[degree]
+
+def just_intonation(root=TUNING_ROOT, a4=A4_FREQUENCY):
+    """
+    Frequency of every note number in 5-limit just intonation on `root`.
+    """
+    return ratio_tuning(JUST_RATIOS, root, a4=a4)
+
+# ----------------------------
+# Scala Files
+# ----------------------------
+def parse_pitch(text):
+    """
+    Ratio of one Scala pitch line: cents if it has a period ("701.955"),
+    otherwise a ratio ("3/2") or a whole number ("2").
+    """
+    token = text.split()[0]
+    if "." in token:
+        return 2.0 ** (float(token) / 1200.0)
+    numerator, _, denominator = token.partition("/")
+    ratio = int(numerator) / int(denominator or 1)
+    if ratio <= 0:
+        raise ValueError(f"Invalid Scala pitch: {text!r}")
+    return ratio
+
+def read_scala(path):
+    """
+    Read a Scala .scl file. Returns (description, ratios), the ratios of
+    its degrees above 1/1 with the period last.
+    """
+    with open(path, encoding="latin-1") as handle:
+        lines = [line.strip() for line in handle if not line.startswith("!")]
+    if len(lines) < 2:
+        raise ValueError(f"Not a Scala file: {path}")
+    description = lines[0]
+    count = int(lines[1].split()[0])
+    pitches = [line for line in lines[2:] if line]
+    if count < 1 or len(pitches) < count:
+        raise ValueError(f"Scala file {path} lists fewer than {count} pitches")
+    return description, [parse_pitch(line) for line in pitches[:count]]
+
+def scala_tuning(path, root=TUNING_ROOT, root_frequency=None, a4=A4_FREQUENCY):
+    """
+    Frequency of every note number for the scale in a Scala .scl file.
+    """
+    _, ratios = read_scala(path)
+    return ratio_tuning(ratios, root, root_frequency, a4)
+
+# ----------------------------
+# Phase Increments
+# ----------------------------
+def tuning_frequencies(tuning="equal", a4=A4_FREQUENCY, root=TUNING_ROOT):
+    """
+    Frequency table of a tuning: "equal", "just", or the path of a Scala
+    .scl file.
+    """
+    if tuning == "equal":
+        return equal_temperament(a4)
+    if tuning == "just":
+        return just_intonation(root, a4)
+    if os.path.splitext(tuning)[1].lower() == ".scl":
+        return scala_tuning(tuning, root, a4=a4)
+    raise ValueError(f"Unknown tuning: {tuning}")
+
+def tuning_increments(tuning="equal", sample_rate=44100, a4=A4_FREQUENCY, root=TUNING_ROOT):
+    """
+    Phase increment (cycles per sample) of every note number in `tuning`,
+    ready to hand to a voice pool's set_note_increments().
+    """
+    return tuning_frequencies(tuning, a4, root) / sample_rate
@@ -0,0 +1,219 @@
+import numpy as np
+
+from effects import FILTER_CHUNK, FILTER_CHUNKS, chunk_indices, chunk_parts, svf_state_space
+
+# ----------------------------
+# Voice Filter Configuration
+# ----------------------------
+VOICE_CUTOFF = 1200.0     # Hz at middle C with the envelope closed
+VOICE_RESONANCE = 2.0     # Q
+KEY_TRACKING = 0.5        # Octaves of cutoff per octave of pitch (1.0 follows the note)
+ENVELOPE_AMOUNT = 2.0     # Octaves the cutoff opens at the envelope's peak
+TRACKING_CENTER = 60      # Note at which key tracking leaves the cutoff alone
+MIN_CUTOFF = 20.0         # Hz, bottom of the design table
+CUTOFF_STEPS = 96         # Designs per octave in the table (1/8 semitone apart)
+
+class VoiceFilterBank:
+    """
+    One resonant low-pass state-variable filter per voice slot, with every
+    slot's state and coefficients held in arrays and advanced together.
+
+    A voice's cutoff follows its key (KEY_TRACKING) and its amplitude
+    envelope (ENVELOPE_AMOUNT). The filter matrices for a grid of cutoffs
+    (CUTOFF_STEPS per octave) are computed once per resonance, off the
+    audio thread, in set(). Each block every slot's cutoff is rounded to
+    the grid, and only if a slot moved are the slots' matrices gathered
+    from the table into preallocated buffers, so a moving envelope costs a
+    few copies and nothing is allocated. Within a block the coefficients
+    are constant and each voice runs through the same chunked state-space
+    solution as effects.StateVariableFilter, batched over the slots, so 32
+    voices cost little more than a few. After a change the block is
+    rendered with both the old and the new matrices from the same state
+    and cross-faded, which interpolates the change across the block.
+    """
+    def __init__(self, max_voices, sample_rate, cutoff=VOICE_CUTOFF, resonance=VOICE_RESONANCE,
+                 key_tracking=KEY_TRACKING, envelope_amount=ENVELOPE_AMOUNT):
+        self.max_voices = max_voices
+        self.sample_rate = sample_rate
+        chunk, chunks = FILTER_CHUNK, FILTER_CHUNKS
+        span = chunk * chunks
+        self.points = int(np.log2(0.45 * sample_rate / MIN_CUTOFF) * CUTOFF_STEPS) + 1
+        toeplitz_index, chain_index = chunk_indices(chunk, chunks)
+        # Transposed so every product runs over (voices, chunks, samples) rows
+        self._toeplitz_index = np.ascontiguousarray(toeplitz_index.T)
+        self._chain_index = chain_index
+        self.state = np.zeros((max_voices, 2))
+        self._start = np.empty((max_voices, 2))
+        self._input = np.empty((max_voices, span))
+        self._output = np.empty((max_voices, span))
+        self._previous = np.empty((max_voices, span))
+        self._fade = np.empty(span)
+        self._ramp = np.arange(1, span + 1, dtype=np.float64)
+        self._ends = np.empty((max_voices, chunks, 2))
+        self._states = np.empty((max_voices, 2 * (chunks + 1), 1))
+        self._chained = np.empty((max_voices, 2 * (chunks + 1), 1))
+        self._carry = np.empty((max_voices, chunks, chunk))
+        self._tail_state = np.empty((max_voices, 1, 2))
+        self._power_state = np.empty((max_voices, 2, 1))
+        self._level = np.empty(max_voices)
+        self._next = np.zeros(max_voices, dtype=np.intp)
+        self._moved = np.empty(max_voices, dtype=bool)
+        # Two sets of per-slot matrices: the block's and the previous block's
+        self._designs = [self._design_buffers() for _ in range(2)]
+        self._design = None
+        self._index = np.zeros(max_voices, dtype=np.intp)
+        self._table_used = None
+        self.table = None
+        self.redesigns = 0
+        self.set(cutoff, resonance, key_tracking, envelope_amount)
+
+    def _design_buffers(self):
+        voices, chunk, chunks = self.max_voices, FILTER_CHUNK, FILTER_CHUNKS
+        impulse = np.empty((voices, chunk + 1))
+        steps = np.empty((voices, chunks + 2, 2, 2))
+        return {
+            "impulse": impulse,
+            "steps": steps,
+            "toeplitz": np.empty((voices, chunk, chunk)),
+            "from_state": np.empty((voices, 2, chunk)),
+            "to_state": np.empty((voices, chunk, 2)),
+            # Start states from the first chunk's: a view of the steps
+            "initial": steps[:, 1:].reshape(voices, 2 * (chunks + 1), 2),
+            "chain": np.empty((voices, 2 * (chunks + 1), 2 * chunks)),
+            "powers": np.empty((voices, chunk + 1, 2, 2)),
+        }
+
+    def _build_table(self, resonance):
+        cutoffs = MIN_CUTOFF * np.exp2(np.arange(self.points) / CUTOFF_STEPS)
+        impulse, from_state, to_state, steps, powers = chunk_parts(
+            *svf_state_space(cutoffs, resonance, self.sample_rate))
+        return {
+            "resonance": resonance,
+            "impulse": impulse,
+            "from_state": np.ascontiguousarray(np.swapaxes(from_state, -1, -2)),
+            "to_state": np.ascontiguousarray(np.swapaxes(to_state, -1, -2)),
+            "steps": steps,
+            "powers": powers,
+        }
+
+    def set(self, cutoff=None, resonance=None, key_tracking=None, envelope_amount=None):
+        """
+        Change the filter settings; may be called from any thread. A new
+        resonance rebuilds the design table here, before the swap.
+        """
+        previous = getattr(self, "settings", (VOICE_CUTOFF, VOICE_RESONANCE, KEY_TRACKING,
+                                                ENVELOPE_AMOUNT))
+        settings = tuple(old if new is None else float(new) for old, new in
+                         zip(previous, (cutoff, resonance, key_tracking, envelope_amount)))
+        if self.table is None or self.table["resonance"] != settings[1]:
+            self.table = self._build_table(settings[1])
+        self.settings = settings
+
+    def reset_voice(self, slot):
+        self.state[slot] = 0.0
+
+    def _gather(self, table, index, design):
+        """
+        Copy the table's matrices for every slot's cutoff `index` into the
+        `design` buffers and lay out their Toeplitz and chain matrices.
+        """
+        for name in ("impulse", "from_state", "to_state", "steps", "powers"):
+            np.take(table[name], index, axis=0, out=design[name], mode="clip")
+        np.take(design["impulse"], self._toeplitz_index, axis=1, out=design["toeplitz"],
+                mode="clip")
+        np.take(design["steps"].reshape(self.max_voices, -1), self._chain_index, axis=1,
+                out=design["chain"], mode="clip")
+
+    def _run(self, design, x, y):
+        """
+        Filter x (voices, frames) into y from self.state, updating it.
+        """
+        toeplitz, from_state, to_state = design["toeplitz"], design["from_state"], design["to_state"]
+        initial, chain, powers = design["initial"], design["chain"], design["powers"]
+        chunk = FILTER_CHUNK
+        voices, frames = x.shape
+        full = frames // chunk
+        tail = frames - full * chunk
+        state = self.state
+        if full:
+            chunks_in = x[:, :full * chunk].reshape(voices, full, chunk)
+            chunks_out = y[:, :full * chunk].reshape(voices, full, chunk)
+            np.matmul(chunks_in, toeplitz, out=chunks_out)
+            ends = self._ends[:, :full]
+            np.matmul(chunks_in, to_state, out=ends)
+            states = self._states[:, :2 * (full + 1)]
+            np.matmul(initial[:, :2 * (full + 1)], state[:, :, None], out=states)
+            chained = self._chained[:, :2 * (full + 1)]
+            np.matmul(chain[:, :2 * (full + 1), :2 * full], ends.reshape(voices, 2 * full, 1),
+                      out=chained)
+            states += chained
+            carry = self._carry[:, :full]
+            np.matmul(states[:, :2 * full].reshape(voices, full, 2), from_state, out=carry)
+            chunks_out += carry
+            state[:] = states[:, 2 * full:, 0]
+        if tail:
+            x_tail = x[:, None, full * chunk:]
+            y_tail = y[:, None, full * chunk:]
+            np.matmul(x_tail, toeplitz[:, :tail, :tail], out=y_tail)
+            carry = self._carry[:, :1, :tail]
+            np.matmul(state[:, None, :], from_state[:, :, :tail], out=carry)
+            y_tail += carry
+            np.matmul(x_tail, to_state[:, chunk - tail:], out=self._tail_state)
+            np.matmul(powers[:, tail], state[:, :, None], out=self._power_state)
+            np.add(self._power_state[:, :, 0], self._tail_state[:, 0], out=state)
+
+    def process(self, voices, notes, envelope):
+        """
+        Filter `voices` (voice slots x frames, float32) in place. `notes` are
+        the slots' note numbers and `envelope` their envelope levels (0..1)
+        at the end of the block.
+        """
+        cutoff, _, key_tracking, envelope_amount = self.settings
+        table = self.table
+        # Every slot's cutoff as a step on the table's grid
+        level = self._level
+        np.subtract(notes, TRACKING_CENTER, out=level)
+        level *= key_tracking / 12.0
+        level += envelope_amount * envelope
+        level += np.log2(cutoff / MIN_CUTOFF)
+        level *= CUTOFF_STEPS
+        np.rint(level, out=level)
+        np.clip(level, 0, self.points - 1, out=level)
+        np.copyto(self._next, level, casting="unsafe")
+
+        previous = self._design
+        changed = table is not self._table_used
+        if not changed:
+            changed = bool(np.not_equal(self._next, self._index, out=self._moved).any())
+        if changed:
+            design = self._designs[1] if previous is self._designs[0] else self._designs[0]
+            self._gather(table, self._next, design)
+            self._index[:] = self._next
+            self._table_used = table
+            self._design = design
+            self.redesigns += 1
+        design = self._design
+
+        frames = voices.shape[1]
+        span = FILTER_CHUNK * FILTER_CHUNKS
+        for start in range(0, frames, span):
+            block = voices[:, start:start + span]
+            n = block.shape[1]
+            x = self._input[:, :n]
+            y = self._output[:, :n]
+            x[:] = block
+            crossfade = changed and previous is not None and start == 0
+            if crossfade:
+                self._start[:] = self.state
+                old = self._previous[:, :n]
+                self._run(previous, x, old)
+                self.state[:] = self._start
+            self._run(design, x, y)
+            if crossfade:
+                fade = self._fade[:n]
+                np.multiply(self._ramp[:n], 1.0 / n, out=fade)
+                y -= old
+                y *= fade
+                y += old
+            np.copyto(block, y, casting="unsafe")
+        return voices
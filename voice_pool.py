@@ -0,0 +1,515 @@
+import numpy as np
+
+from bandlimited import BLEP_WAVEFORMS, render_blep
+from wavetable import mip_level
+
+# ----------------------------
+# Voice Pool Configuration
+# ----------------------------
+MAX_VOICES = 64           # Voice slots rendered every block
+MAX_FRAMES = 4096         # Largest block the scratch buffers can hold
+SAMPLE_WAVEFORM = "sample"    # Plays the loaded sample instrument
+VELOCITY_CURVE = 1.6      # Voice gain = velocity ** curve (1.0 is linear)
+PRESSURE_DEPTH = 0.5      # Full aftertouch raises a voice's gain by this fraction
+PAN_SPREAD = 0.6          # Pan of the keyboard's ends (-1 hard left .. 1 hard right)
+PAN_CENTER = 60           # Note panned to the centre
+PAN_WIDTH = 36            # Notes from the centre to full PAN_SPREAD
+
+def pan_gains(pan, channels, out=None):
+    """
+    Equal-power gains of a source at `pan` (-1..1) over `channels` speakers
+    spread evenly from left to right: the source sits between the two
+    nearest speakers, with cos/sin gains so its loudness does not change
+    as it moves. Mono is always 1.
+    """
+    gains = np.zeros(channels, dtype=np.float32) if out is None else out
+    gains[:] = 0.0
+    if channels == 1:
+        gains[0] = 1.0
+        return gains
+    position = (min(max(pan, -1.0), 1.0) + 1.0) / 2.0 * (channels - 1)
+    left = min(int(position), channels - 2)
+    angle = (position - left) * np.pi / 2.0
+    gains[left] = np.cos(angle)
+    gains[left + 1] = np.sin(angle)
+    return gains
+
+# Slot states
+FREE = 0
+ACTIVE = 1
+RELEASED = 2
+
+class VoicePool:
+    """
+    Polyphonic oscillator mixer backed by preallocated NumPy arrays.
+    Every voice slot has a phase, a phase increment, an amplitude, a state and
+    the note number it is playing. render() mixes all slots for a whole block
+    with a handful of array operations on scratch buffers created up front,
+    so the cost per block does not depend on how many notes are held and
+    nothing is allocated in the audio callback.
+
+    Notes can start and stop part-way through the next block: a voice's age
+    (in samples) is allowed to go negative before it starts, and its release
+    age marks the sample at which its release begins. Both are plain
+    per-voice numbers, so sample-accurate timing costs nothing extra in
+    render().
+
+    Every voice follows a linear ADSR envelope. The envelope is a function of
+    the voice's age, so render() evaluates it for the whole block with a few
+    array operations; released voices fade out over the release time and are
+    reclaimed once they reach silence. While the sustain pedal is down,
+    note-offs only mark voices as held; lifting the pedal releases them.
+    Pitch bend scales every voice's increment from the start of the next
+    block (sample voices are pre-pitched and do not bend). A voice's gain is
+    its velocity through VELOCITY_CURVE, raised by aftertouch pressure.
+
+    With channels > 1 every voice also has a pan position (spread across the
+    keyboard by default) and render() writes interleaved (frames, channels)
+    blocks: the oscillators and envelopes are computed once, and one matrix
+    product with the per-voice pan gains mixes them straight into `out`.
+
+    set_filter() gives every voice its own resonant low-pass with key
+    tracking and envelope modulation (voice_filter.VoiceFilterBank), applied
+    to all slots together after the envelope.
+
+    Saw, square and pulse voices are rendered with PolyBLEP (bandlimited.py);
+    every other waveform reads its band-limited wavetable mip stack. The
+    "sample" waveform plays a sample instrument (sample_instrument.py): one
+    pre-pitched recording per note, read one sample per frame and ended when
+    the recording runs out.
+    """
+    def __init__(self, wavetables, sample_rate, note_increments, waveform="saw",
+                 max_voices=MAX_VOICES, max_frames=MAX_FRAMES, attack=0.0, decay=0.0,
+                 sustain=1.0, release=0.0, pulse_width=0.5, normalize=True,
+                 velocity_curve=VELOCITY_CURVE, channels=1, pan_spread=PAN_SPREAD):
+        self.wavetables = wavetables
+        self.sample_rate = sample_rate
+        self.note_increments = note_increments
+        self.max_voices = max_voices
+        self.max_frames = max_frames
+        self.normalize = normalize
+        self.velocity_curve = velocity_curve
+        self.channels = channels
+        self.pan_spread = pan_spread
+
+        # Per-voice state (struct of arrays)
+        self.phase = np.zeros(max_voices, dtype=np.float64)
+        self.increment = np.zeros(max_voices, dtype=np.float64)
+        self.base_increment = np.zeros(max_voices, dtype=np.float64)     # Before pitch bend
+        self.held = np.zeros(max_voices, dtype=bool)                     # Key up, pedal down
+        self.amplitude = np.zeros(max_voices, dtype=np.float32)
+        self.velocity = np.zeros(max_voices, dtype=np.float32)           # Gain before pressure
+        self.pressure = np.zeros(max_voices, dtype=np.float32)
+        self.state = np.zeros(max_voices, dtype=np.int8)
+        self.note = np.full(max_voices, -1, dtype=np.int32)
+        self.age = np.zeros(max_voices, dtype=np.int64)
+        self.release_age = np.full(max_voices, np.inf)
+        self.end_age = np.full(max_voices, np.inf)
+        # Release ramp as a straight line in age: level = offset + slope * age
+        self.release_offset = np.zeros(max_voices, dtype=np.float64)
+        self.release_slope = np.zeros(max_voices, dtype=np.float64)
+        self.table_offset = np.zeros(max_voices, dtype=np.intp)
+        self.sample_offset = np.zeros(max_voices, dtype=np.intp)
+        self.pan = np.zeros(max_voices, dtype=np.float32)
+        self.pan_gain = np.zeros((max_voices, channels), dtype=np.float32)   # Voice -> channel
+
+        # Scratch buffers reused by every render() call
+        self._ramp = np.arange(max_frames, dtype=np.float64)
+        self._step = np.empty(max_voices, dtype=np.float64)
+        self._match = np.empty(max_voices, dtype=bool)
+        self._condition = np.empty(max_voices, dtype=bool)
+        # Per-voice scratch for note events, which run on the audio thread too
+        self._release_at = np.empty(max_voices, dtype=np.float64)
+        self._release_level = np.empty(max_voices, dtype=np.float64)
+        self._value = np.empty(max_voices, dtype=np.float64)
+        self._level = np.empty(max_voices, dtype=np.float64)
+        self._position = np.empty((max_voices, max_frames), dtype=np.float64)
+        self._index = np.empty((max_voices, max_frames), dtype=np.intp)
+        self._frac = np.empty((max_voices, max_frames), dtype=np.float32)
+        self._voices = np.empty((max_voices, max_frames), dtype=np.float32)
+        self._next = np.empty((max_voices, max_frames), dtype=np.float32)
+        self._gain = np.empty((max_voices, max_frames), dtype=np.float32)
+        self._gate = np.empty((max_voices, max_frames), dtype=bool)
+        self._envelope = np.zeros(max_voices, dtype=np.float64)
+
+        self.table = None
+        self.samples = None
+        self.bend = 1.0
+        self.pedal_down = False
+        self.filter = None
+        self.pulse_width = pulse_width
+        self.set_waveform(waveform)
+        self.set_envelope(attack, decay, sustain, release)
+
+    # ----------------------------
+    # Tuning
+    # ----------------------------
+    def set_note_increments(self, note_increments):
+        """
+        Retune the keyboard: swap in a new per-note increment table (see
+        tuning.tuning_increments). One reference swap, safe from any thread;
+        sounding voices keep their pitch and the next note_on() reads the new
+        table. Sample voices stay pitched as they were loaded.
+        """
+        self.note_increments = note_increments
+
+    # ----------------------------
+    # Waveform Selection
+    # ----------------------------
+    def set_waveform(self, waveform, pulse_width=None):
+        """
+        Switch every voice to another waveform: one of BLEP_WAVEFORMS, a
+        key of the wavetables dict or SAMPLE_WAVEFORM once set_samples() has
+        been called. Sounding voices keep their phase, so the change is
+        seamless.
+        """
+        if pulse_width is not None:
+            self.pulse_width = pulse_width
+        if waveform == SAMPLE_WAVEFORM:
+            if self.samples is None:
+                raise ValueError("No sample instrument loaded")
+        elif waveform not in BLEP_WAVEFORMS:
+            if waveform not in self.wavetables:
+                raise ValueError(f"Unknown waveform: {waveform}")
+            self.set_table(self.wavetables[waveform])
+        self.waveform = waveform
+
+    def set_table(self, table):
+        """
+        Load a wavetable mip stack (see wavetable.py) for the table waveforms.
+        """
+        self.levels, row = table.shape
+        self.table_size = row - 1
+        if self.table_size & (self.table_size - 1):
+            raise ValueError("Wavetable size must be a power of two")
+        self.top_harmonics = self.table_size // 4
+        self.table = table
+        self.flat_table = table.reshape(-1)
+        self._update_offsets()
+
+    def set_samples(self, samples, note_rows, lengths):
+        """
+        Load a sample instrument for SAMPLE_WAVEFORM: `samples` has one
+        recording per row followed by at least one zero, `note_rows` maps
+        note numbers to rows (-1 for none) and `lengths` gives each row's
+        length in samples.
+        """
+        self.sample_width = samples.shape[1] - 1
+        self.samples = samples
+        self.flat_samples = samples.reshape(-1)
+        self.sample_rows = note_rows
+        self.sample_lengths = lengths
+        rows = note_rows[np.maximum(self.note, 0)]
+        self.sample_offset[:] = np.where(rows >= 0, rows * samples.shape[1], self.sample_width)
+
+    def _update_offsets(self):
+        level = mip_level(self.increment, self.levels, self.top_harmonics, out=self._level)
+        np.multiply(level, self.table_size + 1, out=self.table_offset, casting="unsafe")
+
+    # ----------------------------
+    # Envelope
+    # ----------------------------
+    def set_envelope(self, attack, decay, sustain, release):
+        """
+        Set the ADSR envelope: attack, decay and release in seconds, sustain
+        as a fraction of the peak level. Voices already releasing keep the
+        release they started with.
+        """
+        self.attack_samples = max(1, int(attack * self.sample_rate))
+        self.decay_samples = max(1, int(decay * self.sample_rate))
+        self.sustain = min(max(sustain, 0.0), 1.0)
+        self.release_samples = max(1, int(release * self.sample_rate))
+
+    def envelope_level(self, age):
+        """
+        Level of a held note at `age` samples (scalar or array): a linear rise
+        to 1 over the attack, then a linear fall to the sustain level.
+        """
+        rise = (np.asarray(age, dtype=np.float64) + 1.0) / self.attack_samples
+        fall = 1.0 - (1.0 - self.sustain) * (age - self.attack_samples) / self.decay_samples
+        return np.clip(np.minimum(rise, np.maximum(fall, self.sustain)), 0.0, 1.0)
+
+    # ----------------------------
+    # Note Management
+    # ----------------------------
+    def note_on(self, note, amplitude=1.0, offset=0):
+        """
+        Start `note` in a free slot, `offset` samples into the next block.
+        The phase increment comes from note_increments. If every slot is busy
+        the oldest voice is stolen.
+        Returns the slot index.
+        """
+        slot = int(np.argmin(self.state))
+        if self.state[slot] != FREE:
+            slot = int(np.argmax(self.age))
+        increment = self.note_increments[note] * self.bend
+        self.state[slot] = FREE
+        self.base_increment[slot] = self.note_increments[note]
+        self.increment[slot] = increment
+        self.held[slot] = False
+        # Start the phase so that it reaches 0 exactly at `offset`
+        self.phase[slot] = (-increment * offset) % 1.0
+        velocity = min(max(float(amplitude), 0.0), 1.0) ** self.velocity_curve
+        self.velocity[slot] = velocity
+        self.pressure[slot] = 0.0
+        self.amplitude[slot] = velocity
+        self.set_voice_pan(slot, self.key_pan(note))
+        if self.filter is not None:
+            self.filter.reset_voice(slot)
+        self.note[slot] = note
+        self.age[slot] = -offset
+        self.release_age[slot] = np.inf
+        self.end_age[slot] = np.inf
+        if self.table is not None:
+            level = mip_level(increment, self.levels, self.top_harmonics)
+            self.table_offset[slot] = level * (self.table_size + 1)
+        if self.samples is not None:
+            # Unmapped notes read the zero at the end of the first row
+            row = self.sample_rows[note]
+            self.sample_offset[slot] = row * (self.sample_width + 1) if row >= 0 else self.sample_width
+            if self.waveform == SAMPLE_WAVEFORM:
+                self.end_age[slot] = self.sample_lengths[row] if row >= 0 else 0
+        self.state[slot] = ACTIVE
+        return slot
+
+    def note_off(self, note, offset=0):
+        """
+        Release every voice playing `note`, `offset` samples into the next
+        block. The voice fades from its current envelope level to silence over
+        the release time and its slot is reclaimed after that. With the
+        sustain pedal down the voices keep sounding until it is lifted.
+        """
+        match = self._match
+        np.equal(self.note, note, out=match)
+        match &= np.equal(self.state, ACTIVE, out=self._condition)
+        if self.pedal_down:
+            self.held |= match
+            return
+        self._release(match, offset)
+
+    def _release(self, match, offset):
+        if not match.any():
+            return
+        # Worked out for every slot in scratch buffers, then copied into the
+        # matching ones, so releasing allocates nothing
+        release_age = self._release_at
+        np.add(self.age, float(offset), out=release_age)
+        # Fall from the level of the last held sample (envelope_level(age - 1))
+        level = self._release_level
+        value = self._value
+        np.divide(release_age, self.attack_samples, out=level)
+        np.subtract(release_age, 1.0 + self.attack_samples, out=value)
+        value *= -(1.0 - self.sustain) / self.decay_samples
+        value += 1.0
+        np.maximum(value, self.sustain, out=value)
+        np.minimum(level, value, out=level)
+        np.clip(level, 0.0, 1.0, out=level)
+        np.copyto(self.release_age, release_age, where=match)
+        np.add(release_age, self.release_samples, out=value)
+        np.minimum(value, self.end_age, out=value)
+        np.copyto(self.end_age, value, where=match)
+        # The ramp reaches 0 on the last release sample
+        np.multiply(level, -1.0 / self.release_samples, out=value)
+        np.copyto(self.release_slope, value, where=match)
+        np.subtract(release_age, 1.0, out=value)
+        value *= 1.0 / self.release_samples
+        value += 1.0
+        value *= level
+        np.copyto(self.release_offset, value, where=match)
+        np.copyto(self.state, RELEASED, where=match)
+
+    def sustain_pedal(self, down, offset=0):
+        """
+        Press or lift the sustain pedal. Lifting it releases every voice
+        whose key went up while it was down, `offset` samples into the block.
+        """
+        self.pedal_down = bool(down)
+        if not self.pedal_down:
+            match = self._match
+            np.equal(self.state, ACTIVE, out=match)
+            match &= self.held
+            self.held[:] = False
+            self._release(match, offset)
+
+    def set_filter(self, cutoff, resonance=None, key_tracking=None, envelope_amount=None):
+        """
+        Give every voice a resonant low-pass: `cutoff` in Hz at middle C with
+        the envelope closed, opened by `envelope_amount` octaves at the
+        envelope's peak and moved `key_tracking` octaves per octave of pitch.
+        A cutoff of None removes the filters.
+        """
+        if cutoff is None:
+            self.filter = None
+            return
+        if self.filter is None:
+            from voice_filter import VoiceFilterBank
+            # The bank builds its design table before the audio thread sees it
+            self.filter = VoiceFilterBank(self.max_voices, self.sample_rate, cutoff, resonance,
+                                          key_tracking, envelope_amount)
+        else:
+            self.filter.set(cutoff, resonance, key_tracking, envelope_amount)
+
+    def key_pan(self, note):
+        """
+        Pan of `note`: low notes to the left, high notes to the right.
+        """
+        return self.pan_spread * min(max((note - PAN_CENTER) / PAN_WIDTH, -1.0), 1.0)
+
+    def set_voice_pan(self, slot, pan):
+        self.pan[slot] = pan
+        pan_gains(pan, self.channels, out=self.pan_gain[slot])
+
+    def set_pan(self, note, pan):
+        """
+        Move every sounding voice playing `note` to `pan` (-1..1).
+        """
+        match = self._match
+        np.not_equal(self.state, FREE, out=match)
+        match &= np.equal(self.note, note, out=self._condition)
+        if match.any():
+            for slot in range(self.max_voices):
+                if match[slot]:
+                    self.set_voice_pan(slot, pan)
+
+    def set_pressure(self, note, pressure):
+        """
+        Aftertouch: set the pressure (0..1) of every voice playing `note`,
+        or of every sounding voice if `note` is negative (channel pressure).
+        """
+        match = self._match
+        np.not_equal(self.state, FREE, out=match)
+        if note >= 0:
+            match &= np.equal(self.note, note, out=self._condition)
+        np.copyto(self.pressure, pressure, where=match)
+        np.multiply(self.velocity, 1.0 + PRESSURE_DEPTH * pressure, out=self._value)
+        np.copyto(self.amplitude, self._value, where=match, casting="same_kind")
+
+    def energy(self):
+        """
+        Sum of the squared gains of the sounding voices: the polyphony the mix
+        bus compensates for, with soft notes counting for less.
+        """
+        return float(np.dot(self.amplitude, self.amplitude))
+
+    def pitch_bend(self, semitones):
+        """
+        Bend every voice, sounding and future, by `semitones`.
+        """
+        self.bend = 2.0 ** (semitones / 12.0)
+        np.multiply(self.base_increment, self.bend, out=self.increment)
+        if self.table is not None:
+            self._update_offsets()
+
+    def all_notes_off(self):
+        self.held[:] = False
+        self.state[:] = FREE
+        self.amplitude[:] = 0.0
+        self.release_age[:] = np.inf
+        self.end_age[:] = np.inf
+
+    def active_count(self):
+        return int(np.count_nonzero(self.state))
+
+    # ----------------------------
+    # Rendering
+    # ----------------------------
+    def render(self, out):
+        """
+        Mix one block of every voice into `out`: 1-D float32 for mono, or an
+        interleaved (frames, channels) float32 block such as the backend's
+        outdata, each voice weighted by its pan gains.
+        The mix is scaled by 1/sqrt(active voices) like the original callback,
+        unless the pool was created with normalize=False (the engine leaves
+        the scaling to mix_bus.MixBus, which smooths it).
+        Blocks longer than max_frames are rendered in max_frames chunks.
+        """
+        frames = out.shape[0]
+        if frames > self.max_frames:
+            for start in range(0, frames, self.max_frames):
+                self.render(out[start:start + self.max_frames])
+            return out
+        position = self._position[:, :frames]
+        index = self._index[:, :frames]
+        frac = self._frac[:, :frames]
+        voices = self._voices[:, :frames]
+        following = self._next[:, :frames]
+        gain = self._gain[:, :frames]
+        gate = self._gate[:, :frames]
+        ramp = self._ramp[:frames]
+
+        # Phase of every voice at every sample in the block, in cycles
+        np.multiply(self.increment[:, None], ramp, out=position)
+        position += self.phase[:, None]
+
+        if self.waveform in BLEP_WAVEFORMS:
+            render_blep(self.waveform, position, self.increment, voices,
+                        (following, frac), index, self.pulse_width)
+        elif self.waveform == SAMPLE_WAVEFORM:
+            # Notes are pre-pitched, so a voice reads its row at its age;
+            # reads past the end clamp onto the trailing zero
+            np.add(self.age[:, None], ramp, out=position)
+            np.clip(position, 0, self.sample_width, out=position)
+            np.copyto(index, position, casting="unsafe")
+            index += self.sample_offset[:, None]
+            np.take(self.flat_samples, index, out=voices, mode="clip")
+        else:
+            # Linear interpolation between neighbouring table samples. The
+            # table size is a power of two, so wrapping is a bit mask on the
+            # integer index instead of a floating-point remainder.
+            position *= self.table_size
+            np.copyto(index, position, casting="unsafe")
+            np.subtract(position, index, out=frac, casting="unsafe")
+            index &= self.table_size - 1
+            index += self.table_offset[:, None]
+            np.take(self.flat_table, index, out=voices, mode="clip")
+            index += 1
+            np.take(self.flat_table, index, out=following, mode="clip")
+            following -= voices
+            following *= frac
+            voices += following
+
+        # Envelope from each voice's age at every sample of the block
+        np.add(self.age[:, None], ramp, out=position)
+        np.greater_equal(position, self.release_age[:, None], out=gate)
+        # Attack: rise from 0 at age -1 to 1 at the end of the attack
+        np.add(position, 1.0, out=gain, casting="unsafe")
+        gain *= 1.0 / self.attack_samples
+        # Decay: fall from 1 to the sustain level, then hold
+        np.subtract(position, self.attack_samples, out=frac, casting="unsafe")
+        frac *= -(1.0 - self.sustain) / self.decay_samples
+        frac += 1.0
+        np.maximum(frac, self.sustain, out=frac)
+        np.minimum(gain, frac, out=gain)
+        # Release: the per-voice ramp replaces the held level after release
+        position *= self.release_slope[:, None]
+        position += self.release_offset[:, None]
+        np.copyto(gain, position, where=gate, casting="unsafe")
+        # Silent before the start offset and after the release; scaled by
+        # each voice's amplitude (0 when free)
+        np.clip(gain, 0.0, 1.0, out=gain)
+        np.copyto(self._envelope, gain[:, frames - 1])
+        gain *= self.amplitude[:, None]
+        voices *= gain
+        voice_filter = self.filter
+        if voice_filter is not None:
+            voice_filter.process(voices, self.note, self._envelope)
+        if out.ndim == 1:
+            np.sum(voices, axis=0, out=out)
+        else:
+            np.matmul(voices.T, self.pan_gain, out=out)
+
+        note_count = np.count_nonzero(self.state)
+        if self.normalize and note_count > 0:
+            out *= 1.0 / np.sqrt(note_count)
+
+        # Advance the phase accumulators and reclaim finished voices
+        np.multiply(self.increment, frames, out=self._step)
+        self.phase += self._step
+        np.remainder(self.phase, 1.0, out=self.phase)
+        self.age += frames
+        np.greater_equal(self.age, self.end_age, out=self._match)
+        np.copyto(self.state, FREE, where=self._match)
+        np.copyto(self.amplitude, 0.0, where=self._match)
+        np.copyto(self.release_age, np.inf, where=self._match)
+        np.copyto(self.end_age, np.inf, where=self._match)
+        return out
@@ -0,0 +1,138 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from wavetable import TABLE_SIZE, MIP_LEVELS, WAVETABLE_VERSION, WAVE_KINDS, build_wavetable
+
+# ----------------------------
+# Cache File Format
+# ----------------------------
+# A cache file is
+#   magic (8 bytes) | format version (uint32) | header length (uint32)
+#   | JSON header (utf-8, padded with spaces) | raw little-endian float32 payload
+# The payload starts on a 64-byte boundary so it can be mapped with np.memmap
+# and handed to the voice pool without copying. The header records every
+# parameter the payload was generated from; a file whose parameters differ
+# from the caller's is treated as stale and rebuilt.
+CACHE_MAGIC = b"SYNTHWT\0"
+CACHE_VERSION = 1
+CACHE_ALIGNMENT = 64
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wave_cache")
+
+_PREFIX = struct.Struct("<8sII")
+
+def _normalise(params):
+    # Round-trip through JSON so tuples/lists and int/float compare the same
+    return json.loads(json.dumps(params, sort_keys=True))
+
+def save_tables(path, data, params, info=None):
+    """
+    Write `data` (any float32-compatible array) and its generation `params`
+    to `path`, with an optional JSON-able `info` dict of results the build
+    found out (see table_info()). The file is written next to the target and
+    renamed into place, so readers never see a half-written cache.
+    """
+    data = np.ascontiguousarray(data, dtype="<f4")
+    header = {
+        "params": _normalise(params),
+        "shape": list(data.shape),
+        "dtype": "<f4",
+    }
+    if info is not None:
+        header["info"] = _normalise(info)
+    header_bytes = json.dumps(header, sort_keys=True).encode("utf-8")
+    payload_offset = _PREFIX.size + len(header_bytes)
+    payload_offset += -payload_offset % CACHE_ALIGNMENT
+    header_bytes += b" " * (payload_offset - _PREFIX.size - len(header_bytes))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(_PREFIX.pack(CACHE_MAGIC, CACHE_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(data.tobytes())
+    os.replace(temp_path, path)
+
+def read_header(path):
+    """
+    Return (header dict, payload offset) for a cache file, or None if the
+    file is missing, not a cache file or written by another format version.
+    """
+    try:
+        with open(path, "rb") as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) != _PREFIX.size:
+                return None
+            magic, version, header_length = _PREFIX.unpack(prefix)
+            if magic != CACHE_MAGIC or version != CACHE_VERSION:
+                return None
+            header = json.loads(f.read(header_length).decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+    return header, _PREFIX.size + header_length
+
+def load_tables(path, params):
+    """
+    Map the payload of a cache file read-only, zero-copy.
+    Returns None if the file is missing, corrupt, or was generated from
+    different parameters than `params`.
+    """
+    found = read_header(path)
+    if found is None:
+        return None
+    header, offset = found
+    if header.get("params") != _normalise(params):
+        return None
+    shape = tuple(header["shape"])
+    expected = offset + int(np.prod(shape)) * np.dtype(header["dtype"]).itemsize
+    if os.path.getsize(path) != expected:
+        return None
+    return np.memmap(path, dtype=header["dtype"], mode="r", offset=offset, shape=shape)
+
+def table_info(path):
+    """
+    The `info` dict saved with a cache file, or None.
+    """
+    found = read_header(path)
+    return None if found is None else found[0].get("info")
+
+def cached_tables(path, params, builder):
+    """
+    Load tables from `path`, or build them with `builder()` and write the
+    cache first if it is missing or stale. `builder` returns the payload, or
+    (payload, info) to store an info dict with it. Always returns a
+    read-only memmap.
+    """
+    tables = load_tables(path, params)
+    if tables is None:
+        built = builder()
+        data, info = built if isinstance(built, tuple) else (built, None)
+        save_tables(path, data, params, info)
+        tables = load_tables(path, params)
+    return tables
+
+# ----------------------------
+# Wavetables
+# ----------------------------
+def wavetable_params(kind):
+    """
+    Everything one waveform's tables depend on: the waveform kind, table
+    geometry and generator version. The tables are in cycles, not Hz, so
+    the sample rate and key frequencies play no part.
+    """
+    return {"kind": kind, "table_size": TABLE_SIZE, "mip_levels": MIP_LEVELS,
+            "generator_version": WAVETABLE_VERSION}
+
+def cached_wavetables(kinds=WAVE_KINDS, cache_dir=CACHE_DIR):
+    """
+    Return a dict of kind -> wavetable mip stack, mapped from
+    `cache_dir/<kind>.wavetable` when an up-to-date cache exists.
+    """
+    wavetables = {}
+    for kind in kinds:
+        path = os.path.join(cache_dir, f"{kind}.wavetable")
+        wavetables[kind] = cached_tables(path, wavetable_params(kind),
+                                         lambda: build_wavetable(kind))
+    return wavetables
@@ -1,22 +1,31 @@
 import numpy as np
-import sounddevice as sd
 from pynput import keyboard
+import os
 import sys
-
+from table_store import shared_wavetables
+from voice_pool import VoicePool
+from event_queue import EventQueue
+from transposition_bank import TranspositionBank, build_transposition
+from telemetry import CallbackTelemetry, TelemetryReader
+from backends import open_backend, native_sample_rate
+from tuning import note_frequency
 
 # ----------------------------
 # Configuration and Constants
 # ----------------------------
-SAMPLE_RATE = 44100       # Hz
-DURATION = 200.0          # Duration of precomputed waveform (seconds)
-FADE_IN_DURATION = 0.05   # seconds
-FADE_OUT_DURATION = 0.1   # seconds
+AUDIO_BACKEND = os.environ.get("SYNTH_AUDIO_BACKEND", "sounddevice")   # or "null" without a sound card
+SAMPLE_RATE = native_sample_rate(AUDIO_BACKEND)    # Hz, whatever the device runs at
+ATTACK_DURATION = 0.05    # seconds
+DECAY_DURATION = 0.1      # seconds
+SUSTAIN_LEVEL = 0.8       # fraction of the peak level
+RELEASE_DURATION = 0.1    # seconds
 
-baseFrequency = 16.352
+BASE_NOTE = 12            # MIDI note of nF(0), C0
+baseFrequency = note_frequency(BASE_NOTE)
 
 def nF(noteNum):
-    freq = baseFrequency*pow(pow(2,(1/12)),noteNum)
-    return freq
+    # Exact equal-tempered frequency, noteNum semitones above C0
+    return note_frequency(BASE_NOTE + noteNum)
 
 # White key frequencies (3 octaves, 7 keys per octave = 21 keys)
 white_frequencies = [
@@ -58,72 +67,74 @@ Key_FREQUENCIES = {}
 Key_FREQUENCIES.update(white_keys)
 Key_FREQUENCIES.update(black_keys)
 
+# Note number of every key (its nF() index)
+KEY_NOTES = { key: int(round(12 * np.log2(freq / baseFrequency)))
+              for key, freq in Key_FREQUENCIES.items() }
+
+# Untransposed phase increment (cycles per sample), indexed by note number
+NOTE_INCREMENTS = np.zeros(128)
+for key, note in KEY_NOTES.items():
+    NOTE_INCREMENTS[note] = Key_FREQUENCIES[key] / SAMPLE_RATE
+
 # ----------------------------
 # Waveform Generation
 # ----------------------------
-def generate_cos_wave(freq, sample_rate, duration, fade_in_duration, fade_out_duration):
+# Cosine voices read a single-cycle wavetable through the voice pool. The
+# tables are mapped from the host-wide store shared by every synth process.
+wavetables = shared_wavetables()
+
+# Transpositions are computed from the untransposed increments when the
+# arrow keys ask for them; the wavetable is shared by all of them.
+wave_set = TranspositionBank(lambda shift: build_transposition(shift, NOTE_INCREMENTS, wavetables["cos"]))
+
+current_set_num = 0
+current_set = wave_set.get(current_set_num)
+
+voice_pool = VoicePool({"cos": current_set.table}, SAMPLE_RATE, current_set.note_increments,
+                       "cos", attack=ATTACK_DURATION, decay=DECAY_DURATION,
+                       sustain=SUSTAIN_LEVEL, release=RELEASE_DURATION)
+
+def set_transposition(shift):
     """
-    Generate a cosine waveform with fade-in and fade-out.
-    Returns a float32 NumPy array.
+    Switch the keyboard to transposition `shift`. Notes already sounding keep
+    their pitch; new notes use the new increments.
     """
-    t = np.linspace(0, duration, int(sample_rate * duration), endpoint=False)
-    wave = 0.5 * np.cos(2 * np.pi * freq * t)
-    # Apply fade-in
-    fade_in_samples = int(fade_in_duration * sample_rate)
-    if fade_in_samples > 0:
-        fade_in = np.linspace(0, 1, fade_in_samples)
-        wave[:fade_in_samples] *= fade_in
-    # Apply fade-out
-    fade_out_samples = int(fade_out_duration * sample_rate)
-    if fade_out_samples > 0:
-        fade_out = np.linspace(1, 0, fade_out_samples)
-        wave[-fade_out_samples:] *= fade_out
-    return wave.astype(np.float32)
-
-# Precompute waveforms for every key
-
-wave_set = {}
-for i in range(53):
-    for j in Key_FREQUENCIES:
-        Key_FREQUENCIES[j] = Key_FREQUENCIES[j]*pow(pow(2,(1/12)),i)
-    precomputed_waves = { key: generate_cos_wave(freq, SAMPLE_RATE, DURATION, FADE_IN_DURATION, FADE_OUT_DURATION)
-                for key, freq in Key_FREQUENCIES.items() }
-    wave_set[i] = precomputed_waves
-    print(i)
-
-current_set = {}
-current_set_num = 1
+    global current_set, current_set_num
+    current_set_num = shift
+    current_set = wave_set.get(shift)
+    voice_pool.set_note_increments(current_set.note_increments)
+    print(f"Transposition: +{shift} semitones")
 
 # ----------------------------
 # Active Note Management
 # ----------------------------
-# For each active key, store the current playback index in its waveform.
-active_notes = {}
-
+# Keys currently held down (listener thread only). Notes reach the audio
+# thread through a lock-free event queue.
+active_notes = set()
+note_events = EventQueue()
 
 def on_press(key):
-    global active_notes, listener, baseFrequency, stream, precomputed_waves,Key_FREQUENCIES
+    global active_notes, listener
     # Allow ESC to exit the program
     if key == keyboard.Key.esc:
         listener.stop()
         return False
     if key == keyboard.Key.up:
-        if current_set == 53:
-            Print("Highest Bound Reached")
+        if current_set_num == wave_set.count - 1:
+            print("Highest Bound Reached")
         else:
-            current_set += 1
-            current_set = wave_set[current_set]
+            set_transposition(current_set_num + 1)
     if key == keyboard.Key.down:
-        if current_set == 1:
-            Print("Lowest Bound Reached")
+        if current_set_num == 0:
+            print("Lowest Bound Reached")
         else:
-            current_set -= 1
-            current_set = wave_set[current_set]
+            set_transposition(current_set_num - 1)
     try:
         if hasattr(key, 'char'):
             k = key.char.lower()
             if k in Key_FREQUENCIES and len(active_notes) < 10 and k not in active_notes:
-                active_notes[k] = 0  # Start playing from the beginning
+                active_notes.add(k)
+                note_events.note_on(KEY_NOTES[k])
     except Exception as e:
         print(e)
 
@@ -132,47 +143,30 @@ def on_release(key):
         if hasattr(key, 'char'):
             k = key.char.lower()
             if k in active_notes:
-                del active_notes[k]
+                active_notes.discard(k)
+                note_events.note_off(KEY_NOTES[k])
     except Exception as e:
         print(e)
 
 # ----------------------------
 # Audio Callback and Stream
 # ----------------------------
+# Every callback's render time, voice count, xrun flags and stream times go
+# into a preallocated ring; a background reader keeps the histograms and
+# reports xruns, so nothing is printed from the audio thread.
+telemetry = CallbackTelemetry(SAMPLE_RATE)
+telemetry_reader = TelemetryReader(telemetry)
+
 def audio_callback(outdata, frames, time_info, status):
-    if status:
-        print(status, file=sys.stderr)
-    # Prepare an empty buffer for the callback
-    combined = np.zeros(frames, dtype=np.float32)
-    note_count = len(active_notes)
-    # For each active note, add its next segment to the combined buffer.
-    for key in list(active_notes.keys()):
-        pos = active_notes[key]
-        wave = current_set[key]
-        end = pos + frames
-        if end > len(wave):
-            end = len(wave)
-        n_samples = end - pos
-        if n_samples > 0:
-            combined[:n_samples] += wave[pos:end]
-            active_notes[key] = pos + n_samples
-        else:
-            del active_notes[key]
-    # Mix the notes without excessive attenuation.
-    # Divide by sqrt(note_count) to preserve clarity.
-    if note_count > 0:
-        combined /= np.sqrt(note_count)
-    outdata[:] = combined.reshape(-1, 1)
+    # Apply queued key events at their sample offsets, then mix every voice
+    # straight into the output buffer.
+    note_events.dispatch(voice_pool, frames, SAMPLE_RATE)
+    voice_pool.render(outdata[:, 0])
 
 # Create and start the output stream
-stream = sd.OutputStream(
-    samplerate=SAMPLE_RATE,
-    channels=1,
-    dtype='float32',
-    latency='low',
-    callback=audio_callback
-)
+stream = open_backend(AUDIO_BACKEND, telemetry.instrument(audio_callback, voice_pool), SAMPLE_RATE)
 stream.start()
+telemetry_reader.start()
 
 # ----------------------------
 # Keyboard Listener and Main Loop
@@ -185,5 +179,6 @@ try:
 except KeyboardInterrupt:
     print("Ctrl+C detected. Exiting program.")
 finally:
-    stream.stop()
     stream.close()
+    telemetry_reader.stop()
+    telemetry_reader.report()
@@ -0,0 +1,91 @@
+import math
+
+import numpy as np
+
+# ----------------------------
+# Wavetable Configuration
+# ----------------------------
+TABLE_SIZE = 2048         # Samples in one cycle of every table
+WAVETABLE_VERSION = 1     # Bump whenever the generated tables change
+WAVE_KINDS = ("saw", "square", "triangle", "cos")
+
+# Each waveform is stored as a stack of single-cycle tables ("mip levels").
+# Level 0 holds the most harmonics and every following level holds half as
+# many, so a voice can always read a level whose top harmonic is below Nyquist.
+MIP_LEVELS = int(np.log2(TABLE_SIZE)) - 1
+TOP_HARMONICS = TABLE_SIZE // 4
+
+# ----------------------------
+# Table Generation
+# ----------------------------
+def harmonic_amplitudes(kind, harmonics):
+    """
+    Return the Fourier series of a waveform as (cos_amps, sin_amps), indexed
+    by harmonic number (index 0 is DC and always zero).
+    The series match the naive generators that used to live in final.py:
+    saw ramps from -0.5 to 0.5, square toggles between 0.5 and -0.5,
+    triangle runs from -1 to 1 and cos is 0.5 * cos.
+    """
+    k = np.arange(harmonics + 1, dtype=np.float64)
+    cos_amps = np.zeros(harmonics + 1)
+    sin_amps = np.zeros(harmonics + 1)
+    odd = (k % 2 == 1)
+    if kind == "saw":
+        sin_amps[1:] = (-1.0) ** (k[1:] + 1) / (np.pi * k[1:])
+    elif kind == "square":
+        cos_amps[odd] = (2 / np.pi) * (-1.0) ** ((k[odd] - 1) / 2) / k[odd]
+    elif kind == "triangle":
+        cos_amps[odd] = -(8 / np.pi ** 2) / k[odd] ** 2
+    elif kind == "cos":
+        cos_amps[1] = 0.5
+    else:
+        raise ValueError(f"Unknown waveform kind: {kind}")
+    return cos_amps, sin_amps
+
+def build_wavetable(kind, table_size=TABLE_SIZE):
+    """
+    Build the band-limited mip stack for one waveform.
+    Every level is synthesised additively with an inverse FFT, so it contains
+    no energy above its harmonic limit.
+    Returns a float32 array of shape (MIP_LEVELS, table_size + 1); the extra
+    column repeats the first sample so interpolation never has to wrap.
+    """
+    levels = int(np.log2(table_size)) - 1
+    top = table_size // 4
+    tables = np.empty((levels, table_size + 1), dtype=np.float32)
+    for level in range(levels):
+        harmonics = max(1, top >> level)
+        cos_amps, sin_amps = harmonic_amplitudes(kind, harmonics)
+        spectrum = np.zeros(table_size // 2 + 1, dtype=np.complex128)
+        spectrum[:harmonics + 1] = (cos_amps - 1j * sin_amps) * (table_size / 2)
+        tables[level, :table_size] = np.fft.irfft(spectrum, n=table_size)
+        tables[level, table_size] = tables[level, 0]
+    return tables
+
+def build_wavetables(table_size=TABLE_SIZE):
+    """
+    Build the mip stacks for every waveform in WAVE_KINDS.
+    Returns a dict of kind -> float32 table array.
+    """
+    return {kind: build_wavetable(kind, table_size) for kind in WAVE_KINDS}
+
+# ----------------------------
+# Mip Level Selection
+# ----------------------------
+def mip_level(increment, levels=MIP_LEVELS, top_harmonics=TOP_HARMONICS, out=None):
+    """
+    Pick the richest mip level that stays alias-free for a phase increment
+    given in cycles per sample. A scalar gives an int. An array gives an
+    intp array, or with `out` (float64, shaped like `increment`) the levels
+    as whole floats in `out`, computed without allocating.
+    """
+    if out is None and np.ndim(increment) == 0:
+        level = math.ceil(math.log2(2 * top_harmonics * max(float(increment), 1e-12)))
+        return min(max(level, 0), levels - 1)
+    level = np.empty(np.shape(increment)) if out is None else out
+    np.maximum(increment, 1e-12, out=level)
+    level *= 2 * top_harmonics
+    np.log2(level, out=level)
+    np.ceil(level, out=level)
+    np.clip(level, 0, levels - 1, out=level)
+    return level.astype(np.intp) if out is None else level